@@ -0,0 +1,83 @@
+# benchmarks/fixtures.py
+
+import random
+import re
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RECORDED_PAGE = FIXTURE_DIR / "escooter-treff.html"
+BASE_ROWS = 150 # roughly the size of the live table
+SCALES = (1, 10, 100, 1000)
+
+HEADERS = [
+    "eScooter", "UVP*", "Gewicht (kg)", "Reichweite km (offiziell)", "Akku Wh", "Motor W",
+    "Federung", "Blinker", "Bremslicht", "Wechselakku", "Zuladung bis kg", "Gutscheincode (Werbung)",
+]
+
+def record_page(url: str, path: Path = RECORDED_PAGE) -> Path:
+    """Saves the live table page, so later runs can benchmark the real markup offline."""
+    from scraper import fetch_html
+
+    html = fetch_html(url)
+    if not html:
+        raise RuntimeError(f"Could not fetch {url}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html, encoding="utf-8")
+    return path
+
+def _row(rng: random.Random, i: int) -> str:
+    cells = [
+        f'<a href="/scooter-{i}/">Model &amp; {i}</a> <br/>Pro',
+        f"{rng.randint(300, 2500)},00 €",
+        f" {rng.randint(10, 30)},5 ",
+        f"<!-- offiziell --> {rng.randint(15, 90)} km",
+        f"<span>{rng.randint(2, 9)}</span>{rng.choice(['00', '50', '20'])}",
+        rng.choice(["2x250", "350", "500 W", "1.000", "2x 500W"]),
+        rng.choice(["vorne", "keine", "vorne + hinten", "hinten"]),
+        rng.choice(["", "2", "4"]),
+        rng.choice(["✓", "nein", "ja"]),
+        rng.choice(["ja", "", "nein"]),
+        str(rng.randint(100, 150)),
+        '<script>document.write("CODE")</script>CODE10',
+    ]
+    return "<tr>" + "".join(f'<td class="column-{n + 1}">{cell}</td>' for n, cell in enumerate(cells)) + "</tr>\n"
+
+def _table(table_id: str, rows: list[str]) -> str:
+    head = "".join(f'<th class="column-{n + 1}">{header}</th>' for n, header in enumerate(HEADERS))
+    return (f'<table id="{table_id}" class="tablepress"><thead><tr>{head}</tr></thead>'
+            f'<tbody class="row-hover">{"".join(rows)}</tbody></table>')
+
+def synthetic_page(n_rows: int = BASE_ROWS, seed: int = 0) -> str:
+    """
+    Builds a page in the layout of the escooter-treff table: a current and a
+    deprecated TablePress table between scripts, comments and a long page body.
+    """
+    rng = random.Random(seed)
+    current = [_row(rng, i) for i in range(n_rows)]
+    deprecated = [_row(rng, n_rows + i) for i in range(n_rows // 3)]
+    return (
+        "<!DOCTYPE html><html><head><title>E-Scooter Tabelle</title>"
+        "<script>var tpl = '<table id=\"tablepress-2\">';</script></head><body>"
+        "<header><nav><ul>" + "<li><a href='#'>Menü</a></li>" * 50 + "</ul></nav></header>"
+        "<main><p>Alle E-Scooter mit Straßenzulassung im Vergleich.</p>"
+        + _table("tablepress-2", current)
+        + "<h2>Nicht mehr erhältlich</h2><div>" + _table("tablepress-6", deprecated) + "</div></main>"
+        + "<footer>" + "<p>Lorem ipsum dolor sit amet.</p>" * 2000 + "</footer></body></html>"
+    )
+
+_TBODY = re.compile(r"(<tbody[^>]*>)(.*?)(</tbody>)", re.S | re.I)
+
+def scale_page(html: str, factor: int) -> str:
+    """Repeats the body rows of every table `factor` times, keeping the rest of the page as is."""
+    if factor == 1:
+        return html
+    return _TBODY.sub(lambda match: match.group(1) + match.group(2) * factor + match.group(3), html)
+
+def load_page(scale: int = 1) -> tuple[str, str]:
+    """
+    Returns (source, html) for a scale factor. The recorded page is used if
+    it exists (see `run.py record`), otherwise the synthetic page.
+    """
+    if RECORDED_PAGE.exists():
+        return "recorded", scale_page(RECORDED_PAGE.read_text(encoding="utf-8"), scale)
+    return "synthetic", scale_page(synthetic_page(), scale)
@@ -0,0 +1,262 @@
+# benchmarks/run.py
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+
+from fixtures import RECORDED_PAGE, SCALES, load_page, record_page
+from data_processor import parse_numeric_series, parse_numeric_value, process_dataframe, process_tables
+from filter_engine import CategoryFilter, FilterIndex, RangeFilter, index_for
+from filter_sort import filter_by_categorical, filter_by_numeric, sort_by_column
+from scraper import etree, parse_table, parse_tables
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ESCOOTER_URL = "https://www.escooter-treff.de/tabelle/"
+CONSOLE = Console()
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.15 # flag anything 15% slower or bigger than the baseline
+NOISE_FLOOR_SECONDS = 0.001 # differences below this are timer noise, never regressions
+
+# --- Benchmarks ---
+
+class Context:
+    """The inputs of one scale factor, built once and shared by all benchmarks."""
+
+    def __init__(self, scale: int):
+        self.scale = scale
+        self.source, self.html = load_page(scale)
+        tables = parse_tables(self.html, ["tablepress-2", "tablepress-6"])
+        self.raw = tables["tablepress-2"]
+        self.tables = {"current": self.raw, "deprecated": tables.get("tablepress-6", self.raw[:1])}
+        self.df = process_dataframe(self.raw)
+        header = self.raw[0]
+        numeric = [i for i, name in enumerate(header) if any(key in name.lower() for key in ("uvp", "kg", "km", "wh", "w"))]
+        self.numeric_cells = [row[i] for row in self.raw[1:] for i in numeric]
+        self.numeric_series = pd.Series(self.numeric_cells)
+        self.app_spec = app_filter_spec(self.df)
+
+    @property
+    def rows(self) -> int:
+        return len(self.raw) - 1
+
+def app_filter_spec(df: pd.DataFrame) -> list:
+    """The filters app.py builds when every sidebar widget has been narrowed a bit."""
+    def quantiles(column):
+        low, high = np.nanquantile(df[column].to_numpy(dtype="float64", na_value=np.nan), [0.1, 0.9])
+        return RangeFilter(column, float(low), float(high))
+    suspension = df["federung"].dropna().unique().tolist()
+    return [
+        quantiles("gewicht_kg"),
+        quantiles("uvp"),
+        quantiles("akku_wh"),
+        quantiles("motor_w"),
+        CategoryFilter("federung", tuple(suspension[:-1] or suspension)),
+        CategoryFilter("blinker", tuple(sorted(df["blinker"].unique().tolist()))),
+        CategoryFilter("bremslicht", (True,)),
+    ]
+
+# name -> (function of a Context, largest scale it runs at)
+BENCHMARKS: dict[str, tuple[Callable[[Context], object], int]] = {
+    "parse_table": (lambda ctx: parse_table(ctx.html, "tablepress-2"), 10), # bs4 takes minutes beyond that
+    "parse_tables[stream]": (lambda ctx: parse_tables(ctx.html, ["tablepress-2"], backend="stream"), 1000),
+    "parse_tables[lxml]": (lambda ctx: parse_tables(ctx.html, ["tablepress-2"], backend="lxml"), 1000 if etree else 0),
+    "process_dataframe": (lambda ctx: process_dataframe(ctx.raw), 1000),
+    "process_tables": (lambda ctx: process_tables(ctx.tables), 1000), # current and deprecated in one pass
+    "parse_numeric_value": (lambda ctx: [parse_numeric_value(cell) for cell in ctx.numeric_cells], 1000),
+    "parse_numeric_series": (lambda ctx: parse_numeric_series(ctx.numeric_series), 1000),
+    "filter_by_numeric": (lambda ctx: filter_by_numeric(ctx.df, "uvp", "<=", 1000), 1000),
+    "filter_by_categorical": (lambda ctx: filter_by_categorical(ctx.df, "federung", ["vorne", "vorne + hinten"]), 1000),
+    "sort_by_column": (lambda ctx: sort_by_column(ctx.df, "uvp", ascending=False), 1000),
+    "app_filter_chain[cold]": (lambda ctx: FilterIndex(ctx.df).apply(ctx.app_spec), 1000), # first rerun after a data load
+    "app_filter_chain[warm]": (lambda ctx: index_for(ctx.df).apply(ctx.app_spec), 1000),
+}
+
+def time_call(func: Callable[[], object], repeat: int) -> list[float]:
+    """Runs `func` once to warm up, then `repeat` times with the garbage collector off."""
+    func()
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return timings
+
+def peak_memory(func: Callable[[], object]) -> int:
+    """
+    Peak bytes allocated during one call: Python and numpy allocations as seen
+    by tracemalloc, plus Arrow buffers, which bypass it, via a proxy pool.
+    """
+    gc.collect()
+    arrow_pool = None
+    if pa is not None:
+        default_pool = pa.default_memory_pool()
+        arrow_pool = pa.proxy_memory_pool(default_pool)
+        pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] + (arrow_pool.max_memory() if arrow_pool is not None else 0)
+    finally:
+        tracemalloc.stop()
+        if arrow_pool is not None:
+            pa.set_memory_pool(default_pool)
+
+def run_benchmarks(scales: list[int], repeat: int, only: list[str] | None = None) -> dict:
+    results = {}
+    for scale in scales:
+        with CONSOLE.status(f"[bold green]Building the {scale}x fixture...[/bold green]"):
+            ctx = Context(scale)
+        for name, (func, max_scale) in BENCHMARKS.items():
+            if (only and name not in only) or scale > max_scale:
+                continue
+            with CONSOLE.status(f"[bold green]{escape(name)} at {scale}x ({ctx.rows} rows)...[/bold green]"):
+                timings = time_call(lambda: func(ctx), repeat)
+                peak = peak_memory(lambda: func(ctx))
+            results[f"{name}@{scale}x"] = {
+                "benchmark": name,
+                "scale": scale,
+                "rows": ctx.rows,
+                "repeat": repeat,
+                "min_s": min(timings),
+                "median_s": statistics.median(timings),
+                "peak_bytes": peak,
+            }
+            CONSOLE.print(f"{name:<24} {scale:>5}x {statistics.median(timings) * 1000:>10.2f} ms {peak / 2**20:>9.1f} MiB", markup=False)
+    return {"meta": environment(ctx.source), "results": results}
+
+def environment(fixture: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "fixture": fixture,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+# --- Comparison ---
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Prints current results next to the baseline and returns the keys that
+    got slower (median time) or bigger (peak memory) by more than `threshold`.
+    """
+    table = Table(title=f"Benchmarks vs. {baseline['meta'].get('commit') or 'baseline'}", header_style="bold magenta")
+    for column in ("Benchmark", "Rows", "Baseline ms", "Current ms", "Time", "Baseline MiB", "Current MiB", "Memory"):
+        table.add_column(column, justify="left" if column == "Benchmark" else "right")
+
+    regressions = []
+    for key, result in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            table.add_row(escape(key), str(result["rows"]), "-", f"{result['median_s'] * 1000:.2f}", "new", "-", f"{result['peak_bytes'] / 2**20:.1f}", "new")
+            continue
+        time_ratio = result["median_s"] / before["median_s"] if before["median_s"] else 1.0
+        memory_ratio = result["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] else 1.0
+        slower = time_ratio > 1 + threshold and result["median_s"] - before["median_s"] > NOISE_FLOOR_SECONDS
+        bigger = memory_ratio > 1 + threshold
+        if slower or bigger:
+            regressions.append(key)
+        table.add_row(
+            escape(key), str(result["rows"]),
+            f"{before['median_s'] * 1000:.2f}", f"{result['median_s'] * 1000:.2f}",
+            f"[{'red' if slower else 'green'}]{time_ratio:.2f}x[/]",
+            f"{before['peak_bytes'] / 2**20:.1f}", f"{result['peak_bytes'] / 2**20:.1f}",
+            f"[{'red' if bigger else 'green'}]{memory_ratio:.2f}x[/]",
+        )
+    CONSOLE.print(table)
+    if baseline["meta"].get("fixture") != current["meta"].get("fixture"):
+        CONSOLE.print("[yellow]Warning: baseline and current results were measured on different fixtures.[/yellow]")
+    return regressions
+
+def load_results(path: Path) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def save_results(results: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+def report_regressions(regressions: list[str], threshold: float) -> int:
+    if regressions:
+        CONSOLE.print(f"[bold red]✗ {len(regressions)} regression(s) above {threshold:.0%}:[/bold red] {', '.join(regressions)}")
+        return 1
+    CONSOLE.print(f"[bold green]✓ No regressions above {threshold:.0%}.[/bold green]")
+    return 0
+
+# --- Command line ---
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark scraping, processing and filtering without network access.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks (default).")
+    run_parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="Row multipliers of the fixture page.")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark.")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks.")
+    run_parser.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json", help="Where to write the JSON results.")
+    run_parser.add_argument("--baseline", type=Path, help="Results to compare against; exits with 1 on a regression.")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, e.g. 0.15 for 15%%.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    record_parser = subparsers.add_parser("record", help="Save the live table page as the benchmark fixture.")
+    record_parser.add_argument("--url", default=ESCOOTER_URL)
+
+    argv = sys.argv[1:]
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["run"] + argv # 'run' is the default command
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "record":
+        path = record_page(args.url)
+        CONSOLE.print(f"[bold green]✓ Saved {args.url} to {path}.[/bold green]")
+    elif args.command == "compare":
+        sys.exit(report_regressions(compare(load_results(args.baseline), load_results(args.current), args.threshold), args.threshold))
+    else:
+        if not RECORDED_PAGE.exists():
+            CONSOLE.print("[yellow]No recorded page found, using the synthetic fixture. Run 'record' once to benchmark the real markup.[/yellow]")
+        results = run_benchmarks(args.scales, args.repeat, args.only)
+        save_results(results, args.output)
+        CONSOLE.print(f"Results written to {args.output}.")
+        if args.baseline:
+            sys.exit(report_regressions(compare(load_results(args.baseline), results, args.threshold), args.threshold))
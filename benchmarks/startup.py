@@ -0,0 +1,167 @@
+# benchmarks/startup.py
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from run import (CONSOLE, DEFAULT_THRESHOLD, ESCOOTER_URL, RESULTS_DIR, compare, environment,
+                 load_results, report_regressions, save_results)
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+DEFAULT_REPEAT = 5
+TIMEOUT_SECONDS = 60
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow") # not needed to parse arguments or show help
+SCRAPING_MODULES = ("scraper", "sources", "requests", "urllib3", "bs4", "lxml") # only needed to refresh
+
+# name -> (arguments after `python -X importtime`, stdout text to stop the clock at,
+#          input sent afterwards, modules that must not be imported)
+CASES = {
+    "import_main": (["-c", "import main"], None, "", HEAVY_MODULES + SCRAPING_MODULES),
+    "cli_help": (["main.py", "--help"], None, "", HEAVY_MODULES + SCRAPING_MODULES),
+    "cli_first_prompt": (["main.py"], "Choose an option", "8\n", SCRAPING_MODULES),
+    "cli_query": (["main.py", "query", "--limit", "10"], None, "", SCRAPING_MODULES),
+}
+
+def warm_cache(cache_dir: Path) -> int:
+    """Writes a fresh cache entry from the synthetic page, so every case runs on a cache hit. Returns its rows."""
+    from cache import DatasetCache, build_metadata, write_dataset
+    from data_processor import process_dataframe
+    from fixtures import synthetic_page
+    from scraper import parse_tables
+
+    html = synthetic_page()
+    df = process_dataframe(parse_tables(html, ["tablepress-2"])["tablepress-2"])
+    write_dataset(df, DatasetCache(ESCOOTER_URL, cache_dir=cache_dir).path, build_metadata(ESCOOTER_URL, html))
+    return len(df)
+
+def import_times(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, nesting level, cumulative microseconds) per line of `python -X importtime` output, in order."""
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times.append((name.strip(), (len(name) - len(name.lstrip()) - 1) // 2, int(cumulative)))
+        except ValueError: # the header line
+            continue
+    return times
+
+def direct_imports(times: list[tuple[str, int, int]], module: str) -> list[tuple[str, int]]:
+    """The modules that top-level `module` imported itself, with their cumulative microseconds."""
+    position = next(i for i, (name, level, _) in enumerate(times) if name == module and level == 0)
+    children = []
+    for name, level, cumulative in reversed(times[:position]):
+        if level == 0:
+            break
+        if level == 1:
+            children.append((name, cumulative))
+    return children
+
+def measure(arguments: list[str], env: dict, marker: str | None = None, stdin: str = "") -> tuple[float, str]:
+    """
+    Runs `python -X importtime <arguments>` in src/ and returns (seconds,
+    stderr). With `marker`, the clock stops when it first appears on stdout,
+    e.g. a prompt; `stdin` is sent after that so the process exits.
+    """
+    seen = threading.Event()
+    stderr = []
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", *arguments], cwd=SRC_DIR, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def read_stdout():
+        output = b""
+        while chunk := process.stdout.read1(4096):
+            output += chunk
+            if marker is not None and marker.encode() in output:
+                seen.set()
+
+    readers = [threading.Thread(target=read_stdout, daemon=True),
+               threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    elapsed = None
+    if marker is not None:
+        if not seen.wait(TIMEOUT_SECONDS):
+            process.kill()
+            raise RuntimeError(f"'{marker}' did not appear within {TIMEOUT_SECONDS}s: {' '.join(arguments)}")
+        elapsed = time.perf_counter() - started
+    process.stdin.write(stdin.encode())
+    process.stdin.close()
+    process.wait()
+    if elapsed is None:
+        elapsed = time.perf_counter() - started
+    for reader in readers:
+        reader.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"'{' '.join(arguments)}' exited with {process.returncode}: {stderr[0].decode(errors='replace')[-500:]}")
+    return elapsed, stderr[0].decode(errors="replace")
+
+def _result(name: str, timings: list[float], rows: int) -> dict:
+    # Same layout as run.py, so both can be compared the same way; only time is measured here
+    return {"benchmark": name, "scale": 1, "rows": rows, "repeat": len(timings),
+            "min_s": min(timings), "median_s": statistics.median(timings), "peak_bytes": 0}
+
+def run_startup(repeat: int) -> tuple[dict, list[str]]:
+    """Measures every case `repeat` times on a warm cache. Returns the results and any forbidden imports."""
+    results = {}
+    violations = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        rows = warm_cache(Path(cache_dir))
+        env = {**os.environ, "ESCOOTER_CACHE_DIR": cache_dir}
+        env.pop("ESCOOTER_PROFILE", None)
+        env.pop("ESCOOTER_SOURCES", None)
+        measure(["-c", "import main"], env) # warm the OS file cache
+
+        for name, (arguments, marker, stdin, forbidden) in CASES.items():
+            with CONSOLE.status(f"[bold green]{name}...[/bold green]"):
+                runs = [measure(arguments, env, marker, stdin) for _ in range(repeat)]
+            results[f"{name}@1x"] = _result(name, [elapsed for elapsed, _ in runs], rows)
+            CONSOLE.print(f"{name:<24} {results[f'{name}@1x']['median_s'] * 1000:>10.1f} ms", markup=False)
+
+            times = import_times(runs[-1][1])
+            imported = {module for module, _, _ in times}
+            violations += [f"{name} imports {module}" for module in forbidden if module in imported]
+
+            if name == "import_main":
+                # The import time of main itself, as reported by the interpreter
+                totals = [next(us for module, level, us in import_times(stderr) if module == "main" and level == 0) / 1e6
+                          for _, stderr in runs]
+                results["import_main[importtime]@1x"] = _result("import_main[importtime]", totals, rows)
+                slowest = sorted(direct_imports(times, "main"), key=lambda item: -item[1])[:5]
+                CONSOLE.print(f"{'':<24} main itself: {statistics.median(totals) * 1000:.1f} ms; slowest imports: "
+                              + ", ".join(f"{module} {us / 1000:.1f} ms" for module, us in slowest), markup=False)
+    return {"meta": environment("synthetic"), "results": results}, violations
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure CLI startup on a warm cache with python -X importtime.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per case.")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "startup.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", type=Path, help="Results to compare against; exits with 1 on a regression.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, e.g. 0.15 for 15%%.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results, violations = run_startup(args.repeat)
+    save_results(results, args.output)
+    CONSOLE.print(f"Results written to {args.output}.")
+
+    status = 0
+    if violations:
+        CONSOLE.print(f"[bold red]✗ Lazy imports broken:[/bold red] {', '.join(violations)}")
+        status = 1
+    if args.baseline:
+        status |= report_regressions(compare(load_results(args.baseline), results, args.threshold), args.threshold)
+    sys.exit(status)
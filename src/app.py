@@ -1,9 +1,20 @@
 # app.py
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-from scraper import get_escooter_data
-from data_processor import process_dataframe
+import os
+import time
+from datetime import datetime
+import instrumentation
+from instrumentation import timer
+from cache import DATASET_VARIANTS, VERSION_ATTR, DatasetCache
+from refresher import RefreshScheduler
+from data_processor import STATUS_COLUMN
+from filter_engine import CategoryFilter, RangeFilter, ResultCache, canonical_spec, index_for
+from search import normalize, search_index_for
+from stats import compute_stats
+from ranking import DERIVED_METRICS, SCORE_COLUMN, Criterion, available_criteria, pareto_front, ranked_positions, with_metrics
 from translations import translations
 
 # --- Page Configuration ---
@@ -14,14 +25,64 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+ESCOOTER_URL = "https://www.escooter-treff.de/tabelle/"
+
 # --- Data Loading with Cache ---
-@st.cache_data(ttl="24h")
-def load_and_process_data():
-    raw_data = get_escooter_data("https://www.escooter-treff.de/tabelle/")
-    if 'current' in raw_data:
-        df = process_dataframe(raw_data['current'])
-        return df
-    return pd.DataFrame()
+@st.cache_resource
+def get_refresh_scheduler(variant="current"):
+    # One on-disk cache shared with the CLI and across workers and restarts,
+    # kept warm by a background thread so no page load waits for a scrape
+    sources = None
+    if os.environ.get("ESCOOTER_SOURCES"):
+        from sources import configured_sources
+        sources = configured_sources()
+    return RefreshScheduler(DatasetCache(ESCOOTER_URL, sources=sources, variant=variant)).start()
+
+def load_and_process_data(variant="current"):
+    return get_refresh_scheduler(variant).snapshot()
+
+# Dataset versions kept per variant by the version-keyed caches below: the
+# latest and the one before it, which sessions started before a refresh
+# still show. max_entries is one LRU bound across all keys, so it is sized
+# for every variant's versions rather than per variant
+VERSIONS_KEPT = 2
+
+@st.cache_resource(max_entries=len(DATASET_VARIANTS) * VERSIONS_KEPT)
+def get_dataset_stats(version, variant, _df):
+    # Pre-aggregated when the dataset was refreshed and read once per version;
+    # computed here only if the stored ones belong to another version. Older
+    # versions are evicted once VERSIONS_KEPT newer ones of each variant are in use
+    stats = get_refresh_scheduler(variant).cache.stats()
+    return stats if stats is not None and stats.version == version else compute_stats(_df, version)
+
+@st.cache_resource
+def get_result_cache():
+    # Filter results and metrics, shared by all sessions of this server
+    return ResultCache()
+
+# --- Display Columns ---
+DISPLAY_COLUMNS = [
+    "model", "uvp", "gewicht_kg", "reichweite_km_offiziell", "akku_wh",
+    "motor_w", "federung", "blinker", "bremslicht", "wechselakku", "zuladung_bis_kg", STATUS_COLUMN
+]
+SORTABLE_COLUMNS = {"uvp", "gewicht_kg", "reichweite_km_offiziell", "akku_wh", "motor_w", "zuladung_bis_kg"}
+ROWS_PER_PAGE = 50
+# Criteria offered for ranking; the derived ratios are computed from the filtered rows on demand
+RANKING_COLUMNS = ["uvp", "gewicht_kg", "reichweite_km_offiziell", "akku_wh", "motor_w", "zuladung_bis_kg", *DERIVED_METRICS]
+DEFAULT_RANKING = ["eur_per_km", "gewicht_kg"]
+RANKING_ROWS = 20
+STATS_GROUP_COLUMN = "federung"
+STATS_GROUP_MEANS = ["uvp", "gewicht_kg", "reichweite_km_offiziell", "akku_wh"]
+
+@st.cache_resource(max_entries=len(translations) * len(DATASET_VARIANTS) * VERSIONS_KEPT)
+def display_columns(lang, columns):
+    # The columns to show and their translated labels, built once per language
+    # and column layout instead of on every rerun; the layout depends on the
+    # variant and can change with a new dataset version, so there is room for
+    # every language of each kept version of each variant
+    shown = tuple(column for column in DISPLAY_COLUMNS if column in columns)
+    names = translations[lang]["column_names"]
+    return shown, tuple(names.get(column, column) for column in shown)
 
 # --- Custom CSS ---
 def load_css():
@@ -36,7 +97,6 @@ def t(key):
 
 # --- Main App Logic ---
 load_css()
-df_original = load_and_process_data()
 
 # --- Sidebar ---
 st.sidebar.title("⚙️ Settings")
@@ -48,6 +108,27 @@ selected_lang = st.sidebar.radio(
 )
 st.session_state.lang = selected_lang
 
+# A fixed key keeps the toggle's state when its label changes language
+# Configured sources pick their tables themselves, so the toggle only applies to the default page
+include_deprecated = st.sidebar.toggle(t("include_deprecated"), value=False, key="include_deprecated",
+                                       disabled=bool(os.environ.get("ESCOOTER_SOURCES")))
+dataset_variant = "all" if include_deprecated and not os.environ.get("ESCOOTER_SOURCES") else "current"
+with timer("app.load"):
+    df_original = load_and_process_data(dataset_variant)
+
+refresh_status = get_refresh_scheduler(dataset_variant).status
+cache_age = get_refresh_scheduler(dataset_variant).cache.age()
+if refresh_status.last_refresh_at is None and cache_age is not None:
+    # Nothing refreshed in this process yet; show when the cached data was written
+    cached_at = datetime.fromtimestamp(time.time() - cache_age).strftime("%Y-%m-%d %H:%M")
+    st.sidebar.caption(t("data_cached").format(time=cached_at))
+elif refresh_status.last_refresh_at is not None:
+    refreshed_at = datetime.fromtimestamp(refresh_status.last_refresh_at).strftime("%Y-%m-%d %H:%M")
+    if refresh_status.failed:
+        st.sidebar.caption(t("data_refresh_failed").format(time=refreshed_at))
+    else:
+        st.sidebar.caption(t("data_refreshed").format(time=refreshed_at, duration=refresh_status.last_duration))
+
 st.sidebar.title(t("sidebar_title"))
 
 # --- Header and Information ---
@@ -60,59 +141,238 @@ st.markdown("---")
 if df_original.empty:
     st.error(t("error_loading_data"))
 else:
-    df = df_original.copy()
+    # df_original is shared by every session and never modified; each rerun
+    # works on row positions and only copies the rows it displays
+    index = index_for(df_original)
+
+    def slider_bounds(column):
+        low, high = index.bounds(column)
+        return int(low), int(high)
+
+    def range_slider(label, column, key, step=None):
+        # Streamlit resets a slider whose bounds change, as they do with the
+        # dataset variant. The chosen range is carried over instead, clamped
+        # into the new bounds; an end left at the old bound moves to the new one
+        low, high = slider_bounds(column)
+        bounds = st.session_state.setdefault("slider_bounds", {})
+        previous = st.session_state.get(key)
+        if previous is not None and bounds.get(key, (low, high)) != (low, high):
+            old_low, old_high = bounds[key]
+            start = low if previous[0] <= old_low else min(max(previous[0], low), high)
+            end = high if previous[1] >= old_high else min(max(previous[1], start), high)
+            st.session_state[key] = (start, end)
+        bounds[key] = (low, high)
+        # The default only applies the first time; after that the value comes from the session state
+        return st.sidebar.slider(label, low, high, (low, high) if previous is None else None, step=step, key=key)
 
     # --- Filter Widgets ---
-    weight_range = st.sidebar.slider(t("filter_weight"), int(df['gewicht_kg'].min()), int(df['gewicht_kg'].max()), (int(df['gewicht_kg'].min()), int(df['gewicht_kg'].max())))
-    price_range = st.sidebar.slider(t("filter_price"), int(df['uvp'].min()), int(df['uvp'].max()), (int(df['uvp'].min()), int(df['uvp'].max())), step=50)
-    akku_range = st.sidebar.slider(t("filter_battery"), int(df['akku_wh'].min()), int(df['akku_wh'].max()), (int(df['akku_wh'].min()), int(df['akku_wh'].max())), step=50)
-    motor_range = st.sidebar.slider(t("filter_motor"), int(df['motor_w'].min()), int(df['motor_w'].max()), (int(df['motor_w'].min()), int(df['motor_w'].max())), step=50)
+    # Fixed keys keep the filter values when the labels change language
+    weight_range = range_slider(t("filter_weight"), 'gewicht_kg', "filter_weight")
+    price_range = range_slider(t("filter_price"), 'uvp', "filter_price", step=50)
+    akku_range = range_slider(t("filter_battery"), 'akku_wh', "filter_battery", step=50)
+    motor_range = range_slider(t("filter_motor"), 'motor_w', "filter_motor", step=50)
 
-    suspension_types = sorted(df['federung'].dropna().unique().tolist())
-    selected_suspension = st.sidebar.multiselect(t("filter_suspension"), suspension_types, default=suspension_types)
+    suspension_types = sorted(index.categories('federung'))
+    selected_suspension = st.sidebar.multiselect(t("filter_suspension"), suspension_types, default=suspension_types, key="filter_suspension")
     
-    blinker_options = sorted(df['blinker'].dropna().unique().tolist())
-    selected_blinkers = st.sidebar.multiselect(t("filter_blinkers"), blinker_options, default=blinker_options)
+    blinker_options = sorted(index.categories('blinker'))
+    selected_blinkers = st.sidebar.multiselect(t("filter_blinkers"), blinker_options, default=blinker_options, key="filter_blinkers")
 
-    boolean_options = [t("option_any"), t("option_yes"), t("option_no")]
-    has_brake_light = st.sidebar.selectbox(t("filter_brake_light"), options=boolean_options, index=0)
-    has_swappable_battery = st.sidebar.selectbox(t("filter_swappable_battery"), options=boolean_options, index=0)
+    # The selected values are language-independent; only their labels are translated
+    boolean_options = ["any", "yes", "no"]
+    boolean_labels = {"any": t("option_any"), "yes": t("option_yes"), "no": t("option_no")}
+    has_brake_light = st.sidebar.selectbox(t("filter_brake_light"), options=boolean_options, format_func=boolean_labels.get, index=0, key="filter_brake_light")
+    has_swappable_battery = st.sidebar.selectbox(t("filter_swappable_battery"), options=boolean_options, format_func=boolean_labels.get, index=0, key="filter_swappable_battery")
 
     # --- Apply filters ---
-    df = df[df['gewicht_kg'].between(weight_range[0], weight_range[1])]
-    df = df[df['uvp'].between(price_range[0], price_range[1])]
-    df = df[df['akku_wh'].between(akku_range[0], akku_range[1])]
-    df = df[df['motor_w'].between(motor_range[0], motor_range[1])]
+    # All predicates are combined into one mask over precomputed indexes
+    filter_spec = [
+        RangeFilter('gewicht_kg', *weight_range),
+        RangeFilter('uvp', *price_range),
+        RangeFilter('akku_wh', *akku_range),
+        RangeFilter('motor_w', *motor_range),
+    ]
 
-    if selected_suspension: df = df[df['federung'].isin(selected_suspension)]
-    if selected_blinkers: df = df[df['blinker'].isin(selected_blinkers)]
+    if selected_suspension: filter_spec.append(CategoryFilter('federung', tuple(selected_suspension)))
+    if selected_blinkers: filter_spec.append(CategoryFilter('blinker', tuple(selected_blinkers)))
 
-    if has_brake_light == t("option_yes"): df = df[df['bremslicht'] == True]
-    elif has_brake_light == t("option_no"): df = df[df['bremslicht'] == False]
-        
-    if has_swappable_battery == t("option_yes"): df = df[df['wechselakku'] == True]
-    elif has_swappable_battery == t("option_no"): df = df[df['wechselakku'] == False]
+    if has_brake_light == "yes": filter_spec.append(CategoryFilter('bremslicht', (True,)))
+    elif has_brake_light == "no": filter_spec.append(CategoryFilter('bremslicht', (False,)))
         
+    if has_swappable_battery == "yes": filter_spec.append(CategoryFilter('wechselakku', (True,)))
+    elif has_swappable_battery == "no": filter_spec.append(CategoryFilter('wechselakku', (False,)))
+
     # --- Main Page Display ---
+    search_text = st.text_input(t("search"), placeholder=t("search_placeholder"), key="search")
     col1, col2, col3 = st.columns(3)
-    col1.metric(t("metric_scooters_found"), f"{len(df)}")
-    if not df.empty:
-        col2.metric(t("metric_avg_price"), f"€{df['uvp'].mean():,.0f}")
-        col3.metric(t("metric_avg_battery"), f"{df['akku_wh'].mean():.0f} Wh")
-
-    # --- NEW: Prepare DataFrame for Display ---
-    # 1. Define the order and selection of columns you want to show
-    columns_to_show = [
-        "model", "uvp", "gewicht_kg", "reichweite_km_offiziell", "akku_wh", 
-        "motor_w", "federung", "blinker", "bremslicht", "wechselakku", "zuladung_bis_kg"
-    ]
-    
-    # 2. Get the translation map for the current language
-    column_map = t("column_names")
+    sort_col, order_col = st.columns([3, 1])
+    columns_to_show, column_labels = display_columns(st.session_state.lang, tuple(df_original.columns))
+    sortable = [None] + [column for column in columns_to_show if column in SORTABLE_COLUMNS]
+    sort_labels = {None: t("sort_none"), **dict(zip(columns_to_show, column_labels))}
+    sort_column = sort_col.selectbox(t("sort_by"), sortable, format_func=sort_labels.get, key="sort_column")
+    sort_descending = order_col.toggle(t("sort_descending"), value=False, key="sort_descending")
+
+    # Results are shared by all sessions and keyed by the dataset version and
+    # the normalized filter state, so common and repeated states (and language
+    # switches) are served without filtering
+    results = get_result_cache()
+    dataset_version = df_original.attrs.get(VERSION_ATTR, id(df_original))
+    spec_key = canonical_spec(filter_spec)
+
+    def filter_result():
+        with timer("app.filter"):
+            positions = index.positions(filter_spec)
+            return positions, (len(positions), index.mean('uvp', positions), index.mean('akku_wh', positions))
+
+    filtered, (n_found, avg_price, avg_battery) = results.get((dataset_version, spec_key), filter_result)
+
+    # A name search keeps the filtered rows that match, best matches first;
+    # the index is built once per dataset and every spelling of the same
+    # words shares one cache entry
+    search_terms = tuple(normalize(search_text))
+    if search_terms:
+        spec_key = (spec_key, search_terms)
+        matching = filtered
+
+        def search_result():
+            with timer("app.search"):
+                matches = search_index_for(df_original).search(" ".join(search_terms))
+                passes = np.zeros(index.n_rows, dtype=bool)
+                passes[matching] = True
+                found = matches[passes[matches]]
+                return found, (len(found), index.mean('uvp', found), index.mean('akku_wh', found))
+
+        filtered, (n_found, avg_price, avg_battery) = results.get((dataset_version, spec_key), search_result)
+
+    positions = filtered
+    if sort_column:
+        positions = results.get((dataset_version, spec_key, sort_column, sort_descending),
+                                lambda: index.sort_positions(filtered, sort_column, ascending=not sort_descending))
+
+    # Back to the first page whenever the rows change
+    view_key = (dataset_version, spec_key, sort_column, sort_descending)
+    if st.session_state.get("view_key") != view_key:
+        st.session_state.view_key = view_key
+        st.session_state.page = 1
+
+    col1.metric(t("metric_scooters_found"), f"{n_found}")
+    if n_found:
+        col2.metric(t("metric_avg_price"), f"€{avg_price:,.0f}")
+        col3.metric(t("metric_avg_battery"), f"{avg_battery:.0f} Wh")
+
+    # --- Prepare the visible rows for display ---
+    with timer("app.render"):
+        n_pages = max(1, -(-n_found // ROWS_PER_PAGE))
+        if n_pages > 1:
+            page = st.number_input(t("page"), min_value=1, max_value=n_pages, step=1, key="page")
+        else:
+            page = 1
+        first = (page - 1) * ROWS_PER_PAGE
+        rows = positions[first:first + ROWS_PER_PAGE]
+
+        # Only the rows of this page are copied, already in display column order
+        display_df = df_original.iloc[rows, df_original.columns.get_indexer(columns_to_show)].set_axis(column_labels, axis=1)
+        if STATUS_COLUMN in columns_to_show:
+            status_label = column_labels[columns_to_show.index(STATUS_COLUMN)]
+            display_df[status_label] = display_df[status_label].cat.rename_categories(t("status_values"))
+
+        st.dataframe(display_df, width="stretch")
+        if n_pages > 1:
+            st.caption(t("rows_shown").format(first=first + 1, last=first + len(rows), total=n_found))
+
+    # --- Ranking ---
+    # Ranks the filtered rows; rankings are cached like the filter results
+    st.markdown("---")
+    st.subheader(t("ranking_title"))
+    column_names = translations[st.session_state.lang]["column_names"]
+    rankable = [column for column in RANKING_COLUMNS if column in available_criteria(df_original)]
+    ranking_labels = {column: column_names.get(column, column) for column in rankable}
+    mode_labels = t("ranking_modes")
+    mode_col, criteria_col = st.columns([1, 3])
+    ranking_mode = mode_col.radio(t("ranking_mode"), list(mode_labels), format_func=mode_labels.get, key="ranking_mode")
+    selected_criteria = criteria_col.multiselect(t("ranking_criteria"), rankable, default=[column for column in DEFAULT_RANKING if column in rankable],
+                                                 format_func=ranking_labels.get, key="ranking_criteria")
+
+    weights = {}
+    if ranking_mode == "score" and selected_criteria:
+        for weight_col, column in zip(st.columns(len(selected_criteria)), selected_criteria):
+            weights[column] = weight_col.slider(t("ranking_weight").format(name=ranking_labels[column]), 0.0, 5.0, 1.0, step=0.5, key=f"ranking_weight_{column}")
+    # A weight of zero leaves a criterion out of the score
+    criteria = tuple(Criterion(column, weights.get(column, 1.0)) for column in selected_criteria if weights.get(column, 1.0))
+
+    if criteria and n_found:
+        directions = t("ranking_directions")
+        st.caption(" · ".join(t("ranking_direction").format(name=ranking_labels[criterion.column], direction=directions[criterion.more_is_better])
+                              for criterion in criteria))
+
+        def ranking_result():
+            with timer("app.rank"):
+                if ranking_mode == "pareto":
+                    return pareto_front(df_original, list(criteria), filtered), None
+                return ranked_positions(df_original, list(criteria), filtered, limit=RANKING_ROWS)
+
+        ranked, scores = results.get((dataset_version, spec_key, ranking_mode, criteria), ranking_result)
+        shown = ranked[:RANKING_ROWS]
+        ranked_df = with_metrics(df_original.iloc[shown], [criterion.column for criterion in criteria])
+        ranked_df = ranked_df[[column for column in ("model", *selected_criteria) if column in ranked_df.columns]]
+        if scores is not None:
+            ranked_df = ranked_df.assign(**{SCORE_COLUMN: scores})
+        st.dataframe(ranked_df.round(2).set_axis([column_names.get(column, column) for column in ranked_df.columns], axis=1),
+                     width="stretch", hide_index=True)
+        caption = "ranking_pareto_caption" if scores is None else "ranking_score_caption"
+        st.caption(t(caption).format(shown=len(ranked), total=n_found))
+
+    # --- Statistics ---
+    # Built from the statistics pre-aggregated at refresh time: unfiltered
+    # views use them as stored, filtered ones count the stored histogram bins
+    # of their rows instead of binning the values again
+    st.markdown("---")
+    st.subheader(t("stats_title"))
+    stats = get_dataset_stats(dataset_version, dataset_variant, df_original)
+    stats_options = [column for column in columns_to_show if column in SORTABLE_COLUMNS and column in stats.columns]
+    stats_labels = {column: column_names.get(column, column) for column in stats_options}
+    stats_column = st.selectbox(t("stats_column"), stats_options, format_func=stats_labels.get, key="stats_column")
+
+    if stats_column and n_found:
+        stats_rows = None if n_found == stats.n_rows else filtered
+
+        def stats_result():
+            with timer("app.stats"):
+                edges, counts = stats.histogram(stats_column, stats_rows)
+                groups = None
+                if STATS_GROUP_COLUMN in stats.groups:
+                    groups = stats.group_means(df_original, STATS_GROUP_COLUMN, stats_rows)
+                fit = None
+                if "akku_wh" in stats.columns and "reichweite_km_offiziell" in stats.columns:
+                    fit = stats.regression(df_original, "akku_wh", "reichweite_km_offiziell", stats_rows)
+                return edges, counts, stats.quantiles(stats_column, stats_rows), groups, fit
+
+        edges, counts, quantiles, groups, fit = results.get((dataset_version, spec_key, "stats", stats_column), stats_result)
+        # Bins are labelled by their midpoint, so the axis keeps their order
+        st.bar_chart(pd.DataFrame({t("stats_count"): counts}, index=pd.Index(((edges[:-1] + edges[1:]) / 2).round(0), name=stats_labels[stats_column])))
+        caption = t("stats_quantiles").format(q05=quantiles[0.05], q25=quantiles[0.25], median=quantiles[0.5], q75=quantiles[0.75], q95=quantiles[0.95])
+        st.caption(caption if stats_rows is None else f"{caption}. {t('stats_filtered_note')}")
 
-    # 3. Create a new DataFrame for display by selecting and renaming columns
-    # We filter the map to only include columns that are actually in our display list
-    display_df = df[columns_to_show].rename(columns={k: v for k, v in column_map.items() if k in columns_to_show})
+        if groups is not None:
+            st.markdown(t("stats_groups").format(name=column_names.get(STATS_GROUP_COLUMN, STATS_GROUP_COLUMN)))
+            groups = groups[["count", *[column for column in STATS_GROUP_MEANS if column in groups.columns]]]
+            st.dataframe(groups[groups["count"] > 0].round(1).rename(columns={"count": t("stats_count"), **column_names}),
+                         width="stretch")
+        if fit is not None and not np.isnan(fit["slope"]):
+            st.caption(t("stats_regression").format(slope=fit["slope"] * 100, r2=fit["r2"], n=fit["n"]))
 
-    # 4. Display the prepared DataFrame
-    st.dataframe(display_df, use_container_width=True)
\ No newline at end of file
+# --- Timing Panel (only with ESCOOTER_PROFILE=1) ---
+if instrumentation.enabled():
+    profile = instrumentation.snapshot()
+    with st.sidebar.expander(t("profile_title")):
+        st.dataframe(pd.DataFrame(
+            [(name, stats["count"], stats["mean_s"] * 1000, stats["max_s"] * 1000, stats["total_s"] * 1000)
+             for name, stats in profile["timers"].items()],
+            columns=["step", "calls", "mean ms", "max ms", "total ms"],
+        ).sort_values("total ms", ascending=False), hide_index=True)
+        st.dataframe(pd.DataFrame(list(profile["counters"].items()), columns=["counter", "value"]), hide_index=True)
+        cache_stats = get_result_cache().stats()
+        st.caption(f"filter.results: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_ratio']:.0%}), {cache_stats['entries']}/{cache_stats['maxsize']} entries")
+        st.download_button("JSON", instrumentation.to_json(), file_name="profile.json", mime="application/json")
+        st.download_button("Prometheus", instrumentation.to_prometheus(), file_name="profile.prom", mime="text/plain")
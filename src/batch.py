@@ -0,0 +1,292 @@
+# src/batch.py
+
+import io
+import json
+import re
+import socketserver
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, TextIO
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from cache import VERSION_ATTR
+from filter_engine import CategoryFilter, RangeFilter, ResultCache, canonical_spec, compare_filter
+from instrumentation import count, timed
+from query import LazyQuery
+
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet")
+_COMPARISON = re.compile(r"^\s*(\w+)\s*(<=|>=|==|=|<|>)\s*(.+?)\s*$")
+_MEMBERSHIP = re.compile(r"^\s*(\w+)\s+in\s+(.+?)\s*$", re.IGNORECASE)
+_TRUE = {"true", "yes", "ja", "1"}
+_FALSE = {"false", "no", "nein", "0"}
+
+class QueryError(ValueError):
+    """A query that cannot be run, e.g. an unknown column or a malformed condition."""
+
+@dataclass(frozen=True)
+class BatchQuery:
+    """
+    One non-interactive query.
+
+    Args:
+        where (tuple[str, ...]): Conditions that must all hold, like
+                                 'uvp <= 1000' or 'federung in vorne,hinten'.
+        sort (str | None): Column to sort by, optionally with ':asc' or ':desc'.
+        columns (tuple[str, ...] | None): Columns to output, in order. All if None.
+        limit (int | None): Maximum number of rows to output.
+        format (str): 'csv', 'jsonl' or 'parquet'.
+    """
+    where: tuple[str, ...] = ()
+    sort: str | None = None
+    columns: tuple[str, ...] | None = None
+    limit: int | None = None
+    format: str = "csv"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BatchQuery":
+        """Builds a query from a JSON object with the same keys; `where` and `columns` may be strings or lists."""
+        unknown = set(data) - {"where", "sort", "columns", "limit", "format", "id", "output"}
+        if unknown:
+            raise QueryError(f"Unknown query keys: {', '.join(sorted(unknown))}")
+        for key in ("where", "columns"):
+            value = data.get(key)
+            if not (value is None or isinstance(value, str)
+                    or (isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value))):
+                raise QueryError(f"'{key}' must be a string or a list of strings; got {value!r}.")
+        for key in ("sort", "format", "output"):
+            if data.get(key) is not None and not isinstance(data[key], str):
+                raise QueryError(f"'{key}' must be a string; got {data[key]!r}.")
+        where = data.get("where") or ()
+        columns = data.get("columns")
+        query = cls(
+            where=(where,) if isinstance(where, str) else tuple(where),
+            sort=data.get("sort"),
+            columns=tuple(column.strip() for column in columns.split(",")) if isinstance(columns, str) else (tuple(columns) if columns else None),
+            limit=data.get("limit"),
+            format=data.get("format", "csv"),
+        )
+        if query.format not in OUTPUT_FORMATS:
+            raise QueryError(f"Unknown format '{query.format}'. Choose one of {', '.join(OUTPUT_FORMATS)}.")
+        if query.limit is not None and (not isinstance(query.limit, int) or isinstance(query.limit, bool) or query.limit < 0):
+            raise QueryError(f"Invalid limit {query.limit!r}.")
+        return query
+
+def read_query_file(path: Path) -> dict:
+    """Reads a query file: a JSON object with the keys of BatchQuery."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise QueryError(f"Could not read query file {path}: {e}")
+    if not isinstance(data, dict):
+        raise QueryError(f"Query file {path} must contain a JSON object.")
+    return data
+
+# --- Parsing ---
+
+def _check_column(df: pd.DataFrame, column: str):
+    if column not in df.columns:
+        raise QueryError(f"Unknown column '{column}'. Available: {', '.join(df.columns)}")
+
+def _parse_value(series: pd.Series, text: str):
+    text = text.strip().strip("'\"")
+    if is_bool_dtype(series):
+        if text.lower() in _TRUE:
+            return True
+        if text.lower() in _FALSE:
+            return False
+        raise QueryError(f"'{series.name}' is yes/no; got '{text}'.")
+    if is_numeric_dtype(series):
+        try:
+            value = float(text)
+        except ValueError:
+            raise QueryError(f"'{series.name}' is numeric; got '{text}'.")
+        return int(value) if value.is_integer() else value
+    return text
+
+def parse_condition(df: pd.DataFrame, text: str) -> RangeFilter | CategoryFilter:
+    """
+    Turns a condition into a filter_engine predicate. Supported forms are
+    'column OP value' with OP one of < <= > >= == (or =), and
+    'column in a,b,c'. Yes/no columns accept true/false, yes/no or ja/nein.
+    """
+    match = _MEMBERSHIP.match(text)
+    if match:
+        column, values = match.groups()
+        _check_column(df, column)
+        return CategoryFilter(column, tuple(_parse_value(df[column], value) for value in values.split(",") if value.strip()))
+
+    match = _COMPARISON.match(text)
+    if not match:
+        raise QueryError(f"Cannot parse condition '{text}'. Use e.g. 'uvp <= 1000' or 'federung in vorne,hinten'.")
+    column, operator, value = match.groups()
+    _check_column(df, column)
+    operator = "==" if operator == "=" else operator
+    value = _parse_value(df[column], value)
+    if is_numeric_dtype(df[column]) and not is_bool_dtype(df[column]):
+        return compare_filter(column, operator, value)
+    if operator != "==":
+        raise QueryError(f"'{column}' is not numeric; only '==' and 'in' are supported.")
+    return CategoryFilter(column, (value,))
+
+def parse_sort(df: pd.DataFrame, text: str) -> tuple[str, bool]:
+    """Parses 'column', 'column:asc', 'column:desc' or '-column' into (column, ascending)."""
+    text = text.strip()
+    column, _, order = text.lstrip("-").partition(":")
+    ascending = not text.startswith("-")
+    if order:
+        if order.lower() not in ("asc", "desc"):
+            raise QueryError(f"Invalid sort order '{order}'. Use 'asc' or 'desc'.")
+        ascending = order.lower() == "asc"
+    _check_column(df, column)
+    return column, ascending
+
+# --- Running ---
+
+@timed("batch.query")
+def run_query(df: pd.DataFrame, query: BatchQuery) -> pd.DataFrame:
+    """Filters, sorts, projects and limits `df`, reusing its filter index across calls."""
+    lazy = LazyQuery(df)
+    for condition in query.where:
+        lazy.where(parse_condition(df, condition))
+    if query.sort:
+        lazy.sort(*parse_sort(df, query.sort))
+    result = lazy.collect()
+    if query.columns:
+        for column in query.columns:
+            _check_column(df, column)
+        result = result[list(query.columns)]
+    if query.limit is not None:
+        result = result.head(query.limit)
+    count("batch.rows_returned", len(result))
+    return result
+
+def write_result(df: pd.DataFrame, fmt: str, target: Path | None = None):
+    """Writes a result to `target`, or to stdout if it is None."""
+    if fmt == "parquet":
+        df.to_parquet(target if target is not None else sys.stdout.buffer, index=False)
+        return
+    text = to_text(df, fmt)
+    if target is None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    else:
+        Path(target).write_text(text, encoding="utf-8")
+
+def to_text(df: pd.DataFrame, fmt: str) -> str:
+    """A result as CSV or JSON Lines text."""
+    if fmt == "csv":
+        return df.to_csv(index=False)
+    if fmt == "jsonl":
+        return df.to_json(orient="records", lines=True, force_ascii=False) if len(df) else ""
+    raise QueryError(f"Format '{fmt}' cannot be written as text.")
+
+# --- Server Mode ---
+
+class QueryServer:
+    """
+    Answers queries against a dataset kept in memory.
+
+    Requests and responses are JSON objects, one per line. A request has the
+    keys of BatchQuery plus an optional `id`, which is echoed back, and an
+    optional `output` file name to write the result to (required for
+    parquet). Files are only written inside `output_dir`, and not at all
+    without one, since any local client may send requests. Otherwise the
+    result is returned inline: `rows` holds the records for jsonl, `csv` the
+    text for csv. Failed requests get an `error` instead.
+
+    `load` is called for every request, so a DatasetCache.load keeps the
+    server on the latest dataset without re-reading unchanged files.
+    Responses for repeated requests come from a ResultCache.
+    """
+
+    def __init__(self, load: Callable[[], pd.DataFrame], results: ResultCache | None = None,
+                 output_dir: Path | None = None):
+        self.load = load
+        self.results = results or ResultCache(name="batch.results")
+        self.output_dir = output_dir
+
+    def output_path(self, output: str) -> Path:
+        """Where to write the result for an `output` name; it must stay inside output_dir."""
+        if self.output_dir is None:
+            raise QueryError("Writing results to files is disabled. Start the server with an output directory.")
+        root = Path(self.output_dir).resolve()
+        path = (root / output).resolve()
+        if not path.is_relative_to(root) or path == root:
+            raise QueryError(f"Output '{output}' is not a file in the output directory.")
+        return path
+
+    def handle(self, line: str) -> str:
+        """Answers one request line with one response line (without the newline)."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise QueryError("A request must be a JSON object.")
+            request_id = request.get("id")
+            query = BatchQuery.from_dict(request)
+            df = self.load()
+            if df.empty:
+                raise QueryError("No data loaded.")
+
+            output = request.get("output")
+            if output:
+                target = self.output_path(output)
+                result = run_query(df, query)
+                write_result(result, query.format, target)
+                return json.dumps({"id": request_id, "count": len(result), "output": str(target)})
+            if query.format == "parquet":
+                raise QueryError("Parquet results need an 'output' path.")
+
+            key = (df.attrs.get(VERSION_ATTR, id(df)), canonical_spec(parse_condition(df, condition) for condition in query.where),
+                   query.sort, query.columns, query.limit, query.format)
+            body = self.results.get(key, lambda: self._body(df, query))
+            return f'{{"id": {json.dumps(request_id)}, {body}}}'
+        except (QueryError, ValueError, KeyError, OSError) as e: # e.g. an unwritable output file; the server keeps running
+            count("batch.errors")
+            return json.dumps({"id": request_id, "error": str(e) if isinstance(e, ValueError) else f"{type(e).__name__}: {e}"})
+
+    @staticmethod
+    def _body(df: pd.DataFrame, query: BatchQuery) -> str:
+        result = run_query(df, query)
+        if query.format == "csv":
+            payload = f'"csv": {json.dumps(to_text(result, "csv"), ensure_ascii=False)}'
+        else:
+            payload = f'"rows": {result.to_json(orient="records", force_ascii=False)}'
+        return f'"count": {len(result)}, {payload}'
+
+    def serve_stream(self, stream_in: TextIO, stream_out: TextIO):
+        """Answers requests from `stream_in` until it ends. Blank lines are skipped."""
+        for line in stream_in:
+            if line.strip():
+                stream_out.write(self.handle(line) + "\n")
+                stream_out.flush()
+
+    def serve_socket(self, path: Path | None = None, port: int | None = None):
+        """
+        Accepts connections on a Unix socket at `path`, or on localhost:`port`,
+        each handled in its own thread like serve_stream. Runs until interrupted.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve_stream(io.TextIOWrapper(self.rfile, encoding="utf-8"),
+                                    io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True))
+
+        if path is not None:
+            Path(path).unlink(missing_ok=True)
+            listener = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+        else:
+            listener = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+        listener.daemon_threads = True
+        with listener:
+            try:
+                listener.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if path is not None:
+                    Path(path).unlink(missing_ok=True)
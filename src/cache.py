@@ -0,0 +1,449 @@
+# src/cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from data_processor import PARSER_VERSION
+from instrumentation import count, timed, timer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # pyarrow is optional; without it the cache falls back to CSV
+    pa = None
+    feather = None
+
+# Bump whenever the layout of the cache files changes, so files written by
+# older versions are rebuilt instead of misread.
+SCHEMA_VERSION = 1
+METADATA_KEY = b"escooter_analyzer"
+CACHE_FORMAT = "feather" if feather is not None else "csv"
+
+# Shared by the CLI and the Streamlit app; override with ESCOOTER_CACHE_DIR.
+DEFAULT_CACHE_DIR = Path(os.environ.get("ESCOOTER_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "cache"))
+DEFAULT_TTL_SECONDS = 24 * 60 * 60 # 24 hours
+DEFAULT_STALE_SECONDS = 7 * 24 * 60 * 60 # serve stale data for up to a week while revalidating
+DEFAULT_RETRY_SECONDS = 5 * 60 # after a failed refresh, serve what there is for this long before scraping again
+LOCK_TIMEOUT_SECONDS = 120
+# "current" holds the models on sale; "all" adds the deprecated table, tagged in a status column
+DATASET_VARIANTS = ("current", "all")
+VERSION_ATTR = "dataset_version" # DataFrame.attrs key of frames returned by DatasetCache.load
+
+def content_hash(text: str) -> str:
+    """Returns the SHA-256 hex digest of the raw HTML, used to detect unchanged pages."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def build_metadata(source_url: str, html: str | None, **extra) -> dict:
+    """Creates the metadata stored alongside a processed dataset."""
+    metadata = {
+        "schema_version": SCHEMA_VERSION,
+        "parser_version": PARSER_VERSION,
+        "source_url": source_url,
+        "scraped_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if html is not None:
+        metadata["html_sha256"] = content_hash(html)
+    return {**metadata, **extra}
+
+def dataset_version(key: str, metadata: dict) -> str:
+    """
+    Identifies the content of a cached dataset, e.g. to key derived results.
+    It changes with every rewrite but not when an unchanged page only
+    restarts the TTL.
+    """
+    digest = hashlib.sha1(json.dumps(metadata, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{key}-{digest}"
+
+def dataset_path(base: Path) -> Path:
+    """Returns the cache file for `base` in the format available in this environment."""
+    return base.with_suffix(f".{CACHE_FORMAT}")
+
+def _sidecar_path(path: Path) -> Path:
+    return path.with_suffix(path.suffix + ".json")
+
+def write_dataset(df: pd.DataFrame, path: Path, metadata: dict) -> None:
+    """
+    Writes a processed DataFrame with its metadata.
+
+    Feather files carry the metadata in the Arrow schema and are written
+    uncompressed so they can be memory-mapped on read. CSV files get a JSON
+    sidecar that also records the dtypes, so they survive the round-trip.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+
+    if path.suffix == ".feather":
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(metadata).encode("utf-8")
+        feather.write_feather(table.replace_schema_metadata(schema_metadata), tmp_path, compression="uncompressed")
+    else:
+        df.to_csv(tmp_path, index=False)
+        sidecar = {**metadata, "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()}}
+        _sidecar_path(path).write_text(json.dumps(sidecar), encoding="utf-8")
+
+    # Replace atomically so readers never see a half-written file
+    tmp_path.replace(path)
+
+def read_metadata(path: Path) -> dict:
+    """Reads only the metadata of a cached dataset. Returns {} if it is missing or unreadable."""
+    try:
+        if path.suffix == ".feather":
+            schema = pa.ipc.open_file(pa.memory_map(str(path))).schema
+            return json.loads((schema.metadata or {}).get(METADATA_KEY, b"{}"))
+        return json.loads(_sidecar_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def read_dataset(path: Path) -> tuple[pd.DataFrame, dict]:
+    """
+    Reads a cached dataset and its metadata.
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The DataFrame and its metadata. An empty
+                                   DataFrame and {} if the file is missing,
+                                   unreadable or from another schema version.
+    """
+    metadata = read_metadata(path)
+    if metadata.get("schema_version") != SCHEMA_VERSION:
+        return pd.DataFrame(), {}
+
+    if path.suffix == ".feather":
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    else:
+        df = pd.read_csv(path)
+        dtypes = {col: dtype for col, dtype in metadata.get("dtypes", {}).items() if col in df.columns}
+        df = df.astype(dtypes)
+    return df, metadata
+
+def export_csv(df: pd.DataFrame, path: Path) -> None:
+    """Exports a DataFrame as CSV, e.g. for spreadsheets."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False)
+
+class FileLock:
+    """
+    Exclusive inter-process lock on a file, usable as a context manager.
+
+    Uses flock on POSIX and msvcrt.locking on Windows. The OS releases the
+    lock if the holding process dies, so a crash never leaves it stuck.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking: bool = True, timeout: float = LOCK_TIMEOUT_SECONDS) -> bool:
+        """Acquires the lock. Returns False if it is held elsewhere and blocking is off or the timeout passed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking or time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    return False
+                time.sleep(0.1)
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f"Could not acquire cache lock {self.path}")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class DatasetCache:
+    """
+    On-disk cache of the processed dataset, shared by the CLI and the Streamlit app.
+
+    Entries are keyed by source URL (or the list of sources, see sources.py)
+    and parser version, plus the dataset variant. Within `ttl` the
+    cached frame is served as is. Once it expires but is younger than
+    `stale_ttl`, it is still served while a background thread revalidates
+    it. Older or missing entries are refreshed before returning. A file lock
+    makes sure only one process or thread scrapes at a time; everybody else
+    waits for it and then reads its result. After a failed refresh, nobody
+    scrapes again for `retry_after` seconds; whatever is cached (possibly
+    nothing) is served meanwhile. Every refresh that produces new
+    data is also appended to the snapshot history (see snapshots.py) and
+    gets its statistics pre-aggregated next to it (see stats.py).
+    """
+
+    def __init__(self, url: str, cache_dir: Path = DEFAULT_CACHE_DIR,
+                 ttl: float = DEFAULT_TTL_SECONDS, stale_ttl: float = DEFAULT_STALE_SECONDS,
+                 sources: list | None = None, variant: str = "current", retry_after: float = DEFAULT_RETRY_SECONDS):
+        if variant not in DATASET_VARIANTS:
+            raise ValueError(f"Unknown dataset variant '{variant}'. Choose one of {DATASET_VARIANTS}.")
+        if sources and variant != "current":
+            # Each source names its own tables; register the deprecated ones as a source instead
+            raise ValueError(f"The dataset variant '{variant}' cannot be combined with sources.")
+        self.url = url
+        self.sources = sources # list[sources.Source]; None scrapes only `url`
+        self.variant = variant
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.retry_after = retry_after
+        if sources:
+            url = ";".join(f"{source.name}={source.url}#{','.join(source.table_ids)}" for source in sources)
+        if variant != "current":
+            url = f"{url}|{variant}" # "current" keeps the keys of caches written before variants existed
+        key_source = f"{url}|parser-v{PARSER_VERSION}|schema-v{SCHEMA_VERSION}"
+        self.key = hashlib.sha1(key_source.encode("utf-8")).hexdigest()[:16]
+        self.path = dataset_path(cache_dir / self.key)
+        self.stats_path = dataset_path(cache_dir / f"{self.key}-stats")
+        self.lock_path = cache_dir / f"{self.key}.lock"
+        self.failure_path = cache_dir / f"{self.key}.failed" # its mtime is when the last refresh failed
+        # Keyed by URL only, so the history survives parser and schema upgrades
+        self.history_root = cache_dir / "snapshots" / hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        self.last_status = None  # "hit", "stale", "refreshed", "unchanged" or "error"
+        self._frame = None
+        self._frame_mtime = None
+        self._stats = None
+        self._mutex = threading.Lock()
+
+    def age(self) -> float | None:
+        """Seconds since the cached dataset was last written or revalidated, or None if there is none."""
+        try:
+            return time.time() - self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def load(self) -> pd.DataFrame:
+        """Reads the cached dataset without refreshing it. Returns an empty DataFrame if there is none."""
+        # Keep the last frame in memory and only go back to disk when the file changed
+        with self._mutex:
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except OSError:
+                return pd.DataFrame()
+            if self._frame is None or mtime != self._frame_mtime:
+                with timer("cache.read"):
+                    self._frame, metadata = read_dataset(self.path)
+                self._frame.attrs[VERSION_ATTR] = dataset_version(self.key, metadata)
+                self._frame_mtime = mtime
+            return self._frame
+
+    def backing_off(self) -> bool:
+        """Whether a refresh failed less than `retry_after` seconds ago, anywhere."""
+        try:
+            return time.time() - self.failure_path.stat().st_mtime < self.retry_after
+        except OSError:
+            return False
+
+    def _record_failure(self) -> None:
+        self.last_status = "error"
+        try:
+            self.failure_path.parent.mkdir(parents=True, exist_ok=True)
+            self.failure_path.touch()
+        except OSError as e:
+            print(f"Warning: Could not record the failed refresh: {e}")
+
+    def _clear_failure(self) -> None:
+        self.failure_path.unlink(missing_ok=True)
+
+    def get(self) -> pd.DataFrame:
+        """Returns the processed dataset, refreshing it according to its age."""
+        age = self.age()
+        if age is not None and age < self.ttl:
+            self.last_status = "hit"
+            count("cache.hits")
+            return self.load()
+
+        if age is not None and age < self.stale_ttl:
+            self.last_status = "stale"
+            count("cache.stale_hits")
+            if not self.backing_off():
+                self.revalidate_in_background()
+            return self.load()
+
+        if self.backing_off():
+            # The last attempt failed moments ago; serve what there is instead of scraping again
+            self.last_status = "error"
+            count("cache.backoffs")
+            return self.load()
+
+        count("cache.misses")
+        with FileLock(self.lock_path):
+            # Another worker may have refreshed, or failed to, while we were waiting for the lock
+            age = self.age()
+            if age is not None and age < self.ttl:
+                self.last_status = "hit"
+                return self.load()
+            if self.backing_off():
+                self.last_status = "error"
+                return self.load()
+            return self.refresh()
+
+    def revalidate_in_background(self) -> bool:
+        """Starts a background refresh unless one is already running anywhere. Returns True if started."""
+        lock = FileLock(self.lock_path)
+        if not lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                age = self.age()
+                if (age is None or age >= self.ttl) and not self.backing_off():
+                    self.refresh()
+            finally:
+                lock.release()
+
+        threading.Thread(target=run, name=f"revalidate-{self.key}", daemon=True).start()
+        return True
+
+    @timed("cache.refresh")
+    def refresh(self) -> pd.DataFrame:
+        """
+        Scrapes and processes the page and stores the result. The caller should hold the lock.
+
+        An expired entry is revalidated with a conditional request first; a 304,
+        or a page whose HTML hash is unchanged, only restarts its TTL. If the
+        scrape fails, the previous dataset (if any) is returned and the failure
+        is recorded, so get() does not retry before `retry_after` has passed.
+        """
+        if self.sources:
+            return self._refresh_sources()
+
+        # Imported here so cache hits never load the scraping stack
+        from scraper import fetch_page, extract_escooter_tables
+        from data_processor import process_dataframe, process_tables
+
+        metadata = read_metadata(self.path) if self.path.exists() else {}
+        result = fetch_page(self.url, etag=metadata.get("etag"), last_modified=metadata.get("last_modified"))
+        if metadata and (result.not_modified or (result.text and content_hash(result.text) == metadata.get("html_sha256"))):
+            self.path.touch() # Restart the TTL
+            self.last_status = "unchanged"
+            self._clear_failure()
+            return self.load()
+
+        include_deprecated = self.variant == "all"
+        try:
+            raw_data = extract_escooter_tables(result.text, include_deprecated) if result.text else {}
+        except ValueError as e: # e.g. the page layout changed and a table lost its header
+            print(f"Warning: Could not parse {self.url}: {e}")
+            raw_data = {}
+        if 'current' not in raw_data:
+            self._record_failure()
+            return self.load()
+
+        df = process_tables(raw_data) if include_deprecated else process_dataframe(raw_data['current'])
+        metadata = build_metadata(self.url, result.text, **result.validators())
+        write_dataset(df, self.path, metadata)
+        self.last_status = "refreshed"
+        self._clear_failure()
+        self.record_stats(df, metadata)
+        self.record_snapshot(df)
+        return self.load()
+
+    def _refresh_sources(self) -> pd.DataFrame:
+        """Like refresh, for several sources scraped in parallel and merged into one dataset."""
+        from sources import merge_results, scrape_sources
+
+        metadata = read_metadata(self.path) if self.path.exists() else {}
+        validators = metadata.get("sources", {})
+        results = scrape_sources(self.sources, validators)
+
+        if metadata and all(result.unchanged for result in results):
+            self.path.touch() # Restart the TTL
+            self.last_status = "unchanged"
+            self._clear_failure()
+            return self.load()
+        if all(result.df is None for result in results):
+            self._record_failure()
+            return self.load()
+
+        # Failed sources keep their validators, so the next refresh retries them; so do
+        # sources sharing their page, or the page would count as unchanged next time
+        failed_urls = {result.source.url for result in results if result.df is None and not result.unchanged}
+        for result in results:
+            if result.df is not None and result.source.url not in failed_urls:
+                validators[result.source.url] = {**result.fetch.validators(), "html_sha256": content_hash(result.fetch.text)}
+            elif result.unchanged and result.fetch.not_modified:
+                validators.setdefault(result.source.url, {}).update(
+                    {key: value for key, value in result.fetch.validators().items() if value})
+
+        df = merge_results(results, previous=self.load())
+        metadata = build_metadata(self.url, None, sources=validators)
+        write_dataset(df, self.path, metadata)
+        self.last_status = "refreshed"
+        self._clear_failure()
+        self.record_stats(df, metadata)
+        self.record_snapshot(df)
+        return self.load()
+
+    def history(self):
+        """The SnapshotStore holding every dataset this cache has scraped."""
+        from snapshots import SnapshotStore
+        return SnapshotStore(self.history_root)
+
+    def record_snapshot(self, df: pd.DataFrame) -> None:
+        """Appends `df` to the history. A failure here never fails the refresh."""
+        try:
+            self.history().record(df)
+        except Exception as e:
+            print(f"Warning: Could not record snapshot: {e}")
+
+    def record_stats(self, df: pd.DataFrame, metadata: dict) -> None:
+        """Pre-aggregates the statistics of a freshly written dataset (see stats.py). A failure here never fails the refresh."""
+        from stats import compute_stats, write_stats
+        try:
+            stats = compute_stats(df, dataset_version(self.key, metadata))
+            write_stats(stats, self.stats_path)
+            self._stats = stats
+        except Exception as e:
+            print(f"Warning: Could not record statistics: {e}")
+
+    def stats(self):
+        """
+        The stats.DatasetStats of the cached dataset, or None if there is none.
+        They are read from disk once per dataset version, and computed and
+        stored on the spot if they are missing or older than the dataset.
+        """
+        from stats import compute_stats, read_stats, write_stats
+        df = self.load()
+        if df.empty:
+            return None
+        version = df.attrs[VERSION_ATTR]
+        if self._stats is None or self._stats.version != version:
+            stats = read_stats(self.stats_path)
+            if stats is None or stats.version != version:
+                stats = compute_stats(df, version)
+                try:
+                    write_stats(stats, self.stats_path)
+                except OSError as e:
+                    print(f"Warning: Could not store statistics: {e}")
+            self._stats = stats
+        return self._stats
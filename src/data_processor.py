@@ -3,6 +3,21 @@
 import pandas as pd
 import re
 import numpy as np
+from operator import itemgetter
+
+from instrumentation import count, enabled as instrumentation_enabled, timed, timer
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow is optional; the vectorized parser falls back to pandas' .str methods
+    pa = None
+    pc = None
+
+# Bump whenever process_dataframe changes the columns, values or dtypes it
+# produces; cached datasets are keyed by it and get rebuilt.
+PARSER_VERSION = 3
+STATUS_COLUMN = 'status'
 
 def clean_column_name(col_name: str) -> str:
     """Cleans column names for better DataFrame usability."""
@@ -12,6 +27,18 @@ def clean_column_name(col_name: str) -> str:
     col_name = col_name.replace(' ', '_').lower()
     return col_name
 
+def _parse_multiplier(cleaned_value: str) -> float | None:
+    """Evaluates the '2x250' format on an already cleaned value, or returns None to fall back."""
+    parts = cleaned_value.lower().split('x')
+    try:
+        # Find all numbers in the second part to handle cases like '2x250W'
+        second_num_match = re.search(r"(\d+(\.\d+)?)", parts[1])
+        if second_num_match:
+            return float(parts[0]) * float(second_num_match.group(1))
+    except (ValueError, IndexError):
+        pass # Fallback to standard parsing
+    return None
+
 def parse_numeric_value(value: str) -> float | None:
     """
     Parses a string to extract a numeric value, handling units, ranges, and special formats.
@@ -25,14 +52,9 @@ def parse_numeric_value(value: str) -> float | None:
     
     # Handle '2x250' format for motor power by multiplying
     if 'x' in cleaned_value and len(re.findall(r"(\d+(\.\d+)?)", cleaned_value)) > 1:
-        parts = cleaned_value.lower().split('x')
-        try:
-            # Find all numbers in the second part to handle cases like '2x250W'
-            second_num_match = re.search(r"(\d+(\.\d+)?)", parts[1])
-            if second_num_match:
-                return float(parts[0]) * float(second_num_match.group(1))
-        except (ValueError, IndexError):
-            pass # Fallback to standard parsing
+        product = _parse_multiplier(cleaned_value)
+        if product is not None:
+            return product
 
     numbers = re.findall(r"(\d+(\.\d+)?)", cleaned_value)
     if numbers:
@@ -40,9 +62,164 @@ def parse_numeric_value(value: str) -> float | None:
     
     return None
 
-def process_dataframe(raw_data: list[list[str]]) -> pd.DataFrame:
+# --- Vectorized parsing ---
+# The bulk parsers below run a few whole-column passes instead of several regex
+# calls per cell. Their patterns mirror the ones in parse_numeric_value; Python's
+# \d means any Unicode decimal digit, which is spelled \p{Nd} for pyarrow (RE2).
+NUMBER_PATTERN = re.compile(r"(\d+(?:\.\d+)?)")
+ARROW_NUMBER_PATTERN = r"(?P<number>\p{Nd}+(?:\.\p{Nd}+)?)"
+ARROW_NUMBER_COUNT_PATTERN = r"\p{Nd}+(?:\.\p{Nd}+)?"
+BOOLEAN_PATTERN = re.compile(r"ja|✓")
+# Each bulk pass has a fixed cost of a few milliseconds per column, so short
+# columns (like the live table's ~150 rows) are faster cell by cell
+VECTORIZE_MIN_ROWS = 2000
+
+def _to_float(strings: pd.Series) -> np.ndarray:
+    """Converts extracted number strings to a float64 array, keeping missing values as NaN."""
+    try:
+        return strings.astype("float64").to_numpy(copy=True)
+    except (TypeError, ValueError):
+        # Non-ASCII digits are valid for float() but not for the bulk cast
+        return strings.map(float, na_action="ignore").astype("float64").to_numpy(copy=True)
+
+def _string_mask(series: pd.Series) -> np.ndarray:
+    """Marks the cells that hold strings; everything else parses to NaN."""
+    if isinstance(series.dtype, pd.StringDtype) or pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return series.notna().to_numpy(dtype=bool)
+    return series.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+
+def _bulk_parse_arrow(text: pd.Series) -> tuple[list, np.ndarray, np.ndarray]:
+    """Cleans, extracts and flags multiplier candidates with pyarrow compute kernels."""
+    array = pa.array(text.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    cleaned = pc.replace_substring(pc.replace_substring(array, '.', ''), ',', '.')
+    first = pc.struct_field(pc.extract_regex(cleaned, ARROW_NUMBER_PATTERN), [0])
+    candidates = pc.and_(
+        pc.match_substring(cleaned, 'x'),
+        pc.greater(pc.count_substring_regex(cleaned, ARROW_NUMBER_COUNT_PATTERN), 1),
+    )
+    candidates = pc.fill_null(candidates, False).to_numpy(zero_copy_only=False)
+    positions = np.flatnonzero(candidates)
+    return pc.take(cleaned, pa.array(positions)).to_pylist(), positions, _to_float(first.to_pandas())
+
+def _bulk_parse_pandas(text: pd.Series) -> tuple[list, np.ndarray, np.ndarray]:
+    """Same as _bulk_parse_arrow, using pandas' object-dtype .str methods."""
+    text = pd.Series(text.to_numpy(dtype=object), dtype=object)
+    cleaned = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    first = cleaned.str.extract(NUMBER_PATTERN, expand=False)
+    has_x = cleaned.str.contains('x', regex=False, na=False).to_numpy(dtype=bool)
+    positions = np.flatnonzero(has_x)
+    if len(positions):
+        counts = cleaned.iloc[positions].str.count(NUMBER_PATTERN).to_numpy()
+        positions = positions[counts > 1]
+    return cleaned.iloc[positions].tolist(), positions, _to_float(first)
+
+def parse_numeric_series(series: pd.Series, min_rows: int = VECTORIZE_MIN_ROWS) -> pd.Series:
+    """
+    Vectorized equivalent of `series.apply(parse_numeric_value)`.
+
+    Cleaning and number extraction run as bulk string passes; only the few cells
+    in the '2x250' format go through _parse_multiplier individually. Series
+    shorter than `min_rows` are parsed cell by cell, which is faster there.
+    """
+    if len(series) < min_rows:
+        return series.map(parse_numeric_value).astype("float64")
+
+    is_string = _string_mask(series)
+    if not is_string.any():
+        return pd.Series(np.nan, index=series.index, dtype="float64")
+
+    text = series.where(is_string)
+    bulk_parse = _bulk_parse_arrow if pa is not None else _bulk_parse_pandas
+    candidates, positions, values = bulk_parse(text)
+
+    for position, cleaned_value in zip(positions, candidates):
+        product = _parse_multiplier(cleaned_value)
+        if product is not None:
+            values[position] = product
+
+    values[~is_string] = np.nan
+    return pd.Series(values, index=series.index, dtype="float64")
+
+def parse_boolean_series(series: pd.Series) -> pd.Series:
+    """
+    Vectorized check for 'ja' or '✓' markers, matching the per-cell boolean
+    parsing. Missing cells (like those align_tables pads a table's absent
+    columns with) stay missing, as a nullable boolean; empty ones are False.
+    """
+    parsed = series.astype(str).str.lower().str.contains(BOOLEAN_PATTERN, na=False).astype(bool)
+    missing = series.isna()
+    return parsed.astype("boolean").mask(missing) if missing.any() else parsed
+
+# --- Compact dtypes ---
+
+CATEGORY_MAX_RATIO = 0.5 # text columns with at most this share of distinct values become categories
+
+def _smallest_int_dtype(low: float, high: float, nullable: bool) -> str | None:
+    for bits in (8, 16, 32, 64):
+        info = np.iinfo(f"int{bits}")
+        if info.min <= low and high <= info.max:
+            return f"Int{bits}" if nullable else f"int{bits}"
+    return None
+
+def _compact_numeric(series: pd.Series) -> pd.Series:
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    present = values[~np.isnan(values)]
+    has_missing = len(present) < len(values)
+    if len(present) and np.all(present == np.round(present)):
+        dtype = _smallest_int_dtype(present.min(), present.max(), nullable=has_missing)
+        if dtype is not None:
+            return series.astype(dtype)
+    # float32 only where every value survives the round trip unchanged
+    if np.array_equal(values.astype("float32").astype("float64"), values, equal_nan=True):
+        return series.astype("float32")
+    return series
+
+def optimize_dtypes(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """
+    Stores every column in the smallest dtype that keeps all its values.
+
+    - Whole numbers become the smallest int type, or nullable Int if values are missing.
+    - Other numbers become float32 if that is lossless, otherwise stay float64.
+    - Booleans stay bool, or become nullable boolean if values are missing.
+    - Text with few distinct values (like 'federung') becomes a category.
+    """
+    compact = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(series):
+            continue
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == "boolean":
+            compact[col] = series.astype("boolean") # booleans with gaps, e.g. after a concat
+        elif pd.api.types.is_numeric_dtype(series):
+            compact[col] = _compact_numeric(series)
+        elif len(series) and series.nunique(dropna=True) <= category_max_ratio * len(series):
+            compact[col] = series.astype("category")
+    return df.assign(**compact) if compact else df
+
+def dtype_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per column: old and new dtype, memory in bytes, and the bytes saved. The last row is the total."""
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        "before_dtype": before.dtypes.astype(str),
+        "after_dtype": after.dtypes.astype(str),
+        "before_bytes": before_bytes,
+        "after_bytes": after_bytes,
+        "saved_bytes": before_bytes - after_bytes,
+    })
+    report.loc["total"] = ["", "", before_bytes.sum(), after_bytes.sum(), before_bytes.sum() - after_bytes.sum()]
+    return report
+
+def count_failed_cells(raw: pd.Series, parsed: pd.Series) -> int:
+    """Number of non-empty cells that yielded no number."""
+    filled = raw.notna() & (raw.astype(str).str.strip() != '')
+    return int((filled & parsed.isna()).sum())
+
+@timed("processor.process_dataframe")
+def process_dataframe(raw_data: list[list[str]], optimize: bool = True) -> pd.DataFrame:
     """
-    Converts raw list of lists into a cleaned pandas DataFrame.
+    Converts raw list of lists into a cleaned pandas DataFrame. With
+    `optimize`, columns are stored in compact dtypes (see optimize_dtypes).
     """
     if not raw_data or len(raw_data) < 2:
         return pd.DataFrame()
@@ -51,32 +228,112 @@ def process_dataframe(raw_data: list[list[str]]) -> pd.DataFrame:
     
     df.columns = [clean_column_name(col) for col in df.columns]
 
+    # Drop the coupon code column if it exists, as it's not useful for analysis
+    if 'gutscheincode_werbung' in df.columns:
+        df = df.drop(columns=['gutscheincode_werbung'])
+
     # Dynamically find columns that seem numeric based on their name
     numeric_keywords = ['kg', 'km', 'wh', 'volt', 'ah', 'w', 'zollgröße', 'bis_kg', 'uvp']
     
     # Loop through all columns to clean and type-cast them
     for col in df.columns:
-        # Booleans
-        if 'toleranz_optimiert' in col or 'bremslicht' in col or 'wechselakku' in col:
-            df[col] = df[col].apply(lambda x: 'ja' in str(x).lower() or '✓' in str(x))
-            continue
-            
-        # Blinker count
-        if 'blinker' in col:
-            df[col] = df[col].apply(lambda x: parse_numeric_value(x) if x else 0).fillna(0).astype(int)
-            continue
+        with timer(f"processor.column.{col}"):
+            # Booleans
+            if 'toleranz_optimiert' in col or 'bremslicht' in col or 'wechselakku' in col:
+                df[col] = parse_boolean_series(df[col])
+                continue
 
-        # Check if any keyword matches to identify as numeric
-        if any(keyword in col for keyword in numeric_keywords):
-            df[col] = df[col].apply(parse_numeric_value)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Blinker count
+            if 'blinker' in col:
+                blinker = parse_numeric_series(df[col]).fillna(0)
+                missing = df[col].isna() # cells of tables without the column
+                df[col] = blinker.mask(missing).astype("Int64") if missing.any() else blinker.astype(int)
+                continue
 
-    # Drop the coupon code column if it exists, as it's not useful for analysis
-    if 'gutscheincode_werbung' in df.columns:
-        df = df.drop(columns=['gutscheincode_werbung'])
+            # Check if any keyword matches to identify as numeric
+            if any(keyword in col for keyword in numeric_keywords):
+                parsed = parse_numeric_series(df[col])
+                if instrumentation_enabled():
+                    count("processor.cells_failed", count_failed_cells(df[col], parsed))
+                df[col] = parsed
+
+    count("processor.rows", len(df))
+
+    if optimize:
+        compact = optimize_dtypes(df)
+        if instrumentation_enabled():
+            count("processor.bytes_saved", int(df.memory_usage(index=False, deep=True).sum() - compact.memory_usage(index=False, deep=True).sum()))
+        df = compact
 
     return df
 
+def _unique_headers(header: list[str], key: str) -> list[str]:
+    """Numbers repeated column names ('Preis', 'Preis 2'), so no column of a table is lost."""
+    seen, labels = {}, []
+    for col in header:
+        name = clean_column_name(col)
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            print(f"Warning: Table '{key}' has the column '{col}' more than once; keeping it as '{name}_{seen[name]}'.")
+            col = f"{col} {seen[name]}"
+        labels.append(col)
+    return labels
+
+def align_tables(tables: dict[str, list[list[str]]], status_column: str | None = STATUS_COLUMN) -> list[list[str]]:
+    """
+    Combines raw tables with different header sets into one raw table.
+
+    The columns are the union of all headers, matched by their cleaned name
+    and kept in order of first appearance. Repeated names within a table are
+    numbered ('preis', 'preis_2'). Cells of columns a table does not have
+    are None. With `status_column`, every row is tagged with the key of
+    the table it came from (e.g. 'current' or 'deprecated').
+
+    Args:
+        tables (dict[str, list[list[str]]]): Raw tables (header first) by key.
+        status_column (str | None): Name of the added tag column, or None for no tag.
+
+    Returns:
+        list[list[str]]: A single raw table in the format process_dataframe expects.
+    """
+    header, names = [], []
+    labels = {key: _unique_headers(rows[0], key) for key, rows in tables.items() if rows}
+    for key_labels in labels.values():
+        for col in key_labels:
+            if clean_column_name(col) not in names:
+                names.append(clean_column_name(col))
+                header.append(col)
+
+    combined = [header + [status_column] if status_column else header]
+    for key, rows in tables.items():
+        if len(rows) < 2:
+            continue
+        positions = {clean_column_name(col): i for i, col in enumerate(labels[key])}
+        order = [positions.get(name, -1) for name in names]
+        tag = [key] if status_column else []
+        # Pads short rows with None; also the None that index -1 (a missing column) picks
+        fill = [None] * (max(order) + 2)
+        if order == list(range(len(names))):
+            # Same columns in the same order, so rows only need padding
+            width = len(order)
+            combined.extend([row + tag if len(row) == width else (row + fill)[:width] + tag for row in rows[1:]])
+        else:
+            pick = itemgetter(*order) if len(order) > 1 else (lambda row: (row[order[0]],))
+            combined.extend([list(pick(row + fill)) + tag for row in rows[1:]])
+    return combined
+
+def process_tables(tables: dict[str, list[list[str]]], status_column: str | None = STATUS_COLUMN) -> pd.DataFrame:
+    """
+    Processes several raw tables into one DataFrame in a single pass.
+
+    The raw rows are aligned and concatenated first (see align_tables), so
+    every column is cleaned and type-cast once over the combined data.
+    """
+    df = process_dataframe(align_tables(tables, status_column))
+    if status_column and status_column in df.columns:
+        df[status_column] = pd.Categorical(df[status_column], categories=list(tables))
+    return df
+
 # Example usage for verification
 if __name__ == "__main__":
     from scraper import get_escooter_data
@@ -89,4 +346,7 @@ if __name__ == "__main__":
         df_current = process_dataframe(raw_data['current'])
         print(df_current.head())
         print("\nDataFrame Info (Current Models):")
-        df_current.info()
\ No newline at end of file
+        df_current.info()
+
+        print("\n--- Memory saved by compact dtypes ---")
+        print(dtype_report(process_dataframe(raw_data['current'], optimize=False), df_current))
@@ -0,0 +1,289 @@
+# src/filter_engine.py
+
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, timed
+
+DEFAULT_RESULT_CACHE_SIZE = 256
+
+@dataclass(frozen=True)
+class RangeFilter:
+    """Keeps rows whose numeric value lies between `low` and `high`. Missing values never match."""
+    column: str
+    low: float | None = None
+    high: float | None = None
+    include_low: bool = True
+    include_high: bool = True
+
+@dataclass(frozen=True)
+class CategoryFilter:
+    """Keeps rows whose value is one of `values`, like Series.isin."""
+    column: str
+    values: tuple
+
+COMPARISON_OPERATORS = ('<', '<=', '>', '>=', '==')
+
+def compare_filter(column: str, operator: str, value: float) -> RangeFilter:
+    """Translates a comparison such as `uvp <= 1000` into a RangeFilter."""
+    if operator == '<':
+        return RangeFilter(column, high=value, include_high=False)
+    elif operator == '<=':
+        return RangeFilter(column, high=value)
+    elif operator == '>':
+        return RangeFilter(column, low=value, include_low=False)
+    elif operator == '>=':
+        return RangeFilter(column, low=value)
+    elif operator == '==':
+        return RangeFilter(column, low=value, high=value)
+    raise ValueError(f"Invalid operator '{operator}'.")
+
+class _NumericIndex:
+    """A column's row positions sorted by value, so a range is two binary searches."""
+
+    def __init__(self, series: pd.Series):
+        self.values = series.to_numpy(dtype="float64", na_value=np.nan)
+        self.order = np.argsort(self.values, kind="stable") # NaN sorts last
+        self.sorted_values = self.values[self.order][:np.count_nonzero(~np.isnan(self.values))]
+        # Shared by every session, so nobody may change them in place
+        for array in (self.values, self.order, self.sorted_values):
+            array.flags.writeable = False
+
+    def positions(self, predicate: RangeFilter) -> np.ndarray:
+        if any(bound is not None and np.isnan(bound) for bound in (predicate.low, predicate.high)):
+            return self.order[:0] # every comparison with NaN is false, as in pandas
+        lo, hi = 0, len(self.sorted_values)
+        if predicate.low is not None:
+            side = 'left' if predicate.include_low else 'right'
+            lo = np.searchsorted(self.sorted_values, predicate.low, side=side)
+        if predicate.high is not None:
+            side = 'right' if predicate.include_high else 'left'
+            hi = np.searchsorted(self.sorted_values, predicate.high, side=side)
+        return self.order[lo:max(lo, hi)]
+
+class _CategoryIndex:
+    """A column as categorical codes, with a packed bitset of matching rows per value."""
+
+    def __init__(self, series: pd.Series):
+        self.codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        self.uniques = list(uniques)
+        self.lookup = {value: code for code, value in enumerate(self.uniques)}
+        self._bitsets = {}
+
+    def bitset(self, code: int) -> np.ndarray:
+        # Built on first use, so high-cardinality columns only pay for values that are queried
+        if code not in self._bitsets:
+            self._bitsets[code] = np.packbits(self.codes == code)
+        return self._bitsets[code]
+
+    def codes_for(self, values: Iterable) -> list[int]:
+        codes = []
+        for value in values:
+            if pd.isna(value):
+                codes.append(-1) # isin matches missing values against NaN/None
+            elif value in self.lookup:
+                codes.append(self.lookup[value])
+        return codes
+
+class FilterIndex:
+    """
+    Precomputed lookup structures for filtering one DataFrame.
+
+    All predicates of a filter spec are combined into a single packed bitset
+    and the DataFrame is sliced once at the end, instead of materializing a
+    new frame per filter. Per-column structures are built lazily on first use.
+    The DataFrame is treated as immutable; build a new index after changing it.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        # Held weakly so cached indexes never keep an old dataset alive
+        self._df = weakref.ref(df)
+        self.n_rows = len(df)
+        self._numeric = {}
+        self._categorical = {}
+
+    @property
+    def df(self) -> pd.DataFrame:
+        df = self._df()
+        if df is None:
+            raise ReferenceError("The DataFrame of this FilterIndex no longer exists.")
+        return df
+
+    def _numeric_index(self, column: str) -> _NumericIndex:
+        if column not in self._numeric:
+            self._numeric[column] = _NumericIndex(self.df[column])
+        return self._numeric[column]
+
+    def _category_index(self, column: str) -> _CategoryIndex:
+        if column not in self._categorical:
+            self._categorical[column] = _CategoryIndex(self.df[column])
+        return self._categorical[column]
+
+    def _bitset(self, predicate) -> np.ndarray:
+        if isinstance(predicate, RangeFilter):
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[self._numeric_index(predicate.column).positions(predicate)] = True
+            return np.packbits(mask)
+        if isinstance(predicate, CategoryFilter):
+            index = self._category_index(predicate.column)
+            bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for code in index.codes_for(predicate.values):
+                bits |= index.bitset(code)
+            return bits
+        raise TypeError(f"Unsupported filter: {predicate!r}")
+
+    @timed("filter.mask")
+    def mask(self, spec: Iterable) -> np.ndarray:
+        """Returns a boolean row mask matching every predicate in `spec`."""
+        combined = None
+        for predicate in spec:
+            bits = self._bitset(predicate)
+            combined = bits if combined is None else np.bitwise_and(combined, bits, out=combined)
+        if combined is None:
+            return np.ones(self.n_rows, dtype=bool)
+        return np.unpackbits(combined, count=self.n_rows).astype(bool)
+
+    def positions(self, spec: Iterable) -> np.ndarray:
+        """Returns the row positions matching every predicate in `spec`, in original order."""
+        return np.flatnonzero(self.mask(spec))
+
+    def values(self, column: str) -> np.ndarray:
+        """A numeric column as a read-only float64 array (NaN for missing), e.g. to aggregate over positions."""
+        return self._numeric_index(column).values
+
+    def mean(self, column: str, positions: np.ndarray) -> float:
+        """Mean of a numeric column over `positions`, ignoring missing values (NaN if there are none)."""
+        values = self._numeric_index(column).values[positions]
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else np.nan
+
+    def bounds(self, column: str) -> tuple[float, float]:
+        """Smallest and largest value of a numeric column, or (nan, nan) if it has none."""
+        sorted_values = self._numeric_index(column).sorted_values
+        if not len(sorted_values):
+            return np.nan, np.nan
+        return sorted_values[0], sorted_values[-1]
+
+    def categories(self, column: str) -> list:
+        """The distinct values of a column, without missing values, in order of first appearance."""
+        return self._category_index(column).uniques
+
+    def sort_positions(self, positions: np.ndarray, column: str, ascending: bool = True) -> np.ndarray:
+        """
+        Orders row positions by a numeric column using its presorted index,
+        without touching the DataFrame. Missing values go last either way;
+        ties keep their original order.
+        """
+        index = self._numeric_index(column)
+        keep = np.zeros(self.n_rows, dtype=bool)
+        keep[positions] = True
+        ordered = index.order[keep[index.order]]
+        if not ascending:
+            present = np.count_nonzero(~np.isnan(index.values[ordered]))
+            # Largest first; ties stay in original order like a stable descending sort
+            values = index.values[ordered[:present]]
+            descending = ordered[:present][np.lexsort((np.arange(present), -values))]
+            ordered = np.concatenate([descending, ordered[present:]])
+        return ordered
+
+    def apply(self, spec: Iterable) -> pd.DataFrame:
+        """Returns the matching rows of the DataFrame, sliced once."""
+        spec = list(spec)
+        if not spec:
+            return self.df
+        return self.df.iloc[self.positions(spec)]
+
+_indexes = {}
+
+def index_for(df: pd.DataFrame) -> FilterIndex:
+    """Returns the FilterIndex of `df`, building it on first use and dropping it with the DataFrame."""
+    key = id(df)
+    entry = _indexes.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    index = FilterIndex(df)
+    _indexes[key] = (index._df, index)
+    weakref.finalize(df, _indexes.pop, key, None)
+    return index
+
+# --- Result Cache ---
+
+def canonical_spec(spec: Iterable) -> tuple:
+    """
+    Normalizes a filter spec into a hashable key. Predicates are ordered by
+    column, range bounds become floats and category values are deduplicated
+    and sorted, so every spelling of the same filter state gives the same key.
+    """
+    normalized = []
+    for predicate in spec:
+        if isinstance(predicate, RangeFilter):
+            predicate = RangeFilter(
+                predicate.column,
+                None if predicate.low is None else float(predicate.low),
+                None if predicate.high is None else float(predicate.high),
+                predicate.include_low, predicate.include_high,
+            )
+        elif isinstance(predicate, CategoryFilter):
+            predicate = CategoryFilter(predicate.column, tuple(sorted(set(predicate.values), key=repr)))
+        else:
+            raise TypeError(f"Unsupported filter: {predicate!r}")
+        normalized.append(predicate)
+    return tuple(sorted(normalized, key=lambda predicate: (predicate.column, type(predicate).__name__, repr(predicate))))
+
+class ResultCache:
+    """
+    Bounded LRU cache of filter results, safe to share between threads.
+
+    Keys should contain the dataset version and a canonical_spec, so equal
+    filter states share one entry and results never outlive their dataset.
+    Values are computed outside the lock; two callers missing the same key
+    at once may both compute it, and the last one wins.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_RESULT_CACHE_SIZE, name: str = "filter.results"):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable):
+        """Returns the cached value for `key`, calling `compute()` to fill it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                count(f"{self.name}.hits")
+                return self._entries[key]
+            self.misses += 1
+        count(f"{self.name}.misses")
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "hit_ratio": self.hit_ratio}
@@ -0,0 +1,173 @@
+# src/instrumentation.py
+
+import json
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Callable
+
+# Off unless ESCOOTER_PROFILE is set (or enable() is called). While off, timers
+# and counters return after a single flag check, so they can stay in hot paths.
+_enabled = os.environ.get("ESCOOTER_PROFILE", "") not in ("", "0")
+_lock = threading.Lock()
+_timers = {} # name -> [count, total, min, max] in seconds
+_counters = {} # name -> total
+_log_file = None
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(log_path: Path | None = None):
+    """
+    Starts collecting timings and counters. With `log_path`, every timing and
+    counter update is also appended to that file as a JSON line.
+    """
+    global _enabled, _log_file
+    with _lock:
+        if log_path is not None:
+            if _log_file is not None:
+                _log_file.close()
+            _log_file = open(log_path, "a", encoding="utf-8", buffering=1)
+        _enabled = True
+
+def disable():
+    """Stops collecting. Collected values are kept until reset()."""
+    global _enabled, _log_file
+    with _lock:
+        _enabled = False
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def _log(event: dict):
+    # Called with _lock held
+    if _log_file is not None:
+        event["ts"] = round(time.time(), 6)
+        _log_file.write(json.dumps(event) + "\n")
+
+# --- Recording ---
+
+def record_time(name: str, seconds: float):
+    """Adds one measured duration to the timer `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            _timers[name] = [1, seconds, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = min(stats[2], seconds)
+            stats[3] = max(stats[3], seconds)
+        _log({"type": "timer", "name": name, "seconds": round(seconds, 9)})
+
+def count(name: str, amount: int = 1):
+    """Adds `amount` to the counter `name`, e.g. bytes fetched or rows parsed."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+        _log({"type": "counter", "name": name, "amount": amount})
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_time(self.name, time.perf_counter() - self.started)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name: str):
+    """
+    Context manager that times its block under `name`.
+
+    Example:
+        with timer("app.filter"):
+            df = index_for(df_original).apply(filter_spec)
+    """
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+def timed(name: str | None = None) -> Callable:
+    """Decorator that times every call of a function, by default under its module and name."""
+    def decorate(func: Callable) -> Callable:
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_time(label, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+# --- Export ---
+
+def snapshot() -> dict:
+    """The collected timers (in seconds) and counters as plain data."""
+    with _lock:
+        timers = {
+            name: {"count": n, "total_s": total, "mean_s": total / n, "min_s": low, "max_s": high}
+            for name, (n, total, low, high) in sorted(_timers.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    return {"enabled": _enabled, "timers": timers, "counters": counters}
+
+def to_json() -> str:
+    return json.dumps(snapshot(), indent=2)
+
+def _metric_name(name: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in name)
+
+def to_prometheus(prefix: str = "escooter") -> str:
+    """The snapshot in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    if data["timers"]:
+        lines.append(f"# HELP {prefix}_duration_seconds Time spent per instrumented step.")
+        lines.append(f"# TYPE {prefix}_duration_seconds summary")
+        for name, stats in data["timers"].items():
+            lines.append(f'{prefix}_duration_seconds_sum{{step="{name}"}} {stats["total_s"]:.9f}')
+            lines.append(f'{prefix}_duration_seconds_count{{step="{name}"}} {stats["count"]}')
+        lines.append(f"# HELP {prefix}_duration_seconds_max Longest single run per instrumented step.")
+        lines.append(f"# TYPE {prefix}_duration_seconds_max gauge")
+        for name, stats in data["timers"].items():
+            lines.append(f'{prefix}_duration_seconds_max{{step="{name}"}} {stats["max_s"]:.9f}')
+    for name, value in data["counters"].items():
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def write(path: Path):
+    """Writes the snapshot as Prometheus text for .prom/.txt files, otherwise as JSON."""
+    path = Path(path)
+    text = to_prometheus() if path.suffix in (".prom", ".txt") else to_json()
+    path.write_text(text, encoding="utf-8")
@@ -1,96 +1,241 @@
 # src/main.py
 
-import pandas as pd
-from rich.console import Console
-from rich.table import Table
-from rich.prompt import Prompt
+# Annotations stay unevaluated, so pandas types can be named without importing pandas
+from __future__ import annotations
+
+import argparse
+import contextlib
 import os
-import time
+import sys
+import threading
+from datetime import datetime
 from pathlib import Path
-from pandas.api.types import is_numeric_dtype, is_bool_dtype
+from typing import TYPE_CHECKING
+
+from rich.console import Console
+from rich.markup import escape
+
+import instrumentation
 
-from scraper import get_escooter_data
-from data_processor import process_dataframe
-from filter_sort import filter_by_numeric, filter_by_categorical, sort_by_column
+# pandas, the cache and the scraping stack are imported inside the commands
+# that need them, so the menu, --help and argument errors appear immediately
+if TYPE_CHECKING:
+    import pandas as pd
+    from cache import DatasetCache
+    from refresher import RefreshStatus
 
 # --- Configuration ---
 ESCOOTER_URL = "https://www.escooter-treff.de/tabelle/"
 CONSOLE = Console()
-CACHE_FILE = Path("data/escooter_data.csv") # Store data in a dedicated folder
+EXPORT_FILE = Path("data/escooter_export.csv")
 CACHE_DURATION_SECONDS = 24 * 60 * 60 # 24 hours
+PAGE_SIZE = 25 # rows per page in the terminal, like viewer.DEFAULT_PAGE_SIZE
+DATASET_CHOICES = ("current", "all") # cache.DATASET_VARIANTS, spelled out so parsing arguments needs no pandas
+SOURCE_NAMES = [] # registered sources to scrape, from --source; empty uses ESCOOTER_SOURCES or ESCOOTER_URL
+DATASET_VARIANT = "current" # from --dataset; "all" adds the deprecated models
+
 
+def open_cache() -> DatasetCache:
+    """The shared cache, scraping the sources chosen with --source or ESCOOTER_SOURCES if any."""
+    from cache import DatasetCache
+
+    sources = None
+    if SOURCE_NAMES or os.environ.get("ESCOOTER_SOURCES"):
+        from sources import configured_sources # only needed for multi-source setups
+        sources = configured_sources(SOURCE_NAMES)
+    return DatasetCache(ESCOOTER_URL, ttl=CACHE_DURATION_SECONDS, sources=sources, variant=DATASET_VARIANT)
+
+def display_dataframe(df: pd.DataFrame, title: str = "E-Scooter Data", page: int = 0,
+                      page_size: int = PAGE_SIZE, columns: list[str] | None = None):
+    """Displays one page of a pandas DataFrame using rich.table."""
+    from viewer import PagedTable
 
-def display_dataframe(df: pd.DataFrame, title: str = "E-Scooter Data"):
-    """Displays a pandas DataFrame using rich.table."""
     if df.empty:
         CONSOLE.print("[yellow]No data to display. Your filters might be too restrictive.[/yellow]")
         return
-        
-    rich_table = Table(title=title, show_header=True, header_style="bold magenta")
-    
-    for column in df.columns:
-        rich_table.add_column(column)
-        
-    for _, row in df.iterrows():
-        rich_table.add_row(*[str(item) if pd.notna(item) else "" for item in row])
-        
-    CONSOLE.print(rich_table)
-
-def load_data() -> pd.DataFrame:
+
+    view = PagedTable(df, page_size=page_size, columns=columns, title=title)
+    view.jump(page)
+    CONSOLE.print(view.render())
+
+def browse_dataframe(df: pd.DataFrame, title: str = "E-Scooter Data", columns: list[str] | None = None) -> list[str] | None:
     """
-    Loads data from cache if it's recent, otherwise scrapes from the web
-    and updates the cache.
+    Shows a DataFrame page by page with next/previous/jump navigation and
+    column selection. Returns the selected columns so they can be kept.
     """
-    CACHE_FILE.parent.mkdir(exist_ok=True)
+    from rich.prompt import Prompt
+    from viewer import PagedTable
+
+    if df.empty:
+        CONSOLE.print("[yellow]No data to display. Your filters might be too restrictive.[/yellow]")
+        return columns
 
-    if CACHE_FILE.exists():
-        file_mod_time = CACHE_FILE.stat().st_mtime
-        if (time.time() - file_mod_time) < CACHE_DURATION_SECONDS:
-            CONSOLE.print(f"[bold green]✓ Loading data from local cache...[/bold green]")
-            return pd.read_csv(CACHE_FILE)
+    view = PagedTable(df, page_size=PAGE_SIZE, columns=columns, title=title)
+    while True:
+        CONSOLE.print(view.render())
+        if view.n_pages == 1:
+            action = Prompt.ask("\\[c]olumns, \\[q]uit", choices=["c", "q"], default="q")
+        else:
+            action = Prompt.ask("\\[n]ext, \\[p]revious, \\[j]ump to page, \\[c]olumns, \\[q]uit", choices=["n", "p", "j", "c", "q"], default="n")
 
-    CONSOLE.print("[bold yellow]Cache old or missing. Scraping fresh data from the web...[/bold yellow]")
-    with CONSOLE.status("[bold green]Scraping and processing...[/bold green]"):
-        raw_data = get_escooter_data(ESCOOTER_URL)
-    
-    if 'current' in raw_data:
-        df = process_dataframe(raw_data['current'])
-        df.to_csv(CACHE_FILE, index=False)
-        CONSOLE.print(f"[bold green]✓ Success![/bold green] Saved fresh data to cache.")
-        return df
+        if action == 'n':
+            view.next()
+        elif action == 'p':
+            view.prev()
+        elif action == 'j':
+            try:
+                view.jump(int(Prompt.ask(f"Page (1-{view.n_pages})")) - 1)
+            except ValueError:
+                CONSOLE.print("[red]Invalid page number.[/red]")
+        elif action == 'c':
+            for i, col in enumerate(df.columns):
+                CONSOLE.print(f"  [{i}] {col}")
+            indices_str = Prompt.ask("Enter the numbers of the columns to show (e.g., '0, 1, 4'), or leave empty for all", default="")
+            try:
+                view.project([df.columns[int(i)] for i in indices_str.replace(" ", "").split(',') if i])
+            except (ValueError, IndexError):
+                CONSOLE.print("[red]Invalid selection.[/red]")
+        else:
+            return view.columns if len(view.columns) < len(df.columns) else None
+
+def rank_dataframe(df: pd.DataFrame):
+    """Asks for criteria and shows `df` ranked by a weighted score, or only its Pareto front."""
+    from rich.prompt import Prompt
+    from ranking import DERIVED_METRICS, SCORE_COLUMN, Criterion, available_criteria, pareto_front, parse_criteria, rank, with_metrics
+
+    if df.empty:
+        CONSOLE.print("[yellow]No data to rank. Your filters might be too restrictive.[/yellow]")
+        return
+
+    names = available_criteria(df)
+    for name in names:
+        CONSOLE.print(f"  {name} ({'higher' if Criterion(name).more_is_better else 'lower'} is better)")
+    text = Prompt.ask("Enter criteria as name[:weight][:min|max], comma-separated (e.g., 'eur_per_km:2, gewicht_kg')")
+    try:
+        criteria = parse_criteria(text)
+        unknown = [criterion.column for criterion in criteria if criterion.column not in names]
+        if not criteria or unknown:
+            raise ValueError(f"Unknown criteria: {', '.join(unknown)}" if unknown else "No criteria given.")
+    except ValueError as e:
+        CONSOLE.print(f"[red]{escape(str(e))}[/red]")
+        return
+
+    mode = Prompt.ask("\\[s]core or \\[p]areto front (models nothing beats on every criterion)", choices=["s", "p"], default="s")
+    used = [criterion.column for criterion in criteria]
+    if mode == 's':
+        result = rank(df, criteria)
+        title = "Ranked by " + ", ".join(f"{criterion.column} x{criterion.weight:g}" for criterion in criteria)
+        used.append(SCORE_COLUMN)
     else:
+        result = with_metrics(df.iloc[pareto_front(df, criteria)], used)
+        title = f"Pareto front of {len(df)} models: " + ", ".join(used)
+    # The criteria come first, after the model name; ratios and scores are rounded for the terminal
+    result = result.round({col: 3 for col in used if col in DERIVED_METRICS or col == SCORE_COLUMN})
+    leading = [col for col in ["model", *used] if col in result.columns]
+    browse_dataframe(result, title=title, columns=leading + [col for col in result.columns if col not in leading])
+
+class BackgroundLoad(threading.Thread):
+    """
+    Loads data from the shared cache if it's recent, otherwise scrapes from
+    the web and updates the cache. Stale data is served while it is
+    revalidated in the background.
+
+    Runs in a background thread, together with importing pandas, so the
+    menu can be shown right away. Finish with wait_for_data().
+    """
+
+    def __init__(self):
+        # A daemon thread, so choosing Exit never waits for a scrape to finish
+        super().__init__(name="load-data", daemon=True)
+        self.cache = None
+        self.df = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.cache = open_cache()
+            self.df = self.cache.get()
+        except BaseException as e:
+            self.error = e
+
+def wait_for_data(loading: BackgroundLoad) -> pd.DataFrame:
+    """Waits for a BackgroundLoad and reports where the data came from."""
+    if loading.is_alive():
+        with CONSOLE.status("[bold green]Loading data...[/bold green]"):
+            loading.join()
+    if loading.error is not None:
+        raise loading.error
+    report_load(loading.cache, loading.df)
+    return loading.df
+
+def report_load(cache: DatasetCache, df: pd.DataFrame):
+    """Tells where the data came from, based on the cache's last status."""
+    if cache.last_status == "hit":
+        CONSOLE.print(f"[bold green]✓ Loading data from local cache...[/bold green]")
+    elif cache.last_status == "stale":
+        CONSOLE.print("[bold green]✓ Loading data from local cache...[/bold green] Refreshing it in the background.")
+    elif cache.last_status == "unchanged":
+        CONSOLE.print("[bold green]✓ Data unchanged upstream.[/bold green] Reusing local cache.")
+    elif cache.last_status == "refreshed":
+        CONSOLE.print(f"[bold green]✓ Success![/bold green] Saved fresh data to cache.")
+    elif df.empty:
         CONSOLE.print("[bold red]✗ Error:[/bold red] Could not retrieve e-scooter data.")
-        return pd.DataFrame()
+    else:
+        CONSOLE.print("[bold yellow]Could not refresh the data.[/bold yellow] Using the last cached version.")
+
+def ask_menu_choice() -> str:
+    """Shows the main menu and returns the chosen option."""
+    from rich.prompt import Prompt
+
+    CONSOLE.print("\n[bold cyan]E-Scooter Analyzer Menu[/bold cyan]")
+    CONSOLE.print("[1] Filter Data")
+    CONSOLE.print("[2] Sort Data")
+    CONSOLE.print("[3] Display Current List")
+    CONSOLE.print("[4] Undo Last Step")
+    CONSOLE.print("[5] Reset to Full List")
+    CONSOLE.print("[6] Export Current List to CSV")
+    CONSOLE.print("[7] Rank Current List")
+    CONSOLE.print("[8] Exit")
+    return Prompt.ask("Choose an option", choices=["1", "2", "3", "4", "5", "6", "7", "8"], default="3")
 
-def main_menu(df_original: pd.DataFrame):
-    """The main interactive loop for filtering and sorting."""
-    df_current = df_original.copy()
+def main_menu(df_original: pd.DataFrame, choice: str | None = None):
+    """The main interactive loop for filtering and sorting, starting with `choice` if given."""
+    from pandas.api.types import is_bool_dtype, is_numeric_dtype
+    from rich.prompt import Prompt
+    from cache import export_csv
+    from query import LazyQuery
+    from search import SEARCH_COLUMNS
+
+    # Steps are recorded lazily and only evaluated when the list is displayed
+    query = LazyQuery(df_original)
+    view_columns = None
+
+    def show():
+        nonlocal view_columns
+        plan = query.describe()
+        view_columns = browse_dataframe(query.collect(), title=f"E-Scooter Data ({plan})" if plan else "E-Scooter Data", columns=view_columns)
 
     while True:
-        CONSOLE.print("\n[bold cyan]E-Scooter Analyzer Menu[/bold cyan]")
-        CONSOLE.print("[1] Filter Data")
-        CONSOLE.print("[2] Sort Data")
-        CONSOLE.print("[3] Display Current List")
-        CONSOLE.print("[4] Reset to Full List")
-        CONSOLE.print("[5] Exit")
-        
-        choice = Prompt.ask("Choose an option", choices=["1", "2", "3", "4", "5"], default="3")
+        if choice is None:
+            choice = ask_menu_choice()
 
         if choice == '1': # Filter
-            for i, col in enumerate(df_current.columns):
-                CONSOLE.print(f"  [{i}] {col} ({df_current[col].dtype})")
+            columns = query.base.columns
+            for i, col in enumerate(columns):
+                CONSOLE.print(f"  [{i}] {col} ({query.base[col].dtype})")
             
             col_index = int(Prompt.ask("Enter the number of the column to filter by"))
-            column_name = df_current.columns[col_index]
+            column_name = columns[col_index]
 
-            # --- THIS IS THE FIX ---
-            # Check if the column is numeric BUT NOT boolean
-            if is_numeric_dtype(df_current[column_name]) and not is_bool_dtype(df_current[column_name]):
+            if column_name in SEARCH_COLUMNS: # too many names to list; search them instead
+                text = Prompt.ask(f"Search '{column_name}' (typos and unfinished words are fine)")
+                query.search(text)
+            elif is_numeric_dtype(query.base[column_name]) and not is_bool_dtype(query.base[column_name]): # numeric BUT NOT boolean
                 op = Prompt.ask(f"Filter '{column_name}' | Enter operator", choices=['<', '<=', '>', '>=', '=='], default='<=')
                 val = float(Prompt.ask("Enter value"))
-                df_current = filter_by_numeric(df_current, column_name, op, val)
+                query.filter_numeric(column_name, op, val)
             else: # This block now correctly handles Boolean, Object, and Category types
-                options = sorted(df_current[column_name].dropna().unique().tolist())
+                options = sorted(query.collect()[column_name].dropna().unique().tolist())
                 
                 CONSOLE.print(f"Available options for '{column_name}':")
                 for i, option in enumerate(options):
@@ -100,39 +245,361 @@ def main_menu(df_original: pd.DataFrame):
                 indices = indices_str.replace(" ", "").split(',')
                 try:
                     selected = [options[int(i)] for i in indices if i]
-                    df_current = filter_by_categorical(df_current, column_name, selected)
+                    query.filter_categorical(column_name, selected)
                 except (ValueError, IndexError):
                     CONSOLE.print("[red]Invalid selection.[/red]")
 
-            display_dataframe(df_current)
+            show()
 
         elif choice == '2': # Sort
-            for i, col in enumerate(df_current.columns):
+            columns = query.base.columns
+            for i, col in enumerate(columns):
                 CONSOLE.print(f"  [{i}] {col}")
             col_index = int(Prompt.ask("Enter the number of the column to sort by"))
-            column_name = df_current.columns[col_index]
+            column_name = columns[col_index]
 
             order = Prompt.ask("Sort order", choices=['asc', 'desc'], default='asc')
-            df_current = sort_by_column(df_current, column_name, ascending=(order == 'asc'))
-            display_dataframe(df_current)
+            query.sort(column_name, ascending=(order == 'asc'))
+            show()
 
         elif choice == '3': # Display
-            display_dataframe(df_current)
+            show()
+
+        elif choice == '4': # Undo
+            if query.undo():
+                CONSOLE.print("[green]Last step undone.[/green]")
+                show()
+            else:
+                CONSOLE.print("[yellow]Nothing to undo.[/yellow]")
 
-        elif choice == '4': # Reset
-            df_current = df_original.copy()
+        elif choice == '5': # Reset
+            query.reset()
             CONSOLE.print("[green]Filters and sorting have been reset.[/green]")
-            display_dataframe(df_current)
+            show()
 
-        elif choice == '5': # Exit
+        elif choice == '6': # Export
+            df_current = query.collect()
+            export_csv(df_current, EXPORT_FILE)
+            CONSOLE.print(f"[green]Exported {len(df_current)} rows to {EXPORT_FILE}.[/green]")
+
+        elif choice == '7': # Rank
+            rank_dataframe(query.collect())
+
+        elif choice == '8': # Exit
             CONSOLE.print("[bold]Goodbye![/bold]")
             break
 
-if __name__ == "__main__":
-    df = load_data()
-    
-    if not df.empty:
-        CONSOLE.print(f"Loaded {len(df)} e-scooters.")
-        main_menu(df)
+        choice = None
+
+def print_refresh_status(status: RefreshStatus):
+    """Prints the outcome of a scheduled refresh."""
+    finished = datetime.fromtimestamp(status.last_refresh_at).strftime("%Y-%m-%d %H:%M:%S")
+    if status.failed:
+        CONSOLE.print(f"[red]{finished} ✗ Refresh failed after {status.last_duration:.1f}s:[/red] {status.last_error}")
     else:
-        CONSOLE.print("[bold red]Could not load any data to analyze.[/bold red]")
\ No newline at end of file
+        CONSOLE.print(f"[green]{finished} ✓ Refresh finished in {status.last_duration:.1f}s ({status.last_result}).[/green]")
+
+def run_refresh_daemon(profile_output: Path | None = None):
+    """
+    Keeps the shared cache warm so neither the CLI nor the web app ever waits for a scrape.
+    With `profile_output`, the metrics file is rewritten after every refresh.
+    """
+    def on_refresh(status: RefreshStatus):
+        print_refresh_status(status)
+        if profile_output:
+            instrumentation.write(profile_output)
+
+    from refresher import RefreshScheduler
+
+    cache = open_cache()
+    scheduler = RefreshScheduler(cache, on_refresh=on_refresh)
+    CONSOLE.print(f"[bold cyan]Refreshing {ESCOOTER_URL} before its {CACHE_DURATION_SECONDS // 3600}h cache expires. Press Ctrl+C to stop.[/bold cyan]")
+    scheduler.run_forever()
+
+def run_refresh():
+    """Refreshes the shared cache once, regardless of its age."""
+    from refresher import RefreshScheduler
+
+    scheduler = RefreshScheduler(open_cache(), on_refresh=print_refresh_status)
+    with CONSOLE.status("[bold green]Scraping and processing...[/bold green]"):
+        started = scheduler.refresh_now()
+    if not started:
+        CONSOLE.print("[yellow]Another process is already refreshing the cache.[/yellow]")
+
+def run_history(model: str | None, column: str, as_of: str | None):
+    """Shows how one model's value changed over time, or the whole dataset as of a date."""
+    import pandas as pd
+
+    store = open_cache().history()
+    if not store.entries():
+        CONSOLE.print("[yellow]No snapshots recorded yet. Run 'refresh' to record one.[/yellow]")
+        return
+
+    if as_of:
+        df = store.as_of(as_of)
+        if df.empty:
+            CONSOLE.print(f"[yellow]No snapshot recorded on or before {as_of}.[/yellow]")
+        else:
+            browse_dataframe(df, title=f"E-Scooter Data as of {as_of}")
+    elif model:
+        changes = store.history(model, column)
+        if changes.empty:
+            CONSOLE.print(f"[yellow]No recorded values of '{column}' for '{model}'.[/yellow]")
+        else:
+            changes["taken_at"] = changes["taken_at"].dt.strftime("%Y-%m-%d %H:%M")
+            display_dataframe(changes, title=f"{model}: {column}", page_size=len(changes))
+    else:
+        entries = pd.DataFrame(store.entries())[["seq", "taken_at", "added", "changed"]]
+        entries["removed"] = [len(entry["removed"]) for entry in store.entries()]
+        display_dataframe(entries, title="Recorded snapshots", page_size=len(entries))
+
+def load_headless(cache: DatasetCache | None = None) -> pd.DataFrame:
+    """
+    Loads the data from `cache`, or from open_cache(), which imports the cache
+    and scraping stack only now. Their messages go to stderr, so stdout stays
+    free for query results. Exits with status 1 if no data could be loaded.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        df = (cache or open_cache()).get()
+    if df.empty:
+        CONSOLE.print("[bold red]✗ Error:[/bold red] Could not retrieve e-scooter data.")
+        raise SystemExit(1)
+    return df
+
+def run_search(text: str, limit: int):
+    """Shows the models whose names best match `text`, tolerating typos and unfinished words."""
+    from search import search_index_for
+
+    df = load_headless()
+    positions = search_index_for(df).search(text, limit)
+    if not len(positions):
+        CONSOLE.print(f"[yellow]No model matches '{escape(text)}'.[/yellow]")
+        return
+    display_dataframe(df.iloc[positions], title=f"Search: {text}", page_size=len(positions))
+
+def run_stats(column: str | None, where: list[str], by: str):
+    """
+    Prints the statistics pre-aggregated for the cached dataset: a summary
+    per numeric column, averages per value of `by` and the battery/range
+    line. With --where, they cover the matching rows; their quantiles and
+    histograms then come from the stored histogram bins.
+    """
+    from rich.table import Table
+
+    from batch import QueryError, parse_condition
+    from filter_engine import index_for
+    from query import LazyQuery
+    from stats import QUANTILES
+
+    cache = open_cache()
+    df = load_headless(cache)
+    stats = cache.stats()
+    positions = None
+    try:
+        if where:
+            query = LazyQuery(df)
+            for condition in where:
+                query.where(parse_condition(df, condition))
+            positions = query.positions()
+        if column is not None and column not in stats.columns:
+            raise QueryError(f"'{column}' is not a numeric column. Available: {', '.join(stats.columns)}")
+        if by not in stats.groups:
+            raise QueryError(f"Cannot group by '{by}'. Available: {', '.join(stats.groups)}")
+    except QueryError as e:
+        CONSOLE.print(f"[bold red]✗ Error:[/bold red] {escape(str(e))}")
+        raise SystemExit(2)
+    n_rows = stats.n_rows if positions is None else len(positions)
+    scope = "all" if positions is None else f"{n_rows} of {stats.n_rows} matching {', '.join(where)}"
+    if not n_rows:
+        CONSOLE.print("[yellow]No rows match these conditions.[/yellow]")
+        return
+
+    index = index_for(df)
+    summary = Table(title=f"Statistics ({escape(scope)})", show_header=True, header_style="bold magenta")
+    for heading in ("Column", "Count", "Mean", *(f"P{level * 100:g}" for level in QUANTILES)):
+        summary.add_column(heading, justify="left" if heading == "Column" else "right")
+    for name in [column] if column else stats.columns:
+        counts = stats.histogram(name, positions)[1]
+        mean = stats.columns[name]["mean"] if positions is None else index.mean(name, positions)
+        summary.add_row(name, f"{counts.sum():,}", f"{mean:,.1f}",
+                        *(f"{value:,.1f}" for value in stats.quantiles(name, positions).values()))
+    CONSOLE.print(summary)
+    if positions is not None:
+        CONSOLE.print("[dim]Quantiles of filtered rows are estimated from the histogram bins.[/dim]")
+
+    if column:
+        edges, counts = stats.histogram(column, positions)
+        # Leave out the empty bins at both ends, e.g. outside a --where range
+        filled = counts.nonzero()[0]
+        if not len(filled):
+            CONSOLE.print(f"[yellow]No values of '{escape(column)}' in these rows.[/yellow]")
+        else:
+            edges, counts = edges[filled[0]:filled[-1] + 2], counts[filled[0]:filled[-1] + 1]
+            histogram = Table(title=f"Histogram of {column}", show_header=True, header_style="bold magenta")
+            for heading in ("From", "To", "Count", ""):
+                histogram.add_column(heading, justify="left" if not heading else "right")
+            for low, high, n in zip(edges[:-1], edges[1:], counts):
+                histogram.add_row(f"{low:,.0f}", f"{high:,.0f}", f"{n:,}", "█" * round(40 * n / max(counts.max(), 1)))
+            CONSOLE.print(histogram)
+
+    groups = stats.group_means(df, by, positions)
+    groups = groups[groups["count"] > 0]
+    display_dataframe(groups.reset_index().round(1), title=f"Averages by {by}", page_size=len(groups))
+
+    for fit in stats.regressions:
+        fit = stats.regression(df, fit["x"], fit["y"], positions)
+        if fit["n"] >= 2 and fit["slope"] == fit["slope"]: # not NaN
+            CONSOLE.print(f"{fit['y']} ≈ {fit['slope']:.4f} × {fit['x']} {fit['intercept']:+.1f} "
+                          f"(R² = {fit['r2']:.2f}, {fit['n']} rows)")
+
+def run_query_command(args: argparse.Namespace):
+    """Runs one query from flags and/or a query file and writes the result to stdout or --output."""
+    from batch import OUTPUT_FORMATS, BatchQuery, QueryError, read_query_file, run_query, write_result
+
+    try:
+        spec = read_query_file(args.query_file) if args.query_file else {}
+        # Flags override the file; conditions from both apply
+        if args.where:
+            where = spec.get("where") or []
+            spec["where"] = ([where] if isinstance(where, str) else list(where)) + args.where
+        for key in ("sort", "columns", "limit", "format"):
+            if getattr(args, key) is not None:
+                spec[key] = getattr(args, key)
+        if "format" not in spec and args.output is not None and args.output.suffix.lstrip(".") in OUTPUT_FORMATS:
+            spec["format"] = args.output.suffix.lstrip(".")
+        query = BatchQuery.from_dict(spec)
+        write_result(run_query(load_headless(), query), query.format, args.output)
+    except QueryError as e:
+        CONSOLE.print(f"[bold red]✗ Error:[/bold red] {escape(str(e))}")
+        raise SystemExit(2)
+
+def run_query_server(socket_path: Path | None, port: int | None, output_dir: Path | None = None):
+    """Answers JSON queries, one per line, from stdin or a local socket with the data kept in memory."""
+    from batch import QueryServer
+
+    cache = open_cache()
+    df = load_headless(cache)
+    # load() only re-reads the file after a refresh, e.g. by refresh-daemon
+    server = QueryServer(lambda: cache.load() if cache.path.exists() else df, output_dir=output_dir)
+    if socket_path is None and port is None:
+        server.serve_stream(sys.stdin, sys.stdout)
+    else:
+        CONSOLE.print(f"[bold cyan]Serving {len(df)} e-scooters on {socket_path or f'127.0.0.1:{port}'}. Press Ctrl+C to stop.[/bold cyan]")
+        server.serve_socket(socket_path, port)
+
+def print_profile():
+    """Prints the timings and counters collected with --profile."""
+    from rich.table import Table
+
+    data = instrumentation.snapshot()
+    timings = Table(title="Profile", show_header=True, header_style="bold magenta")
+    for column in ("Step", "Calls", "Total ms", "Mean ms", "Max ms"):
+        timings.add_column(column, justify="left" if column == "Step" else "right")
+    for name, stats in sorted(data["timers"].items(), key=lambda item: -item[1]["total_s"]):
+        timings.add_row(name, str(stats["count"]), f"{stats['total_s'] * 1000:.1f}",
+                        f"{stats['mean_s'] * 1000:.2f}", f"{stats['max_s'] * 1000:.1f}")
+    CONSOLE.print(timings)
+
+    if data["counters"]:
+        counters = Table(show_header=True, header_style="bold magenta")
+        counters.add_column("Counter")
+        counters.add_column("Value", justify="right")
+        for name, value in data["counters"].items():
+            counters.add_row(name, f"{value:,}")
+        CONSOLE.print(counters)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Analyze, filter and sort e-scooter data.")
+    parser.add_argument("--profile", action="store_true", help="Time the scraping, processing, filtering and rendering steps and print a summary on exit.")
+    parser.add_argument("--profile-output", type=Path, help="Also write the profile to this file: Prometheus text for .prom/.txt, JSON otherwise.")
+    parser.add_argument("--dataset", choices=DATASET_CHOICES, default="current",
+                        help="'current' models only (default), or 'all' including deprecated ones, with a status column.")
+    parser.add_argument("--source", action="append", default=[], metavar="NAME",
+                        help="Scrape this registered source (see sources.py); repeat to merge several.")
+    parser.add_argument("--profile-log", type=Path, help="Also append every measurement to this file as a JSON line.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("menu", help="Start the interactive menu (default).")
+    subparsers.add_parser("refresh", help="Scrape and cache fresh data once.")
+    subparsers.add_parser("refresh-daemon", help="Keep the cache warm by refreshing it before it expires.")
+    history_parser = subparsers.add_parser("history", help="Show recorded snapshots, a model's price history or past data.")
+    history_parser.add_argument("model", nargs="?", help="Model whose changes to show. Lists all snapshots if omitted.")
+    history_parser.add_argument("--column", default="uvp", help="Column to follow for the model (default: uvp).")
+    history_parser.add_argument("--as-of", help="Browse the dataset as it was on this date (YYYY-MM-DD) or time.")
+    search_parser = subparsers.add_parser("search", help="Find models by name, tolerating typos and unfinished words.")
+    search_parser.add_argument("text", help="Words to look for, e.g. 'ninebot max'.")
+    search_parser.add_argument("--limit", type=int, default=PAGE_SIZE, help=f"Show at most this many matches, best first (default: {PAGE_SIZE}).")
+    stats_parser = subparsers.add_parser("stats", help="Show statistics of the dataset or of the rows matching --where.")
+    stats_parser.add_argument("--column", help="Only summarize this numeric column, with its histogram.")
+    stats_parser.add_argument("--where", action="append", default=[], metavar="CONDITION",
+                              help="Only cover rows matching e.g. 'uvp <= 1000' or 'federung in vorne,hinten'; repeat to combine.")
+    stats_parser.add_argument("--by", default="federung", help="Column to average the numeric columns by (default: federung).")
+    query_parser = subparsers.add_parser("query", help="Run one query without the menu and write the result as CSV, JSON Lines or Parquet.")
+    query_parser.add_argument("--where", action="append", default=[], metavar="CONDITION",
+                              help="Keep rows matching e.g. 'uvp <= 1000' or 'federung in vorne,hinten'; repeat to combine.")
+    query_parser.add_argument("--sort", metavar="COLUMN[:asc|desc]", help="Sort by a column, ascending unless ':desc' is given.")
+    query_parser.add_argument("--columns", metavar="A,B,...", help="Comma-separated columns to output (default: all).")
+    query_parser.add_argument("--limit", type=int, help="Output at most this many rows.")
+    query_parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="Output format (default: from --output's suffix, else csv).")
+    query_parser.add_argument("--output", type=Path, help="Write to this file instead of stdout.")
+    query_parser.add_argument("--query-file", type=Path, help="Read the query from a JSON file with the keys where, sort, columns, limit and format.")
+    serve_parser = subparsers.add_parser("serve", help="Answer JSON queries (one per line) from stdin or a local socket, keeping the data loaded.")
+    serve_target = serve_parser.add_mutually_exclusive_group()
+    serve_target.add_argument("--socket", type=Path, help="Listen on this Unix socket instead of stdin.")
+    serve_target.add_argument("--port", type=int, help="Listen on this port on 127.0.0.1 instead of stdin.")
+    serve_parser.add_argument("--output-dir", type=Path, help="Let requests write results to files in this directory (off by default).")
+    args = parser.parse_args()
+    if args.dataset != "current" and (args.source or os.environ.get("ESCOOTER_SOURCES")):
+        parser.error("--dataset all cannot be combined with sources; add the deprecated tables with "
+                     "--source escooter-treff-deprecated instead.")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    SOURCE_NAMES = args.source
+    DATASET_VARIANT = args.dataset
+    if args.command in ("query", "serve"):
+        CONSOLE = Console(stderr=True) # stdout carries the results
+    profiling = args.profile or args.profile_output or args.profile_log
+    if profiling:
+        instrumentation.enable(args.profile_log)
+
+    try:
+        if args.command == "refresh":
+            run_refresh()
+        elif args.command == "refresh-daemon":
+            run_refresh_daemon(args.profile_output)
+        elif args.command == "history":
+            run_history(args.model, args.column, args.as_of)
+        elif args.command == "search":
+            run_search(args.text, args.limit)
+        elif args.command == "stats":
+            run_stats(args.column, args.where, args.by)
+        elif args.command == "query":
+            run_query_command(args)
+        elif args.command == "serve":
+            run_query_server(args.socket, args.port, args.output_dir)
+        else:
+            # The menu is shown while the data loads; only the first choice waits for it
+            loading = BackgroundLoad()
+            loading.start()
+            choice = ask_menu_choice()
+            if choice == '8':
+                CONSOLE.print("[bold]Goodbye![/bold]")
+            else:
+                df = wait_for_data(loading)
+                if not df.empty:
+                    from data_processor import STATUS_COLUMN
+
+                    CONSOLE.print(f"Loaded {len(df)} e-scooters.")
+                    if STATUS_COLUMN in df.columns:
+                        CONSOLE.print(", ".join(f"{n} {status}" for status, n in df[STATUS_COLUMN].value_counts(sort=False).items()))
+                    main_menu(df, choice)
+                else:
+                    CONSOLE.print("[bold red]Could not load any data to analyze.[/bold red]")
+    finally:
+        if profiling:
+            if args.profile:
+                print_profile()
+            if args.profile_output:
+                instrumentation.write(args.profile_output)
+            instrumentation.disable()
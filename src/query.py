@@ -0,0 +1,189 @@
+# src/query.py
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from filter_engine import COMPARISON_OPERATORS, CategoryFilter, RangeFilter, compare_filter, index_for
+from filter_sort import sort_by_column
+from instrumentation import timed
+from search import search_index_for
+
+@dataclass(frozen=True)
+class Sort:
+    """Orders the result by one column."""
+    column: str
+    ascending: bool = True
+
+@dataclass(frozen=True)
+class NameSearch:
+    """Keeps rows whose name matches every word of `text`, tolerating typos (see search.py)."""
+    text: str
+
+class _State:
+    """The plan after a number of steps, with its row mask computed on demand."""
+
+    def __init__(self, parent, step):
+        self.parent = parent
+        self.step = step
+        self.sort = step if isinstance(step, Sort) else (parent.sort if parent else None)
+        self.filters = (parent.filters if parent else ()) + ((step,) if step is not None and not isinstance(step, Sort) else ())
+        self._mask = None
+        self._result = None
+
+class LazyQuery:
+    """
+    A filter/sort pipeline over a DataFrame that is evaluated only when needed.
+
+    Steps are recorded as a plan instead of producing a new DataFrame each.
+    On evaluation all filters are fused into one mask over the original data
+    (see filter_engine) and only the last sort is applied, since a later sort
+    supersedes an earlier one. Every step keeps its mask and result once they
+    are computed, so undo() returns to the previous state without recomputing.
+
+    Example:
+        query = LazyQuery(df).filter_numeric('uvp', '<=', 1000).sort('akku_wh', ascending=False)
+        cheapest = query.collect()
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.base = df
+        self._index = index_for(df)
+        self._states = [_State(None, None)]
+
+    @property
+    def _current(self) -> _State:
+        return self._states[-1]
+
+    def _push(self, step) -> "LazyQuery":
+        self._states.append(_State(self._current, step))
+        return self
+
+    # --- Recording steps ---
+
+    def where(self, predicate: RangeFilter | CategoryFilter) -> "LazyQuery":
+        """Adds a filter_engine predicate."""
+        return self._push(predicate)
+
+    def filter_numeric(self, column: str, operator: str, value: float) -> "LazyQuery":
+        """Adds a numeric comparison, like filter_sort.filter_by_numeric."""
+        if column not in self.base.columns or not is_numeric_dtype(self.base[column]):
+            print(f"Warning: Column '{column}' is not a valid numeric column.")
+            return self
+        if operator not in COMPARISON_OPERATORS:
+            print(f"Warning: Invalid operator '{operator}'.")
+            return self
+        return self._push(compare_filter(column, operator, value))
+
+    def filter_categorical(self, column: str, values: list) -> "LazyQuery":
+        """Keeps rows whose value is in `values`, like filter_sort.filter_by_categorical."""
+        if column not in self.base.columns:
+            print(f"Warning: Column '{column}' not found.")
+            return self
+        return self._push(CategoryFilter(column, tuple(values)))
+
+    def search(self, text: str) -> "LazyQuery":
+        """Keeps rows whose name matches `text`, allowing typos and unfinished words."""
+        return self._push(NameSearch(text))
+
+    def sort(self, column: str, ascending: bool = True) -> "LazyQuery":
+        """Sorts by a column, replacing any earlier sort."""
+        if column not in self.base.columns:
+            print(f"Warning: Column '{column}' not found.")
+            return self
+        return self._push(Sort(column, ascending))
+
+    def undo(self) -> bool:
+        """Removes the last step. Returns False if there was nothing to undo."""
+        if len(self._states) == 1:
+            return False
+        self._states.pop()
+        return True
+
+    def reset(self) -> "LazyQuery":
+        """Removes all steps."""
+        del self._states[1:]
+        return self
+
+    # --- Inspecting the plan ---
+
+    @property
+    def steps(self) -> list:
+        """The recorded steps, oldest first."""
+        return [state.step for state in self._states[1:]]
+
+    @property
+    def filters(self) -> tuple:
+        """The filters that will be fused into one mask."""
+        return self._current.filters
+
+    @property
+    def sort_order(self) -> Sort | None:
+        """The only sort that will be applied."""
+        return self._current.sort
+
+    def describe(self) -> str:
+        """A short, human-readable summary of the optimized plan."""
+        parts = []
+        for predicate in self.filters:
+            if isinstance(predicate, NameSearch):
+                parts.append(f"name ~ '{predicate.text}'")
+            elif isinstance(predicate, CategoryFilter):
+                parts.append(f"{predicate.column} in {list(predicate.values)}")
+            elif predicate.low == predicate.high and predicate.low is not None:
+                parts.append(f"{predicate.column} == {predicate.low:g}")
+            else:
+                if predicate.low is not None:
+                    parts.append(f"{predicate.column} {'>=' if predicate.include_low else '>'} {predicate.low:g}")
+                if predicate.high is not None:
+                    parts.append(f"{predicate.column} {'<=' if predicate.include_high else '<'} {predicate.high:g}")
+        if self.sort_order is not None:
+            parts.append(f"sorted by {self.sort_order.column} {'asc' if self.sort_order.ascending else 'desc'}")
+        return ", ".join(parts)
+
+    # --- Evaluation ---
+
+    def _filter_mask(self, filters) -> np.ndarray:
+        # Name searches go to the search index; all other filters are fused by the filter index
+        mask = self._index.mask([predicate for predicate in filters if not isinstance(predicate, NameSearch)])
+        for predicate in filters:
+            if isinstance(predicate, NameSearch):
+                mask &= search_index_for(self.base).mask(predicate.text)
+        return mask
+
+    def _mask(self, state: _State) -> np.ndarray:
+        if state._mask is None:
+            if state.parent is None:
+                state._mask = np.ones(len(self.base), dtype=bool)
+            elif isinstance(state.step, Sort):
+                state._mask = self._mask(state.parent)
+            elif state.parent._mask is not None:
+                # Only the newest filter is evaluated; earlier ones are already in the parent's mask
+                state._mask = state.parent._mask & self._filter_mask([state.step])
+            else:
+                state._mask = self._filter_mask(state.filters)
+        return state._mask
+
+    def positions(self) -> np.ndarray:
+        """Row positions in the original DataFrame that pass all filters, unsorted."""
+        return np.flatnonzero(self._mask(self._current))
+
+    def count(self) -> int:
+        """Number of matching rows, without materializing them."""
+        return int(np.count_nonzero(self._mask(self._current)))
+
+    @timed("query.collect")
+    def collect(self) -> pd.DataFrame:
+        """Evaluates the plan and returns the resulting DataFrame."""
+        state = self._current
+        if state._result is None:
+            if state.filters:
+                result = self.base.iloc[self.positions()]
+            else:
+                result = self.base
+            if state.sort is not None:
+                result = sort_by_column(result, state.sort.column, ascending=state.sort.ascending)
+            state._result = result
+        return state._result
@@ -0,0 +1,244 @@
+# src/ranking.py
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from instrumentation import timed
+
+SCORE_COLUMN = "score"
+SKYLINE_BLOCK = 512 # candidates compared with each other per numpy step
+
+@dataclass(frozen=True)
+class Metric:
+    """A value derived from two columns, e.g. battery capacity per kilogram."""
+    name: str
+    numerator: str
+    denominator: str
+    maximize: bool
+
+DERIVED_METRICS = {metric.name: metric for metric in (
+    Metric("wh_per_kg", "akku_wh", "gewicht_kg", maximize=True),
+    Metric("w_per_kg", "motor_w", "gewicht_kg", maximize=True),
+    Metric("eur_per_wh", "uvp", "akku_wh", maximize=False),
+    Metric("eur_per_km", "uvp", "reichweite_km_offiziell", maximize=False),
+)}
+
+# Whether more is better, for the columns where that is obvious
+DIRECTIONS = {
+    "uvp": False,
+    "gewicht_kg": False,
+    "reichweite_km_offiziell": True,
+    "akku_wh": True,
+    "motor_w": True,
+    "zuladung_bis_kg": True,
+}
+
+@dataclass(frozen=True)
+class Criterion:
+    """
+    One column or derived metric to rank by.
+
+    Args:
+        column (str): A numeric column or a name from DERIVED_METRICS.
+        weight (float): Its share of the score. Ignored by the Pareto front.
+        maximize (bool | None): Whether more is better. None uses the
+                                column's usual direction (see DIRECTIONS).
+    """
+    column: str
+    weight: float = 1.0
+    maximize: bool | None = None
+
+    @property
+    def more_is_better(self) -> bool:
+        if self.maximize is not None:
+            return self.maximize
+        if self.column in DERIVED_METRICS:
+            return DERIVED_METRICS[self.column].maximize
+        return DIRECTIONS.get(self.column, True)
+
+def available_criteria(df: pd.DataFrame) -> list[str]:
+    """The numeric columns and the derived metrics whose inputs `df` has."""
+    columns = [col for col in df.columns if is_numeric_dtype(df[col]) and not is_bool_dtype(df[col])]
+    metrics = [name for name, metric in DERIVED_METRICS.items() if metric.numerator in df.columns and metric.denominator in df.columns]
+    return columns + metrics
+
+def parse_criteria(text: str) -> list[Criterion]:
+    """
+    Parses criteria like 'wh_per_kg:2, uvp, motor_w:max': comma-separated
+    names, each optionally followed by a weight and/or 'min' or 'max'.
+    """
+    criteria = []
+    for item in text.split(","):
+        name, *options = [part.strip() for part in item.split(":")]
+        if not name:
+            continue
+        weight, maximize = 1.0, None
+        for option in options:
+            if option.lower() in ("min", "max"):
+                maximize = option.lower() == "max"
+            else:
+                try:
+                    weight = float(option)
+                except ValueError:
+                    raise ValueError(f"Invalid option '{option}' for '{name}'. Use a weight, 'min' or 'max'.")
+        criteria.append(Criterion(name, weight, maximize))
+    return criteria
+
+# --- Values ---
+
+def values(df: pd.DataFrame, column: str, positions: np.ndarray | None = None) -> np.ndarray:
+    """A column or derived metric as float64, NaN where missing (or where a ratio has no positive denominator)."""
+    def column_values(name):
+        if name not in df.columns:
+            raise KeyError(f"Unknown column '{name}'.")
+        array = df[name].to_numpy(dtype="float64", na_value=np.nan)
+        return array if positions is None else array[positions]
+
+    if column in DERIVED_METRICS:
+        metric = DERIVED_METRICS[column]
+        numerator, denominator = column_values(metric.numerator), column_values(metric.denominator)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
+    return column_values(column)
+
+def with_metrics(df: pd.DataFrame, names: list[str]) -> pd.DataFrame:
+    """Adds the derived metrics among `names` as columns. Meant for the few rows that are displayed."""
+    metrics = {name: values(df, name) for name in names if name in DERIVED_METRICS and name not in df.columns}
+    return df.assign(**metrics) if metrics else df
+
+def _objectives(df: pd.DataFrame, criteria: list[Criterion], positions: np.ndarray) -> np.ndarray:
+    # One column per criterion, negated where more is better, so that smaller is always better
+    return np.column_stack([
+        -values(df, criterion.column, positions) if criterion.more_is_better else values(df, criterion.column, positions)
+        for criterion in criteria
+    ])
+
+# --- Weighted score ---
+
+@timed("ranking.score")
+def score(df: pd.DataFrame, criteria: list[Criterion], positions: np.ndarray | None = None) -> np.ndarray:
+    """
+    Weighted score between 0 (worst) and 1 (best) per row. Each criterion
+    is min-max normalized over the rows scored, so weights are comparable
+    across units. Rows missing any criterion get NaN.
+    """
+    if not criteria:
+        raise ValueError("No criteria given.")
+    total_weight = sum(abs(criterion.weight) for criterion in criteria)
+    if total_weight == 0:
+        raise ValueError("All weights are zero.")
+
+    total = np.zeros(len(df) if positions is None else len(positions))
+    for criterion in criteria:
+        column = values(df, criterion.column, positions)
+        present = column[~np.isnan(column)]
+        low, high = (present.min(), present.max()) if len(present) else (0.0, 0.0)
+        normalized = (column - low) / (high - low) if high > low else np.where(np.isnan(column), np.nan, 1.0)
+        if not criterion.more_is_better:
+            normalized = 1.0 - normalized
+        total += criterion.weight * normalized
+    return total / total_weight
+
+def ranked_positions(df: pd.DataFrame, criteria: list[Criterion], positions: np.ndarray | None = None,
+                     limit: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row positions (of all rows, or of those at `positions`) ordered by
+    score, best first, and their scores. Rows missing a criterion are left out.
+    """
+    positions = np.arange(len(df)) if positions is None else np.asarray(positions)
+    scores = score(df, criteria, positions)
+    keep = ~np.isnan(scores)
+    order = np.argsort(-scores[keep], kind="stable")[:limit]
+    return positions[keep][order], scores[keep][order]
+
+def rank(df: pd.DataFrame, criteria: list[Criterion], positions: np.ndarray | None = None,
+         limit: int | None = None) -> pd.DataFrame:
+    """The rows of ranked_positions, with the derived metrics used and a `score` column."""
+    rows, scores = ranked_positions(df, criteria, positions, limit)
+    result = with_metrics(df.iloc[rows], [criterion.column for criterion in criteria])
+    return result.assign(**{SCORE_COLUMN: scores})
+
+# --- Pareto front ---
+
+def _distinct(points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The distinct rows of `points` and, per row, the index of its distinct row. Duplicates never dominate each other."""
+    order = np.lexsort(points.T[::-1])
+    ordered = points[order]
+    new = np.concatenate(([True], (ordered[1:] != ordered[:-1]).any(axis=1)))
+    inverse = np.empty(len(points), dtype=np.intp)
+    inverse[order] = np.cumsum(new) - 1
+    return ordered[new], inverse
+
+def _front_2d(points: np.ndarray) -> np.ndarray:
+    """Non-dominated mask for distinct 2-D points (smaller is better): one sort and a running minimum."""
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    y = points[order, 1]
+    best_before = np.concatenate(([np.inf], np.minimum.accumulate(y)[:-1]))
+    # Every earlier point has a smaller or equal x, so it dominates unless its y is larger
+    mask = np.empty(len(points), dtype=bool)
+    mask[order] = y < best_before
+    return mask
+
+def _dominated_by(points: np.ndarray, front: np.ndarray) -> np.ndarray:
+    """Whether each of `points` is no worse than some row of `front` in every dimension, one dimension at a time."""
+    covered = np.ones((len(points), len(front)), dtype=bool)
+    for dim in range(points.shape[1]):
+        covered &= front[None, :, dim] <= points[:, dim, None]
+    return covered.any(axis=1)
+
+def _front_sfs(points: np.ndarray) -> np.ndarray:
+    """
+    Non-dominated mask for distinct points in any dimension (smaller is
+    better), by sort-filter-skyline: after sorting by the sum of normalized
+    values, no point can be dominated by a later one. The front is found a
+    block at a time; its new members then eliminate every remaining
+    candidate they dominate in one pass, so few candidates survive long.
+    """
+    low, high = points.min(axis=0), points.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    remaining = np.argsort(((points - low) / span).sum(axis=1), kind="stable")
+
+    mask = np.zeros(len(points), dtype=bool)
+    while len(remaining):
+        block, remaining = remaining[:SKYLINE_BLOCK], remaining[SKYLINE_BLOCK:]
+        block_points = points[block]
+        covered = np.ones((len(block), len(block)), dtype=bool)
+        for dim in range(points.shape[1]):
+            covered &= block_points[None, :, dim] <= block_points[:, dim, None]
+        # Points are distinct and only earlier ones can dominate later ones
+        survivors = block[~np.tril(covered, k=-1).any(axis=1)]
+        mask[survivors] = True
+        if len(remaining):
+            remaining = remaining[~_dominated_by(points[remaining], points[survivors])]
+    return mask
+
+@timed("ranking.pareto_front")
+def pareto_front(df: pd.DataFrame, criteria: list[Criterion], positions: np.ndarray | None = None) -> np.ndarray:
+    """
+    Row positions of the models no other model beats on every criterion at
+    once, ordered by the first criterion, best first. Rows missing a
+    criterion are left out; identical rows are all kept.
+    """
+    if not criteria:
+        raise ValueError("No criteria given.")
+    positions = np.arange(len(df)) if positions is None else np.asarray(positions)
+    points = _objectives(df, criteria, positions)
+    complete = ~np.isnan(points).any(axis=1)
+    positions, points = positions[complete], points[complete]
+    if not len(points):
+        return positions
+
+    distinct, inverse = _distinct(points)
+    if distinct.shape[1] == 1:
+        front = distinct[:, 0] == distinct[:, 0].min()
+    elif distinct.shape[1] == 2:
+        front = _front_2d(distinct)
+    else:
+        front = _front_sfs(distinct)
+
+    on_front = front[inverse]
+    result, result_points = positions[on_front], points[on_front]
+    return result[np.lexsort(result_points.T[::-1])]
@@ -0,0 +1,146 @@
+# src/refresher.py
+
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Callable
+
+import pandas as pd
+
+from cache import DatasetCache, FileLock
+
+DEFAULT_LEAD_FRACTION = 0.1 # refresh when 90% of the TTL has passed
+DEFAULT_POLL_SECONDS = 60
+DEFAULT_RETRY_SECONDS = 5 * 60
+
+@dataclass
+class RefreshStatus:
+    """What the scheduler last did, for display in the UI or logs."""
+    last_refresh_at: float | None = None # epoch seconds of the last finished refresh attempt
+    last_duration: float | None = None # seconds the last refresh attempt took
+    last_result: str | None = None # DatasetCache.last_status of the last attempt
+    last_error: str | None = None # set while the most recent attempt failed
+    refreshing: bool = False
+    next_refresh_at: float | None = None
+
+    @property
+    def failed(self) -> bool:
+        return self.last_error is not None
+
+class RefreshScheduler:
+    """
+    Keeps a DatasetCache warm from a background thread.
+
+    The cache is refreshed shortly before its TTL runs out, so readers never
+    find it expired and never wait for a scrape. The current dataset is held
+    as an in-memory snapshot that is swapped in one assignment once a refresh
+    has finished; until then readers keep getting the previous snapshot.
+    """
+
+    def __init__(self, cache: DatasetCache, lead_time: float | None = None,
+                 poll_interval: float = DEFAULT_POLL_SECONDS, retry_interval: float = DEFAULT_RETRY_SECONDS,
+                 on_refresh: Callable[[RefreshStatus], None] | None = None):
+        self.cache = cache
+        self.on_refresh = on_refresh
+        self.lead_time = cache.ttl * DEFAULT_LEAD_FRACTION if lead_time is None else lead_time
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.status = RefreshStatus()
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self) -> pd.DataFrame:
+        """Returns the current dataset. Only blocks if no dataset has been loaded yet."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = self.cache.get()
+        return snapshot
+
+    def refresh_now(self) -> bool:
+        """
+        Refreshes the cache in the calling thread and swaps in the result.
+
+        Returns False without doing anything if another process or thread is
+        already refreshing; its result is picked up on the next poll.
+        """
+        lock = FileLock(self.cache.lock_path)
+        if not lock.acquire(blocking=False):
+            return False
+
+        self.status.refreshing = True
+        started = time.monotonic()
+        try:
+            df = self.cache.refresh()
+            self.status.last_result = self.cache.last_status
+            if self.cache.last_status == "error":
+                self.status.last_error = "Could not retrieve e-scooter data."
+            else:
+                self.status.last_error = None
+            if not df.empty:
+                self._snapshot = df
+        except Exception as e: # keep the thread alive and the previous snapshot in place
+            self.status.last_result = "error"
+            self.status.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            lock.release()
+            self.status.refreshing = False
+            self.status.last_duration = time.monotonic() - started
+            self.status.last_refresh_at = time.time()
+        if self.on_refresh is not None:
+            self.on_refresh(self.status)
+        return True
+
+    def _seconds_until_due(self) -> float:
+        age = self.cache.age()
+        if age is None:
+            return 0.0
+        return self.cache.ttl - self.lead_time - age
+
+    def run_pending(self) -> float:
+        """Runs one scheduling step and returns how long to wait before the next one."""
+        try:
+            if self._seconds_until_due() <= 0:
+                self.refresh_now()
+                if self.status.failed:
+                    return self.retry_interval
+            else:
+                # Pick up datasets written by other workers
+                df = self.cache.load()
+                if not df.empty:
+                    self._snapshot = df
+        except Exception as e: # e.g. a corrupt or half-written cache file; keep the previous snapshot and retry
+            self.status.last_result = "error"
+            self.status.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+            return self.retry_interval
+        return min(self.poll_interval, max(self._seconds_until_due(), 1.0))
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.run_pending()
+            self.status.next_refresh_at = time.time() + max(self._seconds_until_due(), wait)
+            self._stop.wait(wait)
+
+    def start(self) -> "RefreshScheduler":
+        """Starts the background thread (once) and returns self."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dataset-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None):
+        """Stops the background thread after its current step."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self):
+        """Runs the scheduler in the calling thread, e.g. as a daemon process, until interrupted."""
+        try:
+            self._run()
+        except KeyboardInterrupt:
+            pass
@@ -1,16 +1,127 @@
+import os
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import count, timed
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional; without it the standard library parser streams the page
+    etree = None
+
+# Parser backend used by get_escooter_data: "auto", "lxml", "stream" or "bs4".
+# "auto" prefers lxml and falls back to the standard library's streaming parser;
+# "bs4" is the original BeautifulSoup path. Set ESCOOTER_PARSER to A/B them.
+PARSER_BACKEND = os.environ.get("ESCOOTER_PARSER", "auto")
+PARSER_BACKENDS = ("auto", "lxml", "stream", "bs4")
+FEED_CHUNK_SIZE = 64 * 1024
+
+# --- HTTP settings ---
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) in seconds
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5  # waits 0.5s, 1s, 2s between retries
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+
+@dataclass
+class FetchResult:
+    """Outcome of a (conditional) page fetch."""
+    url: str
+    status_code: int = 0  # 0 means the request failed
+    text: str = ""
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def not_modified(self) -> bool:
+        """True when the server answered 304, i.e. the stored copy is still current."""
+        return self.status_code == 304
+
+    def validators(self) -> dict[str, str | None]:
+        """The cache validators to send with the next request for this URL."""
+        return {"etag": self.etag, "last_modified": self.last_modified}
+
+def create_session(max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR) -> requests.Session:
+    """Creates a session with connection pooling and retry with exponential backoff."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+@timed("scraper.fetch_page")
+def fetch_page(url: str, etag: str | None = None, last_modified: str | None = None,
+               timeout: float | tuple[float, float] = REQUEST_TIMEOUT,
+               session: requests.Session | None = None) -> FetchResult:
+    """
+    Fetches a page, sending stored validators as a conditional request.
+
+    Args:
+        url (str): The URL to fetch.
+        etag (str | None): ETag from the previous response, sent as If-None-Match.
+        last_modified (str | None): Last-Modified from the previous response, sent as If-Modified-Since.
+        timeout: Connect/read timeout in seconds.
+        session (requests.Session | None): Session to use. Defaults to the shared session.
+
+    Returns:
+        FetchResult: status 304 with empty text if the page is unchanged, the page
+                     content on success, or status 0 if the request failed.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
 
-def fetch_html(url: str) -> str:
-    """Fetches the HTML content from the given URL."""
     try:
-        response = requests.get(url)
+        response = (session or get_session()).get(url, headers=headers, timeout=timeout)
+        count("scraper.bytes_fetched", len(response.content))
+        if response.status_code == 304:
+            count("scraper.not_modified")
+            # Servers may omit unchanged validators on a 304, so keep the ones we sent
+            return FetchResult(url, 304, "",
+                               response.headers.get("ETag", etag),
+                               response.headers.get("Last-Modified", last_modified))
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        return response.text
+        return FetchResult(url, response.status_code, response.text,
+                           response.headers.get("ETag"), response.headers.get("Last-Modified"))
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URL {url}: {e}")
-        return ""
+        return FetchResult(url)
+
+def fetch_html(url: str) -> str:
+    """Fetches the HTML content from the given URL."""
+    return fetch_page(url).text
+
+_TABLE_TAGS = frozenset(("table", "thead", "tbody", "tr", "th", "td"))
 
+def _check_sections(table_id: str, has_head: bool, has_body: bool):
+    """Raises the ValueError every parser backend gives for a table without a <thead> or <tbody>."""
+    missing = [section for section, present in (("<thead>", has_head), ("<tbody>", has_body)) if not present]
+    if missing:
+        raise ValueError(f"Table with ID '{table_id}' has no {' or '.join(missing)}.")
+
+@timed("scraper.parse_table")
 def parse_table(html_content: str, table_id: str) -> list[list[str]]:
     """
     Parses HTML content and extracts data from a specified table.
@@ -22,6 +133,9 @@ def parse_table(html_content: str, table_id: str) -> list[list[str]]:
     Returns:
         list[list[str]]: A list of lists representing the table data,
                          where the first sublist is the header.
+
+    Raises:
+        ValueError: If the table has no <thead> or <tbody>.
     """
     soup = BeautifulSoup(html_content, 'html.parser')
     table = soup.find('table', {'id': table_id})
@@ -30,23 +144,239 @@ def parse_table(html_content: str, table_id: str) -> list[list[str]]:
         print(f"Table with ID '{table_id}' not found.")
         return []
 
-    headers = [th.get_text(strip=True) for th in table.find('thead').find_all('th')]
+    thead, tbody = table.find('thead'), table.find('tbody')
+    _check_sections(table_id, thead is not None, tbody is not None)
+    headers = [th.get_text(strip=True) for th in thead.find_all('th')]
     data = [headers] # Start with headers
 
-    for row in table.find('tbody').find_all('tr'):
+    for row in tbody.find_all('tr'):
         cells = row.find_all('td')
         row_data = [cell.get_text(strip=True) for cell in cells]
         data.append(row_data)
 
+    count("scraper.rows_parsed", len(data) - 1)
     return data
 
-def get_escooter_data(url: str, include_deprecated: bool = False) -> dict[str, list[list[str]]]:
+class _TableCollector:
+    """
+    Collects tablepress tables from a stream of parser events.
+
+    Mirrors what parse_table extracts with BeautifulSoup: the <th> texts of
+    the first <thead> as the header, and a row for every <tr> inside the
+    first <tbody> with the texts of the <td> cells inside it. Like find_all,
+    this includes the rows and cells of nested tables, and a cell's text
+    includes that of everything inside it, each text stripped like
+    get_text(strip=True). An end tag closes every element opened after its
+    start tag, as in BeautifulSoup's tree. Once every requested table has
+    been closed, `done` is set so the caller can stop feeding the parser.
+    """
+
+    def __init__(self, table_ids: list[str]):
+        self.pending = set(table_ids)
+        self.tables: dict[str, list[list[str]]] = {}
+        self.done = not self.pending
+        self._table_id = None  # id of the table currently being collected
+        self._text = []
+        self._skip = 0  # inside <script>/<style>
+        self._reset()
+
+    def _reset(self):
+        self._stack = []  # (tag, kind) of the open table elements inside the collected table
+        self._header = None  # cells of the first <thead>, once it has started
+        self._body_seen = False
+        self._in_head = 0
+        self._in_body = 0
+        self._rows = []
+        self._open_rows = []
+        self._open_cells = []  # every open cell gets the text, so outer cells include nested ones
+
+    def _flush_text(self):
+        # BeautifulSoup strips every text node on its own, so text is
+        # committed whenever a tag or comment interrupts it.
+        if self._text:
+            text = "".join(self._text).strip()
+            self._text = []
+            if text:
+                for cell in self._open_cells:
+                    cell.append(text)
+
+    def start(self, tag: str, attrs: dict):
+        self._flush_text()
+        if tag in ("script", "style"):
+            self._skip += 1
+        if self._table_id is None:
+            if tag == "table" and attrs.get("id") in self.pending:
+                self._table_id = attrs["id"]
+                self._stack.append(("table", None))
+            return
+        if tag not in _TABLE_TAGS:
+            return
+
+        kind = None
+        if tag == "thead" and self._header is None:
+            # parse_table only reads the first <thead> and <tbody>
+            self._header, kind = [], "head"
+            self._in_head += 1
+        elif tag == "tbody" and not self._body_seen:
+            self._body_seen, kind = True, "body"
+            self._in_body += 1
+        elif tag == "tr" and self._in_body:
+            row = []
+            self._rows.append(row)
+            self._open_rows.append(row)
+            kind = "row"
+        elif (tag == "th" and self._in_head) or (tag == "td" and self._open_rows):
+            cell = []
+            # A <td> is a cell of every row it is inside, a <th> of the header
+            for row in self._open_rows if tag == "td" else (self._header,):
+                row.append(cell)
+            self._open_cells.append(cell)
+            kind = "cell"
+        self._stack.append((tag, kind))
+
+    def end(self, tag: str):
+        self._flush_text()
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+        if self._table_id is None or tag not in _TABLE_TAGS or not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+
+        while True:
+            open_tag, kind = self._stack.pop()
+            if kind == "head":
+                self._in_head -= 1
+            elif kind == "body":
+                self._in_body -= 1
+            elif kind == "row":
+                self._open_rows.pop()
+            elif kind == "cell":
+                self._close_cell()
+            if open_tag == tag:
+                break
+        if not self._stack:
+            self._finish()
+
+    def _close_cell(self):
+        cell = self._open_cells.pop()
+        # Usually the cell is the last of a single row; its text is final, so keep only the string
+        rows = self._open_rows if self._open_rows else (self._header,)
+        if len(rows) == 1 and rows[0] and rows[0][-1] is cell:
+            rows[0][-1] = "".join(cell)
+
+    def _finish(self):
+        table_id = self._table_id
+        _check_sections(table_id, self._header is not None, self._body_seen)
+        self.tables[table_id] = [[cell if isinstance(cell, str) else "".join(cell) for cell in row]
+                                 for row in [self._header] + self._rows]
+        self.pending.discard(table_id)
+        self._table_id = None
+        self._reset()
+        self.done = not self.pending
+
+    def data(self, text: str):
+        if self._open_cells and not self._skip:
+            self._text.append(text)
+
+    def comment(self, text: str):
+        self._flush_text()
+
+    def close(self):
+        self._flush_text()
+        if self._table_id is not None:
+            # The page ended inside the table; BeautifulSoup closes it there too
+            self._finish()
+        return self.tables
+
+class _StreamParser(HTMLParser):
+    """Drives a _TableCollector with the standard library's incremental HTML parser."""
+
+    def __init__(self, collector: _TableCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def handle_comment(self, data):
+        self.collector.comment(data)
+
+    def close(self):
+        super().close()
+        self.collector.close()
+
+def _feed(parser, collector: _TableCollector, html_content: str):
+    """Feeds the HTML in chunks and stops as soon as the last requested table is closed."""
+    for start in range(0, len(html_content), FEED_CHUNK_SIZE):
+        parser.feed(html_content[start:start + FEED_CHUNK_SIZE])
+        if collector.done:
+            return
+    parser.close()
+
+def resolve_backend(backend: str | None = None) -> str:
+    """Resolves "auto" (or None) to the fastest parser backend that is installed."""
+    backend = backend or PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}'. Choose one of {PARSER_BACKENDS}.")
+    if backend == "auto":
+        return "lxml" if etree is not None else "stream"
+    if backend == "lxml" and etree is None:
+        print("lxml is not installed, falling back to the streaming parser.")
+        return "stream"
+    return backend
+
+@timed("scraper.parse_tables")
+def parse_tables(html_content: str, table_ids: list[str], backend: str | None = None) -> dict[str, list[list[str]]]:
+    """
+    Extracts several tables from the HTML content in a single pass.
+
+    Args:
+        html_content (str): The HTML content of the page.
+        table_ids (list[str]): The IDs of the tables to parse.
+        backend (str | None): "lxml", "stream", "bs4" or "auto". Defaults to PARSER_BACKEND.
+
+    Returns:
+        dict[str, list[list[str]]]: The table data per ID, in the same format as
+                                    parse_table. Tables that were not found are omitted.
+
+    Raises:
+        ValueError: If a requested table has no <thead> or <tbody>.
+    """
+    backend = resolve_backend(backend)
+    if backend == "bs4":
+        tables = {table_id: parse_table(html_content, table_id) for table_id in table_ids}
+        return {table_id: data for table_id, data in tables.items() if data}
+
+    collector = _TableCollector(table_ids)
+    if backend == "lxml":
+        parser = etree.HTMLParser(target=collector)
+    else:
+        parser = _StreamParser(collector)
+    _feed(parser, collector, html_content)
+
+    for table_id in table_ids:
+        if table_id not in collector.tables:
+            print(f"Table with ID '{table_id}' not found.")
+    count("scraper.rows_parsed", sum(len(data) - 1 for data in collector.tables.values()))
+    return collector.tables
+
+def get_escooter_data(url: str, include_deprecated: bool = False, backend: str | None = None) -> dict[str, list[list[str]]]:
     """
     Fetches and parses e-scooter data from the specified URL.
 
     Args:
         url (str): The URL of the e-scooter table page.
         include_deprecated (bool): Whether to include the deprecated models table.
+        backend (str | None): Parser backend for parse_tables. Defaults to PARSER_BACKEND.
 
     Returns:
         dict[str, list[list[str]]]: A dictionary containing raw table data.
@@ -55,18 +385,32 @@ def get_escooter_data(url: str, include_deprecated: bool = False) -> dict[str, l
     html = fetch_html(url)
     if not html:
         return {}
+    return extract_escooter_tables(html, include_deprecated, backend)
 
-    all_data = {}
-    current_models_data = parse_table(html, "tablepress-2")
-    if current_models_data:
-        all_data['current'] = current_models_data
+def extract_escooter_tables(html: str, include_deprecated: bool = False, backend: str | None = None) -> dict[str, list[list[str]]]:
+    """
+    Extracts the e-scooter tables from already fetched HTML.
 
+    Args:
+        html (str): The HTML content of the e-scooter table page.
+        include_deprecated (bool): Whether to include the deprecated models table.
+        backend (str | None): Parser backend for parse_tables. Defaults to PARSER_BACKEND.
+
+    Returns:
+        dict[str, list[list[str]]]: Same format as get_escooter_data.
+    """
+    table_ids = {'current': "tablepress-2"}
     if include_deprecated:
-        deprecated_models_data = parse_table(html, "tablepress-6")
-        if deprecated_models_data:
-            # The deprecated table has slightly fewer columns.
-            # We'll need to handle this in data_processor, so for now, just store it.
-            all_data['deprecated'] = deprecated_models_data
+        # The deprecated table has slightly fewer columns; data_processor.process_tables aligns them
+        table_ids['deprecated'] = "tablepress-6"
+
+    # Both tables come out of one pass over the page
+    tables = parse_tables(html, list(table_ids.values()), backend=backend)
+
+    all_data = {}
+    for key, table_id in table_ids.items():
+        if tables.get(table_id):
+            all_data[key] = tables[table_id]
 
     return all_data
 
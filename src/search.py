@@ -0,0 +1,191 @@
+# src/search.py
+
+import re
+import unicodedata
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+SEARCH_COLUMNS = ("model", "hersteller") # the name columns that are present get indexed
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+def normalize(text: str) -> list[str]:
+    """Splits text into lowercase words without accents or punctuation, e.g. 'Ninebot-Max G30D' -> ['ninebot', 'max', 'g30d']."""
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word for word in _NON_WORD.split(text) if word]
+
+def trigrams(word: str) -> list[str]:
+    """The trigrams of a word padded with two spaces in front and one behind, so the first two mark its start."""
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def max_edits(word: str) -> int:
+    """Typos tolerated in a search term of this length: none below 4 characters, two from 8."""
+    return 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edits (insertions, deletions, substitutions, swaps of neighbours) from a to b, or limit + 1 if more."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class SearchIndex:
+    """
+    Finds rows by name, tolerating typos and unfinished words.
+
+    Every distinct word of the name columns is stored once, with the rows it
+    appears in, and trigram postings map each trigram to the words that
+    contain it. A search term is matched against words, never rows: counting
+    shared trigrams picks the few words it can be a prefix of or be a typo
+    away from, and only those are checked exactly. Every term has to match
+    a word of the row.
+    """
+
+    # Points per matched term, best first; a fuzzy match loses one point per edit.
+    # Small integers keep ranking to a radix sort.
+    EXACT, PREFIX, FUZZY = 12, 8, 4
+
+    @timed("search.build")
+    def __init__(self, df: pd.DataFrame, columns: tuple[str, ...] = SEARCH_COLUMNS):
+        self.columns = [col for col in columns if col in df.columns]
+        self.n_rows = len(df)
+        names = [" ".join(values) for values in zip(*(df[col].astype(str).fillna("").tolist() for col in self.columns))] if self.columns else [""] * len(df)
+
+        word_ids = {}
+        word_rows = []
+        for row, name in enumerate(names):
+            for word in set(normalize(name)):
+                if word not in word_ids:
+                    word_ids[word] = len(word_rows)
+                    word_rows.append([])
+                word_rows[word_ids[word]].append(row)
+        self._word_ids = word_ids
+        self._words = list(word_ids)
+        self._word_lengths = np.fromiter((len(word) for word in self._words), dtype=np.int32, count=len(self._words))
+        self._rows = [np.array(rows, dtype=np.int32) for rows in word_rows]
+        # Ties between equal matches go to shorter names, then to the table order
+        name_lengths = np.fromiter((len(name) for name in names), dtype=np.int32, count=len(names))
+        self._length_rank = np.empty(len(names), dtype=np.int64)
+        self._length_rank[np.argsort(name_lengths, kind="stable")] = np.arange(len(names))
+
+        postings = {}
+        for word_id, word in enumerate(self._words):
+            for gram in set(trigrams(word)):
+                postings.setdefault(gram, []).append(word_id)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def _match(self, term: str) -> dict[int, int]:
+        """The words a term matches, with the points of the best kind of match."""
+        matches = {}
+        grams = trigrams(term)
+        hits = [self._postings[gram] for gram in set(grams) if gram in self._postings]
+        if not hits:
+            return matches
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._words))
+
+        # A word starting with the term shares every trigram except the term's last one
+        for word_id in np.flatnonzero(shared >= len(grams) - 1):
+            word = self._words[word_id]
+            if word == term:
+                matches[word_id] = self.EXACT
+            elif word.startswith(term):
+                matches[word_id] = self.PREFIX
+
+        # Each edit destroys at most three trigrams, which rules out most words before comparing them
+        edits = max_edits(term)
+        if edits:
+            candidates = np.flatnonzero((shared >= len(grams) - 1 - 3 * edits) & (self._word_lengths >= len(term) - edits))
+            for word_id in candidates:
+                if word_id in matches:
+                    continue
+                word = self._words[word_id]
+                # A typo in the full word, or in the part typed so far
+                distance = min(edit_distance(term, word, edits), edit_distance(term, word[:len(term)], edits))
+                if distance <= edits:
+                    matches[word_id] = self.FUZZY - distance
+        return matches
+
+    def _term_points(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The rows with a word the term matches, each once and in no particular
+        order, and per row of the table the points of its best such word.
+        """
+        points = np.zeros(self.n_rows, dtype=np.int16)
+        matches = self._match(term)
+        ids = sorted(matches, key=matches.get)
+        # Best words are written last, so they win for rows with several
+        for word_id in ids:
+            points[self._rows[word_id]] = matches[word_id]
+
+        if len(ids) < 2:
+            rows = self._rows[ids[0]] if ids else np.empty(0, dtype=np.int32)
+        else:
+            # Rows in several words are kept once, without sorting: by the one slot that ends up written for them
+            rows = np.concatenate([self._rows[word_id] for word_id in ids])
+            slots = np.arange(len(rows), dtype=np.int32)
+            owner = np.empty(self.n_rows, dtype=np.int32)
+            owner[rows] = slots
+            rows = rows[owner[rows] == slots]
+        return rows, points
+
+    @timed("search.query")
+    def _matches(self, terms: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The rows matching every term, in no particular order, with their summed
+        points. Only the rows of matched words are touched, never all rows.
+        """
+        rows, points = self._term_points(terms[0])
+        points = points[rows].astype(np.int64)
+        for term in terms[1:]:
+            term_points = self._term_points(term)[1][rows]
+            keep = term_points > 0
+            rows, points = rows[keep], points[keep] + term_points[keep]
+        return rows, points
+
+    def search(self, text: str, limit: int | None = None) -> np.ndarray:
+        """
+        Row positions matching every word of `text`, best first: exact words
+        before prefixes before typos, then shorter names, then table order. Text without any
+        words matches every row, in table order.
+        """
+        terms = list(dict.fromkeys(normalize(text)))
+        if not terms:
+            return np.arange(self.n_rows)[:limit]
+        rows, points = self._matches(terms)
+        order = np.argsort((points.max(initial=0) - points) * self.n_rows + self._length_rank[rows])
+        return rows[order][:limit].astype(np.intp)
+
+    def mask(self, text: str) -> np.ndarray:
+        """Boolean mask of the rows matching every word of `text`."""
+        terms = list(dict.fromkeys(normalize(text)))
+        mask = np.zeros(self.n_rows, dtype=bool) if terms else np.ones(self.n_rows, dtype=bool)
+        if terms:
+            mask[self._matches(terms)[0]] = True
+        return mask
+
+_indexes = {}
+
+def search_index_for(df: pd.DataFrame) -> SearchIndex:
+    """Returns the SearchIndex of `df`, building it on first use and dropping it with the DataFrame."""
+    key = id(df)
+    entry = _indexes.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    index = SearchIndex(df)
+    _indexes[key] = (weakref.ref(df), index)
+    weakref.finalize(df, _indexes.pop, key, None)
+    return index
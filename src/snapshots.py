@@ -0,0 +1,219 @@
+# src/snapshots.py
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from cache import SCHEMA_VERSION, dataset_path, feather, read_metadata, write_dataset
+
+KEY_COLUMN = "_key"
+HASH_COLUMN = "_hash"
+CHECKPOINT_INTERVAL = 30 # a full copy every 30 snapshots bounds as-of reconstruction
+MANIFEST_VERSION = 1
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _timestamp(value) -> pd.Timestamp:
+    """Parses dates and datetimes; naive values are taken as UTC."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+def row_keys(df: pd.DataFrame, key_column: str = "model") -> pd.Series:
+    """
+    Identifies each row by its model name. Repeated names get a '#2', '#3', ...
+    suffix in order of appearance, so every row keeps a stable, unique key.
+    """
+    names = df[key_column].astype(str) if key_column in df.columns else pd.Series(np.arange(len(df)).astype(str), index=df.index)
+    occurrence = names.groupby(names).cumcount()
+    return names.where(occurrence == 0, names + "#" + (occurrence + 1).astype(str))
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Content hash per row. Values are normalized first (numbers as float64,
+    everything else as text), so dtype tweaks in processing do not make every
+    row look changed.
+    """
+    normalized = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        if is_numeric_dtype(df[col]) or is_bool_dtype(df[col]):
+            normalized[col] = df[col].astype("float64")
+        else:
+            normalized[col] = df[col].astype(str)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+class SnapshotStore:
+    """
+    Append-only history of scraped datasets.
+
+    Each recorded snapshot stores only the rows that were added or changed
+    since the previous one, plus the keys of removed rows, in a delta file.
+    Every CHECKPOINT_INTERVAL snapshots a full copy is written as well (the
+    first snapshot only gets the copy), so `as_of` only needs the nearest
+    checkpoint and the deltas after it. The manifest lists the keys in each
+    delta, so price histories only open the deltas that contain the model
+    and read just the key and value columns. Files are read whatever schema
+    version wrote them, so the history survives parser and schema upgrades.
+    """
+
+    def __init__(self, root: Path, key_column: str = "model"):
+        self.root = root
+        self.key_column = key_column
+        self.manifest_path = root / "manifest.json"
+        self.state_path = dataset_path(root / "state") # key and hash of every row of the latest snapshot
+
+    # --- Manifest ---
+
+    def entries(self) -> list[dict]:
+        """The recorded snapshots, oldest first."""
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))["snapshots"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _write_manifest(self, entries: list[dict]):
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"version": MANIFEST_VERSION, "snapshots": entries}), encoding="utf-8")
+        tmp_path.replace(self.manifest_path)
+
+    # --- Writing ---
+
+    def record(self, df: pd.DataFrame, taken_at: str | None = None) -> dict | None:
+        """
+        Appends a snapshot of `df`. Returns its manifest entry, or None if
+        nothing changed since the previous snapshot and no checkpoint was due.
+        """
+        if df.empty:
+            return None
+
+        entries = self.entries()
+        seq = entries[-1]["seq"] + 1 if entries else 0
+        taken_at = taken_at or _now()
+
+        keyed = df.reset_index(drop=True)
+        keys = row_keys(keyed, self.key_column)
+        hashes = row_hashes(keyed)
+        keyed.insert(0, KEY_COLUMN, keys.to_numpy())
+
+        if entries and self.state_path.exists():
+            previous = _read_frame(self.state_path)
+            previous_hashes = pd.Series(previous[HASH_COLUMN].to_numpy(), index=previous[KEY_COLUMN].to_numpy())
+        else:
+            previous_hashes = pd.Series(dtype="uint64")
+
+        known = keys.isin(previous_hashes.index).to_numpy()
+        changed = known.copy()
+        changed[known] = previous_hashes.reindex(keys[known]).to_numpy() != hashes[known]
+        added = ~known
+        removed = sorted(set(previous_hashes.index) - set(keys))
+
+        checkpoint_due = not entries or (seq - self._last_checkpoint_seq(entries)) >= CHECKPOINT_INTERVAL
+        if not (added.any() or changed.any() or removed or checkpoint_due):
+            return None
+
+        entry = {
+            "seq": seq,
+            "taken_at": taken_at,
+            "added": int(added.sum()),
+            "changed": int(changed.sum()),
+            "removed": removed,
+            "keys": sorted(keys[added | changed]), # rows in the delta, or in the first checkpoint
+            "delta": None,
+            "checkpoint": None,
+        }
+        metadata = {"schema_version": SCHEMA_VERSION, "seq": seq, "taken_at": taken_at}
+        # A checkpoint holds every row, so the first snapshot needs no delta besides it
+        if (added.any() or changed.any()) and entries:
+            delta_path = dataset_path(self.root / "deltas" / f"{seq:06d}")
+            write_dataset(keyed[added | changed], delta_path, metadata)
+            entry["delta"] = delta_path.name
+        if checkpoint_due:
+            checkpoint_path = dataset_path(self.root / "checkpoints" / f"{seq:06d}")
+            write_dataset(keyed, checkpoint_path, metadata)
+            entry["checkpoint"] = checkpoint_path.name
+
+        write_dataset(pd.DataFrame({KEY_COLUMN: keys.to_numpy(), HASH_COLUMN: hashes}), self.state_path, metadata)
+        self._write_manifest(entries + [entry])
+        return entry
+
+    @staticmethod
+    def _last_checkpoint_seq(entries: list[dict]) -> int:
+        for entry in reversed(entries):
+            if entry["checkpoint"]:
+                return entry["seq"]
+        return -CHECKPOINT_INTERVAL
+
+    # --- Reading ---
+
+    def _read(self, folder: str, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        return _read_frame(self.root / folder / name, columns)
+
+    def as_of(self, when) -> pd.DataFrame:
+        """
+        Reconstructs the dataset as it was at `when` (a date, datetime or ISO
+        string). Returns an empty DataFrame if nothing was recorded by then.
+        """
+        target = _timestamp(when)
+        if isinstance(when, str) and len(when) == 10:
+            target += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1) # a bare date includes that whole day
+
+        entries = [entry for entry in self.entries() if _timestamp(entry["taken_at"]) <= target]
+        if not entries:
+            return pd.DataFrame()
+
+        start = max(i for i, entry in enumerate(entries) if entry["checkpoint"])
+        frame = self._read("checkpoints", entries[start]["checkpoint"]).set_index(KEY_COLUMN)
+        for entry in entries[start + 1:]:
+            if entry["removed"]:
+                frame = frame.drop(index=entry["removed"], errors="ignore")
+            if entry["delta"]:
+                delta = self._read("deltas", entry["delta"]).set_index(KEY_COLUMN)
+                # Changed rows are replaced where they are, new rows are appended
+                order = frame.index.append(delta.index[~delta.index.isin(frame.index)])
+                frame = pd.concat([frame.drop(index=delta.index, errors="ignore"), delta]).reindex(order)
+        return frame.reset_index(drop=True)
+
+    def history(self, model: str, column: str = "uvp") -> pd.DataFrame:
+        """
+        Returns when `column` changed for one model: a DataFrame with
+        `taken_at` and the new value (NaN where the model was removed).
+        """
+        rows = []
+        for entry in self.entries():
+            value = None
+            if model in entry["removed"]:
+                value = np.nan
+            # The first snapshot's rows are all in its checkpoint
+            source = ("deltas", entry["delta"]) if entry["delta"] else ("checkpoints", entry["checkpoint"]) if entry["added"] else None
+            # Manifests written before the keys were recorded have to be read to find out
+            if source is not None and model in entry.get("keys", (model,)):
+                delta = self._read(*source, columns=[KEY_COLUMN, column])
+                # Snapshots from before the column existed have no value for it
+                match = delta.loc[delta[KEY_COLUMN] == model, column] if column in delta.columns else ()
+                if len(match):
+                    value = match.iloc[0]
+            if value is None or (rows and _same(rows[-1][column], value)):
+                continue
+            rows.append({"taken_at": _timestamp(entry["taken_at"]), column: value})
+        return pd.DataFrame(rows, columns=["taken_at", column])
+
+def _read_frame(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads a file written by write_dataset, unlike read_dataset also if an
+    older schema version wrote it. With `columns`, only those it has are read.
+    """
+    if path.suffix == ".feather":
+        table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table.to_pandas()
+    df = pd.read_csv(path, usecols=None if columns is None else lambda col: col in columns)
+    dtypes = read_metadata(path).get("dtypes", {})
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+def _same(a, b) -> bool:
+    return (pd.isna(a) and pd.isna(b)) or a == b
@@ -0,0 +1,229 @@
+# src/sources.py
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from cache import content_hash
+from data_processor import align_tables, optimize_dtypes, process_dataframe
+from instrumentation import count, timed
+from scraper import FetchResult, fetch_page, parse_tables
+
+MAX_FETCH_WORKERS = 8
+MIN_HOST_INTERVAL = 1.0 # seconds between two requests to the same host
+SOURCE_COLUMN = "source"
+
+@dataclass(frozen=True)
+class Source:
+    """
+    A page with e-scooter tables.
+
+    Args:
+        name (str): Unique name, stored in the `source` column of merged data.
+        url (str): The page to fetch. Sources sharing a URL share one request.
+        table_ids (tuple[str, ...]): IDs of the tables to read, in order.
+        column_map (dict[str, str]): Renames columns of this page, after
+                                     clean_column_name, to the common names.
+        parser: Function (html, table_ids) -> {table_id: rows}, like
+                scraper.parse_tables (the default). It may run in a worker
+                process, so it must be a module-level function. Sources
+                sharing a URL and parser are parsed in one call.
+    """
+    name: str
+    url: str
+    table_ids: tuple[str, ...] = ("tablepress-2",)
+    column_map: dict[str, str] = field(default_factory=dict)
+    parser: Callable[[str, list[str]], dict[str, list[list[str]]]] | None = None
+
+_registry: dict[str, Source] = {}
+
+def register_source(source: Source) -> Source:
+    """Adds a source to the registry, replacing one with the same name."""
+    _registry[source.name] = source
+    return source
+
+def get_source(name: str) -> Source:
+    if name not in _registry:
+        raise KeyError(f"Unknown source '{name}'. Registered: {', '.join(_registry)}")
+    return _registry[name]
+
+def registered_sources() -> list[Source]:
+    return list(_registry.values())
+
+def configured_sources(names: list[str] | None = None) -> list[Source] | None:
+    """
+    The sources to scrape: `names`, or the comma-separated ESCOOTER_SOURCES
+    variable. Returns None if neither is set, meaning the single default page.
+    """
+    if not names:
+        names = [name.strip() for name in os.environ.get("ESCOOTER_SOURCES", "").split(",") if name.strip()]
+    return [get_source(name) for name in names] or None
+
+register_source(Source("escooter-treff", "https://www.escooter-treff.de/tabelle/", ("tablepress-2",)))
+register_source(Source("escooter-treff-deprecated", "https://www.escooter-treff.de/tabelle/", ("tablepress-6",)))
+
+# --- Fetching ---
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `min_interval` seconds.
+    Each caller reserves the next free slot and sleeps outside the lock, so
+    requests to different hosts never wait for each other.
+    """
+
+    def __init__(self, min_interval: float = MIN_HOST_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _fetch(url: str, validators: dict, limiter: HostRateLimiter) -> FetchResult:
+    limiter.wait(url)
+    return fetch_page(url, etag=validators.get("etag"), last_modified=validators.get("last_modified"))
+
+# --- Parsing ---
+
+def _process_tables(source: Source, tables: dict[str, list[list[str]]]) -> pd.DataFrame:
+    # Several tables are aligned and processed in one pass
+    found = {table_id: tables[table_id] for table_id in source.table_ids if tables.get(table_id)}
+    df = process_dataframe(align_tables(found, status_column=None)) if found else pd.DataFrame()
+    return df.rename(columns=source.column_map) if source.column_map else df
+
+def process_page(sources: list[Source], html: str) -> list[pd.DataFrame]:
+    """
+    Parses one page for all sources on it and processes each source's
+    tables into a DataFrame. The page is parsed once per distinct parser,
+    for the table ids of all its sources together.
+    """
+    tables = {}
+    by_parser = {}
+    for source in sources:
+        by_parser.setdefault(source.parser or parse_tables, []).append(source)
+    for parser, group in by_parser.items():
+        table_ids = list(dict.fromkeys(table_id for source in group for table_id in source.table_ids))
+        tables[parser] = parser(html, table_ids)
+    return [_process_tables(source, tables[source.parser or parse_tables]) for source in sources]
+
+def process_source(source: Source, html: str) -> pd.DataFrame:
+    """Parses and processes the tables of one source into a single DataFrame."""
+    return process_page([source], html)[0]
+
+@dataclass
+class SourceResult:
+    """The outcome of scraping one source."""
+    source: Source
+    fetch: FetchResult
+    df: pd.DataFrame | None = None # None unless the page changed and was processed
+    unchanged: bool = False
+    error: str | None = None
+
+@timed("sources.scrape")
+def scrape_sources(sources: list[Source], validators: dict[str, dict] | None = None,
+                   max_workers: int = MAX_FETCH_WORKERS, processes: int | None = None,
+                   limiter: HostRateLimiter | None = None) -> list[SourceResult]:
+    """
+    Fetches all sources concurrently and processes each page as soon as it arrives.
+
+    Every distinct URL is requested and parsed once, from a bounded thread
+    pool and rate-limited per host. With several pages, parsing and
+    processing run in a process pool while the remaining pages are still
+    downloading, so the total time is close to that of the slowest source.
+    The pool starts its workers with "spawn", since forking from the app's
+    or the refresher's threads can deadlock. With a single page, or
+    `processes=0`, they run in the calling process instead.
+
+    Args:
+        sources (list[Source]): The sources to scrape.
+        validators (dict[str, dict]): Per URL, the etag, last_modified and
+                                      html_sha256 of the previous scrape.
+        max_workers (int): Concurrent downloads.
+        processes (int | None): Worker processes for parsing. Defaults to one per CPU.
+        limiter (HostRateLimiter | None): Shared rate limiter. Defaults to a new one.
+
+    Returns:
+        list[SourceResult]: One result per source, in the order given.
+    """
+    validators = validators or {}
+    limiter = limiter or HostRateLimiter()
+    by_url = {}
+    for source in sources:
+        by_url.setdefault(source.url, []).append(source)
+
+    results = {}
+    jobs: dict[Future, list[Source]] = {}
+    use_pool = processes != 0 and len(by_url) > 1
+    pool = None
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(by_url)) or 1, thread_name_prefix="fetch") as fetchers:
+            downloads = {fetchers.submit(_fetch, url, validators.get(url, {}), limiter): url for url in by_url}
+            for download in as_completed(downloads):
+                url = downloads[download]
+                fetch = download.result()
+                previous_hash = validators.get(url, {}).get("html_sha256")
+                page_sources = by_url[url]
+                if fetch.not_modified or (fetch.text and previous_hash and content_hash(fetch.text) == previous_hash):
+                    results.update({source.name: SourceResult(source, fetch, unchanged=True) for source in page_sources})
+                elif not fetch.text:
+                    results.update({source.name: SourceResult(source, fetch, error=f"Could not fetch {url}") for source in page_sources})
+                elif use_pool:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+                    jobs[pool.submit(process_page, page_sources, fetch.text)] = page_sources
+                    results.update({source.name: SourceResult(source, fetch) for source in page_sources})
+                else:
+                    try:
+                        for source, df in zip(page_sources, process_page(page_sources, fetch.text)):
+                            results[source.name] = SourceResult(source, fetch, df=df)
+                    except Exception as e:
+                        results.update({source.name: SourceResult(source, fetch, error=f"{type(e).__name__}: {e}") for source in page_sources})
+
+        for job in as_completed(jobs):
+            try:
+                for source, df in zip(jobs[job], job.result()):
+                    results[source.name].df = df
+            except Exception as e:
+                for source in jobs[job]:
+                    results[source.name].error = f"{type(e).__name__}: {e}"
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for result in results.values():
+        if result.df is not None and result.df.empty:
+            result.df, result.error = None, f"No tables found on {result.source.url}"
+        if result.error:
+            count("sources.failed")
+            print(f"Warning: Source '{result.source.name}': {result.error}")
+    return [results[source.name] for source in sources]
+
+def merge_results(results: list[SourceResult], previous: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Combines the sources into one DataFrame with a `source` column. Sources
+    that are unchanged or failed this time keep their rows from `previous`.
+    """
+    frames = []
+    for result in results:
+        if result.df is not None:
+            frames.append(result.df.assign(**{SOURCE_COLUMN: result.source.name}))
+        elif previous is not None and SOURCE_COLUMN in previous.columns:
+            frames.append(previous[previous[SOURCE_COLUMN] == result.source.name])
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    # Categories that differ between sources come out of concat as plain text; compact them again
+    return optimize_dtypes(pd.concat(frames, ignore_index=True))
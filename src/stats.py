@@ -0,0 +1,201 @@
+# src/stats.py
+
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_string_dtype
+
+from cache import SCHEMA_VERSION, read_dataset, write_dataset
+from instrumentation import timed
+
+STATS_VERSION = 1 # bump when the stored layout changes, so older files are recomputed
+N_BINS = 20 # histogram bins per numeric column; bin ids fit in an int8
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+REGRESSIONS = (("akku_wh", "reichweite_km_offiziell"),) # (x, y) pairs fitted with a least-squares line
+MAX_GROUPS = 20 # text columns with more distinct values (like model names) are not grouped by
+MISSING_BIN = -1
+
+def numeric_columns(df: pd.DataFrame) -> list[str]:
+    """The columns that get summaries and histograms."""
+    return [col for col in df.columns if is_numeric_dtype(df[col]) and not is_bool_dtype(df[col])]
+
+def group_columns(df: pd.DataFrame) -> list[str]:
+    """The columns to group by: categories, yes/no columns and text columns with few distinct values."""
+    return [col for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype) or is_bool_dtype(df[col])
+            or (is_string_dtype(df[col]) and df[col].nunique() <= MAX_GROUPS)]
+
+def _group_codes(series: pd.Series) -> tuple[np.ndarray, list]:
+    # Integer codes (-1 for missing) and the value of each code
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories.tolist()
+    codes, values = pd.factorize(series, sort=True)
+    return codes, values.tolist()
+
+def _fit(x: np.ndarray, y: np.ndarray) -> dict:
+    """Least-squares line y = slope * x + intercept over the rows where both are present."""
+    present = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[present], y[present]
+    n = len(x)
+    if n < 2 or np.ptp(x) == 0:
+        return {"n": n, "slope": np.nan, "intercept": np.nan, "r2": np.nan}
+    dx, dy = x - x.mean(), y - y.mean()
+    sxx, sxy, syy = (dx * dx).sum(), (dx * dy).sum(), (dy * dy).sum()
+    slope = sxy / sxx
+    return {"n": n, "slope": float(slope), "intercept": float(y.mean() - slope * x.mean()),
+            "r2": float(sxy * sxy / (sxx * syy)) if syy else np.nan}
+
+def _bin_quantiles(edges: np.ndarray, counts: np.ndarray, levels=QUANTILES) -> list[float]:
+    # Quantiles read off a histogram, interpolating linearly within the bin they fall in
+    total = counts.sum()
+    if not total:
+        return [np.nan] * len(levels)
+    cumulative = np.concatenate(([0], np.cumsum(counts)))
+    return np.interp(np.asarray(levels) * total, cumulative, edges).tolist()
+
+@dataclass
+class DatasetStats:
+    """
+    Pre-aggregated statistics of one dataset version.
+
+    `columns` holds count, mean, std, min, max, QUANTILES and histogram
+    (edges and counts) per numeric column; `groups` the row count and the
+    mean of every numeric column per value of each group column;
+    `regressions` one line per REGRESSIONS pair. `bins` keeps the histogram
+    bin of every row, so the histogram of any subset of rows is a single
+    bincount instead of a pass over the values.
+    """
+    version: str
+    n_rows: int
+    columns: dict[str, dict] = field(default_factory=dict)
+    groups: dict[str, dict] = field(default_factory=dict)
+    regressions: list[dict] = field(default_factory=list)
+    bins: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    def histogram(self, column: str, positions: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Bin edges and counts of a numeric column, over all rows or those at `positions`."""
+        summary = self.columns[column]
+        edges = np.asarray(summary["edges"])
+        if positions is None:
+            return edges, np.asarray(summary["counts"])
+        ids = self.bins[column][positions]
+        return edges, np.bincount(ids[ids != MISSING_BIN], minlength=len(edges) - 1)
+
+    def quantiles(self, column: str, positions: np.ndarray | None = None) -> dict[float, float]:
+        """
+        QUANTILES of a numeric column. Exact over all rows; for a subset they
+        are read off its histogram, so they are accurate to within a bin.
+        """
+        if positions is None:
+            return dict(zip(QUANTILES, self.columns[column]["quantiles"]))
+        return dict(zip(QUANTILES, _bin_quantiles(*self.histogram(column, positions))))
+
+    def group_means(self, df: pd.DataFrame, column: str, positions: np.ndarray | None = None) -> pd.DataFrame:
+        """
+        Row count and numeric means per value of a group column, as a
+        DataFrame indexed by the value. Over all rows this is the stored
+        result; for a subset it is a few bincounts over its rows of `df`.
+        """
+        if positions is None:
+            group = self.groups[column]
+            return pd.DataFrame({"count": group["count"], **group["mean"]}, index=pd.Index(group["values"], name=column))
+        codes, values = _group_codes(df[column])
+        codes = codes[positions]
+        present = codes >= 0
+        counts = np.bincount(codes[present], minlength=len(values))
+        means = {}
+        for numeric in self.columns:
+            column_values = df[numeric].to_numpy(dtype="float64", na_value=np.nan)[positions][present]
+            known = ~np.isnan(column_values)
+            sums = np.bincount(codes[present][known], weights=column_values[known], minlength=len(values))
+            n = np.bincount(codes[present][known], minlength=len(values))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[numeric] = sums / n
+        return pd.DataFrame({"count": counts, **means}, index=pd.Index(values, name=column))
+
+    def regression(self, df: pd.DataFrame, x: str, y: str, positions: np.ndarray | None = None) -> dict:
+        """Slope, intercept, R² and number of rows of the line fitting `y` to `x`."""
+        if positions is None:
+            for fit in self.regressions:
+                if fit["x"] == x and fit["y"] == y:
+                    return fit
+        values = lambda col: df[col].to_numpy(dtype="float64", na_value=np.nan)
+        x_values, y_values = values(x), values(y)
+        if positions is not None:
+            x_values, y_values = x_values[positions], y_values[positions]
+        return {"x": x, "y": y, **_fit(x_values, y_values)}
+
+@timed("stats.compute")
+def compute_stats(df: pd.DataFrame, version: str) -> DatasetStats:
+    """
+    Computes all statistics of `df` at once: the numeric columns are stacked
+    into one matrix for the summaries and quantiles, and every histogram and
+    group aggregate is a bincount over integer codes.
+    """
+    stats = DatasetStats(version=version, n_rows=len(df))
+    numeric = numeric_columns(df)
+    if not numeric or df.empty:
+        return stats
+
+    matrix = np.column_stack([df[col].to_numpy(dtype="float64", na_value=np.nan) for col in numeric])
+    known = ~np.isnan(matrix)
+    counts = known.sum(axis=0)
+    with warnings.catch_warnings(action="ignore", category=RuntimeWarning): # columns without any value
+        means = np.nanmean(matrix, axis=0)
+        stds = np.nanstd(matrix, axis=0, ddof=1)
+        lows, highs = np.nanmin(matrix, axis=0), np.nanmax(matrix, axis=0)
+        quantiles = np.nanquantile(matrix, QUANTILES, axis=0)
+
+    for i, col in enumerate(numeric):
+        if not counts[i]:
+            continue
+        edges = np.linspace(lows[i], highs[i], N_BINS + 1) if highs[i] > lows[i] else np.array([lows[i], lows[i] + 1.0])
+        # The last bin includes its upper edge, like numpy.histogram
+        ids = np.clip(np.searchsorted(edges, matrix[:, i], side="right") - 1, 0, len(edges) - 2).astype(np.int8)
+        ids[~known[:, i]] = MISSING_BIN
+        stats.bins[col] = ids
+        stats.columns[col] = {
+            "count": int(counts[i]), "mean": float(means[i]), "std": float(stds[i]),
+            "min": float(lows[i]), "max": float(highs[i]), "quantiles": quantiles[:, i].tolist(),
+            "edges": edges.tolist(), "counts": np.bincount(ids[ids != MISSING_BIN], minlength=len(edges) - 1).tolist(),
+        }
+
+    filled = np.where(known, matrix, 0.0)
+    for col in group_columns(df):
+        codes, values = _group_codes(df[col])
+        present = codes >= 0
+        group_codes = codes[present]
+        n_groups = len(values)
+        means = {}
+        for i, numeric_col in enumerate(numeric):
+            sums = np.bincount(group_codes, weights=filled[present, i], minlength=n_groups)
+            n = np.bincount(group_codes, weights=known[present, i], minlength=n_groups)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[numeric_col] = (sums / n).tolist()
+        stats.groups[col] = {"values": [value.item() if hasattr(value, "item") else value for value in values],
+                             "count": np.bincount(group_codes, minlength=n_groups).tolist(), "mean": means}
+
+    for x, y in REGRESSIONS:
+        if x in numeric and y in numeric:
+            stats.regressions.append({"x": x, "y": y, **_fit(matrix[:, numeric.index(x)], matrix[:, numeric.index(y)])})
+    return stats
+
+# --- Storage ---
+
+def write_stats(stats: DatasetStats, path: Path) -> None:
+    """Stores `stats` next to its dataset: the per-row bins as a frame, everything else in its metadata."""
+    metadata = {"schema_version": SCHEMA_VERSION, "stats_version": STATS_VERSION, "dataset_version": stats.version,
+                "n_rows": stats.n_rows, "columns": stats.columns, "groups": stats.groups, "regressions": stats.regressions}
+    write_dataset(pd.DataFrame(stats.bins, index=pd.RangeIndex(stats.n_rows)), path, metadata)
+
+def read_stats(path: Path) -> DatasetStats | None:
+    """Reads stats written by write_stats. Returns None if they are missing or were written by another version."""
+    bins, metadata = read_dataset(path) if path.exists() else (pd.DataFrame(), {})
+    if metadata.get("stats_version") != STATS_VERSION:
+        return None
+    return DatasetStats(version=metadata["dataset_version"], n_rows=metadata["n_rows"], columns=metadata["columns"],
+                        groups=metadata["groups"], regressions=metadata["regressions"],
+                        bins={col: bins[col].to_numpy(dtype=np.int8) for col in metadata["columns"]})
@@ -22,6 +22,35 @@ translations = {
         "option_yes": "Ja",
         "option_no": "Nein",
         "error_loading_data": "E-Scooter-Daten konnten nicht geladen werden...",
+        "data_cached": "Daten vom {time}",
+        "data_refreshed": "Daten zuletzt aktualisiert: {time} ({duration:.1f} s)",
+        "data_refresh_failed": "Aktualisierung um {time} fehlgeschlagen, zeige die letzten Daten.",
+        "profile_title": "⏱️ Laufzeiten",
+        "include_deprecated": "Nicht mehr erhältliche Modelle einbeziehen",
+        "status_values": {"current": "Aktuell", "deprecated": "Nicht mehr erhältlich"},
+        "sort_by": "Sortieren nach",
+        "sort_none": "Tabellenreihenfolge",
+        "sort_descending": "Absteigend",
+        "page": "Seite",
+        "rows_shown": "Zeilen {first}–{last} von {total}",
+        "search": "🔍 Modell suchen",
+        "search_placeholder": "z. B. ninebot max – Tippfehler sind kein Problem",
+        "ranking_title": "🏆 Rangliste",
+        "ranking_mode": "Methode",
+        "ranking_modes": {"score": "Gewichtete Punktzahl", "pareto": "Pareto-Front"},
+        "ranking_criteria": "Kriterien",
+        "ranking_weight": "Gewichtung: {name}",
+        "ranking_direction": "{name}: {direction}",
+        "ranking_directions": {True: "mehr ist besser", False: "weniger ist besser"},
+        "ranking_score_caption": "Die besten {shown} von {total} gefilterten Scootern. Jedes Kriterium wird auf 0–1 normiert, bevor es gewichtet wird.",
+        "ranking_pareto_caption": "{shown} von {total} gefilterten Scootern werden von keinem anderen in allen Kriterien zugleich übertroffen.",
+        "stats_title": "📊 Statistik",
+        "stats_column": "Merkmal",
+        "stats_count": "Anzahl",
+        "stats_quantiles": "Median {median:,.0f} · mittlere Hälfte {q25:,.0f}–{q75:,.0f} · 90 % zwischen {q05:,.0f} und {q95:,.0f}",
+        "stats_filtered_note": "Bei gefilterten Daten aus den Histogrammklassen geschätzt.",
+        "stats_groups": "Durchschnitt nach {name}",
+        "stats_regression": "Je 100 Wh mehr Akku: {slope:+.1f} km Reichweite (R² = {r2:.2f}, {n} Scooter)",
 
         "column_names": {
             "model": "Modell",
@@ -34,7 +63,13 @@ translations = {
             "bremslicht": "Bremslicht",
             "wechselakku": "Wechselakku",
             "zuladung_bis_kg": "Zuladung (kg)",
-            "uvp": "Preis (€)"
+            "uvp": "Preis (€)",
+            "status": "Status",
+            "wh_per_kg": "Wh pro kg",
+            "w_per_kg": "W pro kg",
+            "eur_per_wh": "€ pro Wh",
+            "eur_per_km": "€ pro km Reichweite",
+            "score": "Punktzahl"
         }
     },
     "en": {
@@ -58,6 +93,35 @@ translations = {
         "option_yes": "Yes",
         "option_no": "No",
         "error_loading_data": "Could not load e-scooter data...",
+        "data_cached": "Data from {time}",
+        "data_refreshed": "Data last refreshed: {time} ({duration:.1f} s)",
+        "data_refresh_failed": "Refresh at {time} failed, showing the last data.",
+        "profile_title": "⏱️ Timings",
+        "include_deprecated": "Include discontinued models",
+        "status_values": {"current": "Current", "deprecated": "Discontinued"},
+        "sort_by": "Sort by",
+        "sort_none": "Table order",
+        "sort_descending": "Descending",
+        "page": "Page",
+        "rows_shown": "Rows {first}–{last} of {total}",
+        "search": "🔍 Search models",
+        "search_placeholder": "e.g. ninebot max – typos are fine",
+        "ranking_title": "🏆 Ranking",
+        "ranking_mode": "Method",
+        "ranking_modes": {"score": "Weighted score", "pareto": "Pareto front"},
+        "ranking_criteria": "Criteria",
+        "ranking_weight": "Weight: {name}",
+        "ranking_direction": "{name}: {direction}",
+        "ranking_directions": {True: "more is better", False: "less is better"},
+        "ranking_score_caption": "The best {shown} of {total} filtered scooters. Each criterion is normalized to 0–1 before weighting.",
+        "ranking_pareto_caption": "{shown} of {total} filtered scooters are not beaten by any other on all criteria at once.",
+        "stats_title": "📊 Statistics",
+        "stats_column": "Attribute",
+        "stats_count": "Count",
+        "stats_quantiles": "Median {median:,.0f} · middle half {q25:,.0f}–{q75:,.0f} · 90% between {q05:,.0f} and {q95:,.0f}",
+        "stats_filtered_note": "Estimated from the histogram bins for filtered data.",
+        "stats_groups": "Averages by {name}",
+        "stats_regression": "Per 100 Wh more battery: {slope:+.1f} km range (R² = {r2:.2f}, {n} scooters)",
 
         "column_names": {
             "model": "Model",
@@ -70,7 +134,13 @@ translations = {
             "bremslicht": "Brake Light",
             "wechselakku": "Swappable Battery",
             "zuladung_bis_kg": "Max. Load (kg)",
-            "uvp": "Price (€)"
+            "uvp": "Price (€)",
+            "status": "Status",
+            "wh_per_kg": "Wh per kg",
+            "w_per_kg": "W per kg",
+            "eur_per_wh": "€ per Wh",
+            "eur_per_km": "€ per km of range",
+            "score": "Score"
         }
     }
 }
\ No newline at end of file
@@ -0,0 +1,71 @@
+# src/viewer.py
+
+import pandas as pd
+from rich.table import Table
+
+from instrumentation import timed
+
+DEFAULT_PAGE_SIZE = 25
+
+class PagedTable:
+    """
+    A page-at-a-time view of a DataFrame for the terminal.
+
+    Only the rows of the current page and the projected columns are turned
+    into a rich Table, so rendering cost depends on the page size rather than
+    on the size of the data.
+    """
+
+    def __init__(self, df: pd.DataFrame, page_size: int = DEFAULT_PAGE_SIZE,
+                 columns: list[str] | None = None, title: str = "E-Scooter Data"):
+        self.df = df
+        self.page_size = max(1, page_size)
+        self.title = title
+        self.page = 0
+        self.columns = list(df.columns)
+        if columns is not None:
+            self.project(columns)
+
+    @property
+    def n_pages(self) -> int:
+        return max(1, -(-len(self.df) // self.page_size))
+
+    def jump(self, page: int) -> int:
+        """Moves to a page (0-based), clamped to the valid range. Returns the new page."""
+        self.page = min(max(page, 0), self.n_pages - 1)
+        return self.page
+
+    def next(self) -> int:
+        return self.jump(self.page + 1)
+
+    def prev(self) -> int:
+        return self.jump(self.page - 1)
+
+    def project(self, columns: list[str]) -> list[str]:
+        """Limits the view to the given columns, ignoring unknown names. An empty list shows all."""
+        selected = [col for col in columns if col in self.df.columns]
+        self.columns = selected or list(self.df.columns)
+        return self.columns
+
+    def rows(self) -> list[list[str]]:
+        """The cells of the current page as strings, built from the column arrays."""
+        start = self.page * self.page_size
+        page = self.df.iloc[start:start + self.page_size]
+        arrays = [page[col].to_numpy(dtype=object) for col in self.columns]
+        return [[str(item) if pd.notna(item) else "" for item in row] for row in zip(*arrays)]
+
+    @timed("viewer.render")
+    def render(self) -> Table:
+        """Builds the rich Table for the current page."""
+        start = self.page * self.page_size
+        end = min(start + self.page_size, len(self.df))
+        caption = f"Rows {start + 1}-{end} of {len(self.df)} | Page {self.page + 1} of {self.n_pages}"
+        rich_table = Table(title=self.title, caption=caption, show_header=True, header_style="bold magenta")
+
+        for column in self.columns:
+            rich_table.add_column(str(column))
+
+        for row in self.rows():
+            rich_table.add_row(*row)
+
+        return rich_table
@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# The modules are imported flat, like main.py and app.py do from src/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "src"), str(ROOT / "benchmarks")]
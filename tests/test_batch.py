@@ -0,0 +1,52 @@
+# tests/test_batch.py
+
+import io
+import json
+
+import pytest
+
+from batch import BatchQuery, QueryError, QueryServer
+from data_processor import process_dataframe
+from fixtures import synthetic_page
+from scraper import parse_tables
+
+@pytest.fixture(scope="module")
+def df():
+    return process_dataframe(parse_tables(synthetic_page(n_rows=50), ["tablepress-2"])["tablepress-2"])
+
+def ask(server: QueryServer, request) -> dict:
+    return json.loads(server.handle(json.dumps(request)))
+
+@pytest.mark.parametrize("request_data", [
+    {"where": 5}, {"where": ["uvp <= 800", 3]}, {"columns": {"model": 1}}, {"sort": 5},
+    {"limit": True}, {"limit": "10"}, {"limit": -1}, {"format": ["csv"]}, {"output": 1},
+])
+def test_malformed_queries_are_rejected(request_data):
+    with pytest.raises(QueryError):
+        BatchQuery.from_dict(request_data)
+
+@pytest.mark.parametrize("request_data", [
+    {"where": 5}, {"sort": 5}, {"columns": ["nope"]}, {"where": "nope <= 5"}, {"limit": False}, [1, 2],
+])
+def test_server_answers_bad_requests_with_an_error(df, request_data):
+    server = QueryServer(lambda: df)
+    out = io.StringIO()
+    server.serve_stream(io.StringIO(json.dumps(request_data) + "\n" + json.dumps({"id": 2, "limit": 1}) + "\n"), out)
+    first, second = map(json.loads, out.getvalue().splitlines())
+    assert "error" in first
+    assert second["id"] == 2 and second["count"] == 1 # still serving
+
+def test_output_is_only_written_inside_the_output_directory(df, tmp_path):
+    assert "disabled" in ask(QueryServer(lambda: df), {"output": str(tmp_path / "x.csv")})["error"]
+
+    server = QueryServer(lambda: df, output_dir=tmp_path / "results")
+    for output in ("../x.csv", str(tmp_path / "x.csv"), "/etc/x.csv", "."):
+        assert "not a file in the output directory" in ask(server, {"output": output})["error"]
+    assert not (tmp_path / "x.csv").exists()
+
+    # A missing directory is an error response, not a crash
+    assert ask(server, {"id": 1, "output": "x.csv"})["error"].startswith("FileNotFoundError")
+    (tmp_path / "results").mkdir()
+    response = ask(server, {"id": 2, "output": "x.csv", "limit": 3})
+    assert response == {"id": 2, "count": 3, "output": str(tmp_path / "results" / "x.csv")}
+    assert len((tmp_path / "results" / "x.csv").read_text(encoding="utf-8").splitlines()) == 4
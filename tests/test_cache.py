@@ -0,0 +1,88 @@
+# tests/test_cache.py
+
+import os
+import threading
+import time
+
+import pytest
+
+import scraper
+from cache import DatasetCache, build_metadata, write_dataset
+from data_processor import process_dataframe
+from fixtures import synthetic_page
+from scraper import FetchResult, parse_tables
+
+URL = "http://127.0.0.1:9/tabelle/"
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Replaces the network with a failing fetch and records the URLs it was asked for."""
+    calls = []
+
+    def fetch_page(url, *args, **kwargs):
+        calls.append(url)
+        return FetchResult(url) # status 0: the request failed
+
+    monkeypatch.setattr(scraper, "fetch_page", fetch_page)
+    return calls
+
+def write_cached(cache: DatasetCache, age: float):
+    html = synthetic_page(n_rows=20)
+    df = process_dataframe(parse_tables(html, ["tablepress-2"])["tablepress-2"])
+    write_dataset(df, cache.path, build_metadata(cache.url, html))
+    written = time.time() - age
+    os.utime(cache.path, (written, written))
+
+def wait_for_revalidation(cache: DatasetCache):
+    for thread in threading.enumerate():
+        if thread.name == f"revalidate-{cache.key}":
+            thread.join(5)
+
+def test_cold_miss_scrapes_once_per_backoff(tmp_path, fetches):
+    cache = DatasetCache(URL, cache_dir=tmp_path, retry_after=60)
+    assert cache.get().empty and cache.last_status == "error"
+    assert cache.get().empty and cache.last_status == "error"
+    # Another process sharing the cache directory backs off too
+    assert DatasetCache(URL, cache_dir=tmp_path, retry_after=60).get().empty
+    assert len(fetches) == 1
+
+def test_retries_once_the_backoff_has_passed(tmp_path, fetches):
+    cache = DatasetCache(URL, cache_dir=tmp_path, retry_after=60)
+    cache.get()
+    failed = time.time() - 61
+    os.utime(cache.failure_path, (failed, failed))
+    cache.get()
+    assert len(fetches) == 2
+
+def test_stale_entry_revalidates_once_per_backoff(tmp_path, fetches):
+    cache = DatasetCache(URL, cache_dir=tmp_path, ttl=60, stale_ttl=3600, retry_after=60)
+    write_cached(cache, age=120)
+    for _ in range(3):
+        assert len(cache.get()) == 20 # the stale rows, served while revalidating
+        wait_for_revalidation(cache)
+    assert len(fetches) == 1
+    assert cache.backing_off()
+
+def test_successful_refresh_ends_the_backoff(tmp_path, fetches, monkeypatch):
+    cache = DatasetCache(URL, cache_dir=tmp_path, retry_after=60)
+    cache.get()
+    assert cache.backing_off()
+
+    html = synthetic_page(n_rows=20)
+    monkeypatch.setattr(scraper, "fetch_page", lambda url, *args, **kwargs: FetchResult(url, 200, html))
+    assert len(cache.refresh()) == 20
+    assert cache.last_status == "refreshed"
+    assert not cache.backing_off()
+    assert not cache.failure_path.exists()
+
+def test_sources_cannot_be_combined_with_the_all_variant(tmp_path):
+    from sources import Source
+    with pytest.raises(ValueError, match="cannot be combined with sources"):
+        DatasetCache(URL, cache_dir=tmp_path, sources=[Source("a", URL)], variant="all")
+
+def test_page_without_table_header_is_a_failed_refresh(tmp_path, monkeypatch):
+    html = '<table id="tablepress-2"><tbody><tr><td>1</td></tr></tbody></table>'
+    monkeypatch.setattr(scraper, "fetch_page", lambda url, *args, **kwargs: FetchResult(url, 200, html))
+    cache = DatasetCache(URL, cache_dir=tmp_path, retry_after=60)
+    assert cache.refresh().empty
+    assert cache.last_status == "error" and cache.backing_off()
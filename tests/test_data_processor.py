@@ -0,0 +1,145 @@
+# tests/test_data_processor.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache import SCHEMA_VERSION, export_csv, read_dataset, write_dataset
+from data_processor import (align_tables, dtype_report, parse_boolean_series, parse_numeric_series,
+                            parse_numeric_value, process_dataframe, process_tables)
+from fixtures import synthetic_page
+from scraper import parse_tables
+
+NUMERIC_CASES = [
+    "1.299,00 €", "1.000", "3,5", "0,5", "45 km", "ca. 45 km", "bis zu 25", "20-25 km/h",
+    "2x250", "2x 500W", "2X250", "2x", "x2", "12x", "2x250x2", "0,5x2", "xx 3",
+    "", " ", "nein", "k.A.", "—", "١٢٣", "١٢٣x٢", "25½", "1.2.3", ",5", "5,",
+    None, np.nan, 5, 2.5,
+]
+BOOLEAN_CASES = ["ja", "Ja", "JA!", "jap", "✓", "✓ vorne", "nein", "", " ", "x", None, np.nan, True, 1]
+
+def scalar_numeric(values) -> np.ndarray:
+    """What process_dataframe produced before it was vectorized."""
+    return pd.to_numeric(pd.Series(values, dtype=object).apply(parse_numeric_value), errors="coerce").astype(float).to_numpy()
+
+def scalar_boolean(values) -> np.ndarray:
+    return np.array([('ja' in str(value).lower() or '✓' in str(value)) for value in values])
+
+def assert_same_numbers(actual: pd.Series, expected: np.ndarray):
+    np.testing.assert_array_equal(actual.to_numpy(dtype="float64"), expected)
+
+@pytest.mark.parametrize("min_rows", [0, len(NUMERIC_CASES) + 1], ids=["vectorized", "cell by cell"])
+@pytest.mark.parametrize("dtype", [object, "str"])
+def test_numeric_edge_cases(min_rows, dtype):
+    values = NUMERIC_CASES if dtype is object else [value for value in NUMERIC_CASES if isinstance(value, str) or value is None]
+    series = pd.Series(values, dtype=dtype)
+    parsed = parse_numeric_series(series, min_rows=min_rows)
+    assert parsed.dtype == "float64"
+    assert parsed.index.equals(series.index)
+    assert_same_numbers(parsed, scalar_numeric(values))
+
+@pytest.mark.parametrize("min_rows", [0, 10**9], ids=["vectorized", "cell by cell"])
+def test_numeric_without_strings(min_rows):
+    parsed = parse_numeric_series(pd.Series([None, np.nan, 3], dtype=object), min_rows=min_rows)
+    assert_same_numbers(parsed, scalar_numeric([None, np.nan, 3]))
+
+def test_boolean_edge_cases():
+    parsed = parse_boolean_series(pd.Series(BOOLEAN_CASES, dtype=object))
+    # Missing cells stay missing; every other cell parses like before
+    assert parsed.dtype == "boolean"
+    missing = pd.isna(pd.Series(BOOLEAN_CASES, dtype=object)).to_numpy()
+    assert parsed.isna().to_numpy().tolist() == missing.tolist()
+    np.testing.assert_array_equal(parsed[~missing].to_numpy(dtype=bool), scalar_boolean(BOOLEAN_CASES)[~missing])
+
+    present = [case for case in BOOLEAN_CASES if not pd.isna(case)]
+    parsed = parse_boolean_series(pd.Series(present, dtype=object))
+    assert parsed.dtype == bool
+    np.testing.assert_array_equal(parsed.to_numpy(), scalar_boolean(present))
+
+@pytest.fixture(scope="module")
+def synthetic_table() -> list[list[str]]:
+    return parse_tables(synthetic_page(n_rows=600, seed=1), ["tablepress-2"])["tablepress-2"]
+
+@pytest.mark.parametrize("min_rows", [0, 10**9], ids=["vectorized", "cell by cell"])
+def test_synthetic_page_columns(synthetic_table, min_rows):
+    raw = pd.DataFrame(synthetic_table[1:], columns=synthetic_table[0])
+    for column in raw.columns:
+        assert_same_numbers(parse_numeric_series(raw[column], min_rows=min_rows), scalar_numeric(raw[column]))
+        np.testing.assert_array_equal(parse_boolean_series(raw[column]).to_numpy(), scalar_boolean(raw[column]))
+
+def test_process_dataframe_matches_scalar_parsing(synthetic_table):
+    df = process_dataframe(synthetic_table, optimize=False)
+    raw = pd.DataFrame(synthetic_table[1:], columns=synthetic_table[0])
+    assert_same_numbers(df["uvp"], scalar_numeric(raw["UVP*"]))
+    assert_same_numbers(df["motor_w"], scalar_numeric(raw["Motor W"]))
+    np.testing.assert_array_equal(df["bremslicht"].to_numpy(), scalar_boolean(raw["Bremslicht"]))
+    blinker = pd.Series(raw["Blinker"].apply(lambda x: parse_numeric_value(x) if x else 0)).fillna(0).astype(int)
+    np.testing.assert_array_equal(df["blinker"].to_numpy(), blinker.to_numpy())
+
+def test_repeated_headers_are_numbered_not_dropped(capsys):
+    tables = {"current": [["Modell", "Preis", "Preis*"], ["A", "1", "2"]],
+              "deprecated": [["Modell", "Preis"], ["B", "3"]]}
+    assert align_tables(tables) == [["Modell", "Preis", "Preis* 2", "status"],
+                                    ["A", "1", "2", "current"], ["B", "3", None, "deprecated"]]
+    assert "'preis_2'" in capsys.readouterr().out
+    assert list(process_dataframe(align_tables(tables, status_column=None)).columns) == ["modell", "preis", "preis_2"]
+
+def test_columns_missing_from_a_table_stay_missing():
+    tables = {"current": [["eScooter", "UVP*", "Bremslicht", "Wechselakku", "Blinker"],
+                          ["A", "999", "ja", "", "2"], ["B", "499", "nein", "✓", ""]],
+              "deprecated": [["eScooter", "UVP*", "Bremslicht"], ["C", "299", "ja"], ["D", "199", ""]]}
+    df = process_tables(tables)
+    assert df["bremslicht"].dtype == bool
+    assert df["bremslicht"].tolist() == [True, False, True, False]
+    # The deprecated table says nothing about these, so they are neither yes nor no
+    assert df["wechselakku"].dtype == "boolean"
+    assert df["wechselakku"].tolist() == [False, True, pd.NA, pd.NA]
+    assert df["blinker"].tolist() == [2, 0, pd.NA, pd.NA]
+    assert df.loc[df["wechselakku"] == False, "model"].tolist() == ["A"]
+
+def cells(df: pd.DataFrame) -> dict[str, list]:
+    """Every value as a plain Python object, missing ones as None, to compare frames whatever their dtypes."""
+    return {col: [None if pd.isna(value) else value.item() if hasattr(value, "item") else value
+                  for value in df[col].astype(object)] for col in df.columns}
+
+GAPPY_TABLE = [
+    ["eScooter", "UVP*", "Gewicht kg", "Akku Wh", "Reichweite km (offiziell)", "Federung", "Bremslicht"],
+    ["A", "1.299,00 €", "12,3", "", "ca. 45 km", "vorne", "ja"], # 12.3 has no exact float32
+    ["B", "", "14,5", "70000", "", "keine", ""],
+    ["C", "499", "", "360", "bis zu 25", "", "nein"],
+]
+
+@pytest.fixture(scope="module", params=["current", "current and deprecated", "with gaps"])
+def raw_table(request) -> list[list[str]]:
+    if request.param == "with gaps":
+        return GAPPY_TABLE
+    tables = parse_tables(synthetic_page(n_rows=600, seed=2), ["tablepress-2", "tablepress-6"])
+    if request.param == "current":
+        return tables["tablepress-2"]
+    return align_tables({"current": tables["tablepress-2"], "deprecated": tables["tablepress-6"]})
+
+def test_compact_dtypes_keep_every_value(raw_table, tmp_path):
+    plain = process_dataframe(raw_table, optimize=False)
+    compact = process_dataframe(raw_table)
+    assert cells(compact) == cells(plain)
+    report = dtype_report(plain, compact)
+    assert report.loc["total", "saved_bytes"] >= 0
+    assert (report["after_bytes"] <= report["before_bytes"]).all()
+
+    # Stored and read back, both ways the cache can store it
+    def roundtrip(df, name):
+        write_dataset(df, tmp_path / name, {"schema_version": SCHEMA_VERSION})
+        return read_dataset(tmp_path / name)[0]
+
+    stored = roundtrip(compact, "dataset.feather")
+    assert stored.dtypes.to_dict() == compact.dtypes.to_dict()
+    assert cells(stored) == cells(plain)
+    # CSV cannot tell empty text from missing text, whatever the dtypes
+    stored = roundtrip(compact, "dataset.csv")
+    assert stored.dtypes.to_dict() == compact.dtypes.to_dict()
+    assert cells(stored) == cells(roundtrip(plain, "plain.csv"))
+
+    # Exported for spreadsheets, the numbers read back the same
+    export_csv(compact, tmp_path / "compact.csv")
+    export_csv(plain, tmp_path / "plain.csv")
+    assert cells(pd.read_csv(tmp_path / "compact.csv")) == cells(pd.read_csv(tmp_path / "plain.csv"))
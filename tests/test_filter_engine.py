@@ -0,0 +1,28 @@
+# tests/test_filter_engine.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_engine import compare_filter, index_for
+
+OPERATORS = ['<', '<=', '>', '>=', '==']
+
+@pytest.fixture(scope="module")
+def df() -> pd.DataFrame:
+    return pd.DataFrame({"uvp": [500.0, 999.0, 1000.0, np.nan, 1500.0, 1000.0]})
+
+def pandas_filter(df: pd.DataFrame, operator: str, value: float) -> np.ndarray:
+    """The comparison filter_by_numeric ran before the index existed."""
+    column = df["uvp"]
+    mask = {'<': column < value, '<=': column <= value, '>': column > value, '>=': column >= value, '==': column == value}[operator]
+    return np.flatnonzero(mask.to_numpy())
+
+@pytest.mark.parametrize("operator", OPERATORS)
+@pytest.mark.parametrize("value", [0.0, 999.0, 1000.0, 1200.0, 2000.0, float("nan"), float("inf"), float("-inf")])
+def test_comparisons_match_pandas(df, operator, value):
+    index = index_for(df)
+    predicate = compare_filter("uvp", operator, value)
+    expected = pandas_filter(df, operator, value)
+    np.testing.assert_array_equal(np.sort(index.positions([predicate])), expected)
+    np.testing.assert_array_equal(np.flatnonzero(index.mask([predicate])), expected)
@@ -0,0 +1,87 @@
+# tests/test_instrumentation.py
+
+import json
+import time
+import types
+
+import pytest
+
+import instrumentation
+from instrumentation import count, snapshot, timed, timer
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Turns collection on with a fake perf_counter that advances only when told to."""
+    now = [100.0]
+    monkeypatch.setattr(instrumentation, "time", types.SimpleNamespace(perf_counter=lambda: now[0], time=time.time))
+    instrumentation.reset()
+    instrumentation.enable()
+    yield now
+    instrumentation.disable()
+    instrumentation.reset()
+
+def test_timed_records_count_and_durations(clock):
+    @timed()
+    def step(seconds):
+        clock[0] += seconds
+        return seconds
+
+    for seconds in (0.5, 0.25, 1.25):
+        assert step(seconds) == seconds
+    with timer("block"):
+        clock[0] += 2.0
+
+    timers = snapshot()["timers"]
+    assert list(timers) == ["block", f"{__name__}.test_timed_records_count_and_durations.<locals>.step"]
+    stats = timers[f"{__name__}.test_timed_records_count_and_durations.<locals>.step"]
+    assert stats == {"count": 3, "total_s": 2.0, "mean_s": pytest.approx(2.0 / 3), "min_s": 0.25, "max_s": 1.25}
+    assert timers["block"]["count"] == 1 and timers["block"]["total_s"] == 2.0
+
+def test_failing_calls_are_timed_too(clock):
+    @timed("failing")
+    def fail():
+        clock[0] += 0.5
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        fail()
+    assert snapshot()["timers"]["failing"]["count"] == 1
+
+def test_nothing_is_recorded_while_disabled(clock):
+    instrumentation.disable()
+    timed("off")(lambda: None)()
+    with timer("off"):
+        pass
+    count("rows", 5)
+    assert snapshot() == {"enabled": False, "timers": {}, "counters": {}}
+
+def test_exports(clock, tmp_path):
+    @timed("fetch.page")
+    def fetch():
+        clock[0] += 1.5
+
+    fetch()
+    count("rows parsed", 40)
+    count("rows parsed", 2)
+
+    instrumentation.write(tmp_path / "metrics.json")
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert data["timers"]["fetch.page"]["total_s"] == 1.5
+    assert data["counters"] == {"rows parsed": 42}
+
+    instrumentation.write(tmp_path / "metrics.prom")
+    lines = (tmp_path / "metrics.prom").read_text(encoding="utf-8").splitlines()
+    assert 'escooter_duration_seconds_sum{step="fetch.page"} 1.500000000' in lines
+    assert 'escooter_duration_seconds_count{step="fetch.page"} 1' in lines
+    assert 'escooter_duration_seconds_max{step="fetch.page"} 1.500000000' in lines
+    assert lines[-2:] == ["# TYPE escooter_rows_parsed_total counter", "escooter_rows_parsed_total 42"]
+
+def test_log_file_gets_one_line_per_update(clock, tmp_path):
+    instrumentation.enable(tmp_path / "events.jsonl")
+    count("bytes", 10)
+    with timer("parse"):
+        clock[0] += 0.125
+    instrumentation.disable()
+    events = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(event["type"], event["name"]) for event in events] == [("counter", "bytes"), ("timer", "parse")]
+    assert events[0]["amount"] == 10 and events[1]["seconds"] == 0.125
@@ -0,0 +1,91 @@
+# tests/test_query.py
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_sort import filter_by_categorical, filter_by_numeric, sort_by_column
+from query import LazyQuery
+from search import search_index_for
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(8)
+    n = 300
+    weight = rng.integers(10, 30, n).astype("float64") # many ties
+    weight[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "model": [f"{rng.choice(['Ninebot', 'Xiaomi', 'Egret'])} {i}" for i in range(n)],
+        "uvp": rng.permutation(n) * 10 + 300, # unique, so every sort order is unambiguous
+        "akku_wh": rng.permutation(n) + 200,
+        "gewicht_kg": weight,
+        "federung": pd.Categorical(rng.choice(["keine", "vorne", "vorne + hinten"], n)),
+        "bremslicht": rng.random(n) < 0.5,
+    })
+
+def random_step(rng: random.Random):
+    kind = rng.choice(["numeric", "numeric", "categorical", "sort", "search"])
+    if kind == "numeric":
+        column, value = rng.choice([("uvp", rng.randrange(300, 3300, 50)), ("gewicht_kg", rng.randrange(10, 30)), ("akku_wh", rng.randrange(200, 500))])
+        return ("filter_numeric", column, rng.choice(["<", "<=", ">", ">=", "=="]), value)
+    if kind == "categorical":
+        column, values = rng.choice([("federung", ["keine", "vorne", "vorne + hinten"]), ("bremslicht", [True, False])])
+        return ("filter_categorical", column, rng.sample(values, rng.randint(1, 2)))
+    if kind == "sort":
+        return ("sort", rng.choice(["uvp", "akku_wh", "model"]), rng.random() < 0.5)
+    return ("search", rng.choice(["ninebot", "xiaomi", "egret", "egrte"]))
+
+def eager(df: pd.DataFrame, steps: list) -> pd.DataFrame:
+    """The same steps applied one after another with filter_sort, each producing a new DataFrame."""
+    for name, *args in steps:
+        if name == "filter_numeric":
+            df = filter_by_numeric(df, *args)
+        elif name == "filter_categorical":
+            df = filter_by_categorical(df, *args)
+        elif name == "sort":
+            df = sort_by_column(df, *args)
+        else:
+            df = df[search_index_for(df).mask(*args)]
+    return df
+
+@pytest.mark.parametrize("seed", range(20))
+def test_lazy_query_matches_eager_evaluation(df, seed):
+    rng = random.Random(seed)
+    query, steps, results = LazyQuery(df), [], [df] # results[i]: what collect() returned after i steps, if called
+    for _ in range(12):
+        if steps and rng.random() < 0.25:
+            assert query.undo()
+            steps.pop()
+            results.pop()
+            if results[-1] is not None:
+                # Undo restores the earlier result, without recomputing it
+                assert query.collect() is results[-1]
+        else:
+            step = random_step(rng)
+            getattr(query, step[0])(*step[1:])
+            steps.append(step)
+            results.append(None)
+        # Evaluated after some steps only, so both the incremental and the fused masks are used
+        if rng.random() < 0.5:
+            expected = eager(df, steps)
+            pd.testing.assert_frame_equal(query.collect(), expected)
+            assert query.count() == len(expected)
+            assert sorted(query.positions().tolist()) == sorted(df.index.get_indexer(expected.index).tolist())
+            results[-1] = query.collect()
+
+    pd.testing.assert_frame_equal(query.collect(), eager(df, steps))
+    query.reset()
+    assert query.collect() is df and not query.undo()
+
+def test_plan_fuses_filters_and_keeps_the_last_sort(df):
+    query = (LazyQuery(df).filter_numeric("uvp", "<=", 1500).sort("uvp").filter_categorical("federung", ["vorne"])
+             .sort("akku_wh", ascending=False))
+    assert len(query.filters) == 2 and len(query.steps) == 4
+    assert query.describe() == "uvp <= 1500, federung in ['vorne'], sorted by akku_wh desc"
+    assert query.undo()
+    assert query.describe() == "uvp <= 1500, federung in ['vorne'], sorted by uvp asc"
+    # Invalid steps are not recorded
+    query.filter_numeric("model", "<", 3).sort("nope").filter_numeric("uvp", "!=", 3)
+    assert len(query.steps) == 3
@@ -0,0 +1,72 @@
+# tests/test_ranking.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ranking
+from ranking import Criterion, pareto_front, ranked_positions, score
+
+def brute_force_front(points: np.ndarray) -> set[int]:
+    """Rows no other row is at least as good as in every dimension and better in one (smaller is better)."""
+    complete = ~np.isnan(points).any(axis=1)
+    front = set()
+    for i in np.flatnonzero(complete):
+        others = points[complete]
+        dominated = ((others <= points[i]).all(axis=1) & (others < points[i]).any(axis=1)).any()
+        if not dominated:
+            front.add(int(i))
+    return front
+
+def random_frame(rng: np.random.Generator, n_rows: int, n_columns: int) -> pd.DataFrame:
+    # Few distinct values, so ties and identical rows are common
+    data = rng.integers(0, 6, size=(n_rows, n_columns)).astype("float64")
+    data[rng.random(data.shape) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=[f"c{i}" for i in range(n_columns)])
+
+@pytest.mark.parametrize("n_columns", [1, 2, 3, 4], ids=["1-d", "2-d", "sfs 3-d", "sfs 4-d"])
+def test_pareto_front_matches_brute_force(n_columns, monkeypatch):
+    monkeypatch.setattr(ranking, "SKYLINE_BLOCK", 7) # several blocks even for small frames
+    rng = np.random.default_rng(n_columns)
+    for _ in range(50):
+        df = random_frame(rng, int(rng.integers(1, 80)), n_columns)
+        criteria = [Criterion(col, maximize=bool(rng.integers(2))) for col in df.columns]
+        points = np.column_stack([-df[c.column].to_numpy() if c.maximize else df[c.column].to_numpy() for c in criteria])
+
+        front = pareto_front(df, criteria)
+        assert set(front.tolist()) == brute_force_front(points)
+        assert len(front) == len(set(front.tolist()))
+        # Ordered by the first criterion, best first
+        assert (np.diff(points[front, 0]) >= 0).all()
+
+def test_pareto_front_keeps_identical_rows_and_respects_positions():
+    df = pd.DataFrame({"uvp": [500, 500, 400, 900, np.nan], "akku_wh": [600, 600, 300, 1000, 2000]})
+    criteria = [Criterion("uvp"), Criterion("akku_wh")]
+    assert pareto_front(df, criteria).tolist() == [2, 0, 1, 3]
+    assert pareto_front(df, criteria, positions=np.array([0, 3, 4])).tolist() == [0, 3]
+
+def test_score_normalizes_each_criterion_in_its_direction():
+    df = pd.DataFrame({"uvp": [1000, 500, 2000, np.nan], "akku_wh": [500, 500, 1000, 800]})
+    # Cheapest is best for uvp, most is best for akku_wh
+    np.testing.assert_allclose(score(df, [Criterion("uvp")]), [2 / 3, 1.0, 0.0, np.nan])
+    np.testing.assert_allclose(score(df, [Criterion("akku_wh")]), [0.0, 0.0, 1.0, 0.6])
+    np.testing.assert_allclose(score(df, [Criterion("uvp", maximize=True)]), [1 / 3, 0.0, 1.0, np.nan])
+    # Weights are shares of the score
+    np.testing.assert_allclose(score(df, [Criterion("uvp", 3), Criterion("akku_wh", 1)]), [0.5, 0.75, 0.25, np.nan])
+    # Without a spread every present value is best
+    np.testing.assert_allclose(score(df.iloc[:2], [Criterion("akku_wh")]), [1.0, 1.0])
+
+def test_ranked_positions_orders_by_score_and_leaves_out_missing_rows():
+    df = pd.DataFrame({"uvp": [1000, 500, 2000, np.nan, 500], "akku_wh": [500, 600, 1000, 800, 600]})
+    rows, scores = ranked_positions(df, [Criterion("eur_per_wh")])
+    assert rows.tolist() == [1, 4, 0, 2] # ties keep their order
+    assert (np.diff(scores) <= 0).all()
+    rows, _ = ranked_positions(df, [Criterion("uvp")], positions=np.array([2, 0, 3]), limit=1)
+    assert rows.tolist() == [0]
+
+def test_score_rejects_missing_or_zero_weights():
+    df = pd.DataFrame({"uvp": [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        score(df, [])
+    with pytest.raises(ValueError):
+        score(df, [Criterion("uvp", 0)])
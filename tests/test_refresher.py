@@ -0,0 +1,32 @@
+# tests/test_refresher.py
+
+import time
+
+from cache import DatasetCache, build_metadata, write_dataset
+from data_processor import process_dataframe
+from fixtures import synthetic_page
+from refresher import RefreshScheduler
+from scraper import parse_tables
+
+def test_failed_load_keeps_the_scheduler_running(tmp_path, monkeypatch):
+    cache = DatasetCache("http://127.0.0.1:9/tabelle/", cache_dir=tmp_path)
+    html = synthetic_page(n_rows=20)
+    write_dataset(process_dataframe(parse_tables(html, ["tablepress-2"])["tablepress-2"]), cache.path, build_metadata(cache.url, html))
+    scheduler = RefreshScheduler(cache, poll_interval=60, retry_interval=5)
+    assert len(scheduler.snapshot()) == 20
+
+    def corrupt_load():
+        raise OSError("truncated feather file")
+
+    monkeypatch.setattr(cache, "load", corrupt_load)
+    assert scheduler.run_pending() == 5
+    assert scheduler.status.failed
+    assert "truncated feather file" in scheduler.status.last_error
+    assert len(scheduler.snapshot()) == 20 # the previous snapshot is still served
+
+    # The thread survives the failure and keeps polling
+    scheduler.start()
+    time.sleep(0.1)
+    assert scheduler._thread.is_alive()
+    assert scheduler.status.next_refresh_at is not None
+    scheduler.stop(timeout=1)
@@ -0,0 +1,145 @@
+# tests/test_scraper.py
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import scraper
+from fixtures import synthetic_page
+from scraper import create_session, fetch_page, parse_tables
+
+PAGE = "<html><body><table id='tablepress-2'></table></body></html>"
+
+class Handler(BaseHTTPRequestHandler):
+    """Answers with the next of the server's planned responses: (status, headers, body, delay in seconds)."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        status, headers, body, delay = self.server.responses.pop(0) if self.server.responses else (200, {}, PAGE, 0)
+        if callable(status):
+            status = status(self.headers)
+        time.sleep(delay)
+        payload = body.encode("utf-8") if status != 304 else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.responses, httpd.requests = [], []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/tabelle/"
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_retries_a_503(server):
+    server.responses = [(503, {}, "busy", 0), (200, {"ETag": '"v1"'}, PAGE, 0)]
+    result = fetch_page(server.url, session=create_session(backoff_factor=0))
+    assert result.status_code == 200
+    assert result.text == PAGE
+    assert result.etag == '"v1"'
+    assert len(server.requests) == 2
+
+def test_gives_up_after_the_retries(server):
+    server.responses = [(503, {}, "busy", 0)] * 3
+    result = fetch_page(server.url, session=create_session(max_retries=2, backoff_factor=0))
+    assert result.status_code == 0
+    assert result.text == ""
+    assert len(server.requests) == 3
+
+def test_conditional_get_round_trip(server):
+    def not_modified_if_current(headers):
+        return 304 if headers.get("If-None-Match") == '"v1"' else 200
+
+    validators = {"ETag": '"v1"', "Last-Modified": "Wed, 01 May 2024 10:00:00 GMT"}
+    server.responses = [(200, validators, PAGE, 0), (not_modified_if_current, {}, "", 0)]
+    session = create_session(backoff_factor=0)
+    first = fetch_page(server.url, session=session)
+    second = fetch_page(server.url, session=session, **first.validators())
+
+    assert first.status_code == 200 and first.validators() == {"etag": '"v1"', "last_modified": validators["Last-Modified"]}
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert server.requests[1]["If-Modified-Since"] == validators["Last-Modified"]
+    # The 304 carried no validators, so the ones sent are kept for the next request
+    assert second.not_modified and second.text == ""
+    assert second.validators() == first.validators()
+
+def test_times_out(server):
+    server.responses = [(200, {}, PAGE, 1)]
+    started = time.monotonic()
+    result = fetch_page(server.url, timeout=0.2, session=create_session(max_retries=0))
+    assert result.status_code == 0
+    assert time.monotonic() - started < 0.9
+
+def test_negotiates_compression(server):
+    fetch_page(server.url, session=create_session())
+    assert "gzip" in server.requests[0]["Accept-Encoding"]
+
+# --- Parsing ---
+
+BACKENDS = ["bs4", "lxml", "stream"]
+
+def page(*tables: str) -> str:
+    return "<html><body><p>intro</p>" + "".join(tables) + "</body></html>"
+
+EDGE_CASES = {
+    "nested table": page(
+        '<table id="t"><thead><tr><th>Model</th><th>Notes</th></tr></thead><tbody>'
+        '<tr><td>A</td><td>before<table><tr><td>inner 1</td><td>inner 2</td></tr></table>after</td></tr>'
+        '<tr><td>B</td><td>plain</td></tr></tbody></table>'),
+    "markup in cells": page(
+        '<table id="t"><thead><tr><th> UVP* <br/>(€)</th><th><!-- c -->Akku<script>x</script> Wh</th></tr></thead>'
+        '<tbody><tr><td> 1.299,00&nbsp;€ </td><td><b>5</b><i>00</i> <span></span></td></tr>'
+        '<tr><td></td><td>&amp; ja <em>✓</em></td></tr><tr></tr></tbody></table>'),
+    "second head and body": page(
+        '<table id="t"><thead><tr><th>A</th><td>skipped</td></tr></thead>'
+        '<tbody><tr><th>not a cell</th><td>1</td></tr></tbody>'
+        '<thead><tr><th>B</th></tr></thead><tbody><tr><td>2</td></tr></tbody></table>'),
+    "two tables, one missing": page(
+        '<table id="u"><thead><tr><th>X</th></tr></thead><tbody><tr><td>1</td></tr></tbody></table>',
+        '<table id="t"><thead><tr><th>Y</th></tr></thead><tbody><tr><td>2</td></tr></tbody></table>'),
+    "page ends inside the table": '<table id="t"><thead><tr><th>A</th></tr></thead><tbody><tr><td>1</td></tr><tr><td>2',
+}
+
+@pytest.mark.parametrize("html", list(EDGE_CASES.values()), ids=list(EDGE_CASES))
+def test_backends_agree_on_edge_cases(html, monkeypatch):
+    monkeypatch.setattr(scraper, "FEED_CHUNK_SIZE", 7) # text split across many feeds
+    expected = parse_tables(html, ["t", "u", "missing"], backend="bs4")
+    assert expected["t"]
+    for backend in BACKENDS[1:]:
+        assert parse_tables(html, ["t", "u", "missing"], backend=backend) == expected, backend
+
+def test_nested_table_keeps_the_text_after_it():
+    html = EDGE_CASES["nested table"]
+    for backend in BACKENDS:
+        rows = parse_tables(html, ["t"], backend=backend)["t"]
+        assert rows[1][:2] == ["A", "beforeinner 1inner 2after"], backend
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("html", [
+    page('<table id="t"><tbody><tr><td>1</td></tr></tbody></table>'),
+    page('<table id="t"><tr><td>1</td></tr></table>'),
+    page('<table id="t"><thead><tr><th>A</th></tr></thead></table>'),
+], ids=["no thead", "no sections", "no tbody"])
+def test_backends_reject_tables_without_sections(html, backend):
+    with pytest.raises(ValueError, match="Table with ID 't' has no <t"):
+        parse_tables(html, ["t"], backend=backend)
+
+def test_backends_agree_on_the_fixture_page():
+    html = synthetic_page(n_rows=300, seed=4)
+    expected = parse_tables(html, ["tablepress-2", "tablepress-6"], backend="bs4")
+    assert len(expected["tablepress-2"]) == 301
+    for backend in BACKENDS[1:]:
+        assert parse_tables(html, ["tablepress-2", "tablepress-6"], backend=backend) == expected, backend
@@ -0,0 +1,81 @@
+# tests/test_search.py
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from search import SearchIndex, edit_distance, max_edits, normalize
+
+def index_of(*names: str) -> SearchIndex:
+    return SearchIndex(pd.DataFrame({"model": list(names)}))
+
+def brute_force_match(index: SearchIndex, term: str) -> dict[str, int]:
+    """What _match should find, comparing the term with every word."""
+    matches = {}
+    for word in index._words:
+        edits = max_edits(term)
+        distance = min(edit_distance(term, word, edits), edit_distance(term, word[:len(term)], edits))
+        if word == term:
+            matches[word] = SearchIndex.EXACT
+        elif word.startswith(term):
+            matches[word] = SearchIndex.PREFIX
+        elif distance <= edits:
+            matches[word] = SearchIndex.FUZZY - distance
+    return matches
+
+def test_exact_word_beats_prefix_then_shorter_name():
+    index = index_of("Ninebot Maxi", "Ninebot Max", "Maxwell", "Segway")
+    # 'max' is the whole word in row 1; rows 0 and 2 only start with it, and row 2 has the shorter name
+    assert index.search("max").tolist() == [1, 2, 0]
+    assert index.search("MAX!", limit=1).tolist() == [1]
+
+def test_one_typo_still_matches():
+    index = index_of("Ninebot Max G30D", "Segway Ninebot F2", "Xiaomi Mi 4 Pro")
+    assert sorted(index.search("ninebto").tolist()) == [0, 1] # swapped letters
+    assert sorted(index.search("ninbe").tolist()) == [0, 1] # typo in an unfinished word
+    assert index.search("xiaomy").tolist() == [2]
+    # Short terms are taken literally
+    assert index.search("mox").tolist() == []
+    # Exact matches rank above typos
+    index = index_of("Trittbrett Pro", "Trittbret Pro")
+    assert index.search("trittbret").tolist() == [1, 0]
+
+def test_every_term_has_to_match():
+    index = index_of("Ninebot Max G30D", "Ninebot F2", "Xiaomi Max")
+    assert index.search("ninebot max").tolist() == [0]
+    assert index.search("max ninebot").tolist() == [0]
+    assert index.search("ninebot xiaomi").tolist() == []
+    assert index.mask("max").tolist() == [True, False, True]
+    # Text without words matches every row, in table order
+    assert index.search(" - ").tolist() == [0, 1, 2]
+    assert index.mask("").all()
+
+def test_ties_go_to_shorter_names_then_table_order():
+    index = index_of("Egret Ten V4", "Egret One", "Egret Eight", "Egret Two")
+    assert index.search("egret").tolist() == [1, 3, 2, 0]
+    # Points are summed over terms before ties are broken
+    index = index_of("Egret Prox", "Egret X Pro", "Egret Pro")
+    assert index.search("egret pro").tolist() == [2, 1, 0]
+
+def test_trigram_pruning_finds_every_match():
+    rng = random.Random(5)
+    letters = "abcdeilmnorstx"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(2, 11))) for _ in range(300)]
+    index = index_of(*(" ".join(rng.sample(words, 3)) for _ in range(200)))
+    for _ in range(300):
+        term = list(rng.choice(index._words))
+        for _ in range(rng.randint(0, 2)): # typos
+            i = rng.randrange(len(term))
+            term[i] = rng.choice(letters)
+        term = "".join(term[:rng.randint(1, len(term))]) # unfinished
+        found = {index._words[word_id]: points for word_id, points in index._match(term).items()}
+        assert found == brute_force_match(index, term), term
+
+def test_search_agrees_with_mask():
+    index = index_of("Ninebot Max G30D", "Ninebot F2", "Xiaomi Max", "Maxx")
+    for text in ("max", "ninebot", "maxx ninebot", "nineb"):
+        mask = np.zeros(4, dtype=bool)
+        mask[index.search(text)] = True
+        assert mask.tolist() == index.mask(text).tolist()
+    assert normalize("Ninebot-Max G30D") == ["ninebot", "max", "g30d"]
@@ -0,0 +1,75 @@
+# tests/test_snapshots.py
+
+import numpy as np
+import pandas as pd
+
+import snapshots
+from snapshots import SnapshotStore
+
+def frame(prices: dict[str, float], **extra) -> pd.DataFrame:
+    return pd.DataFrame({"model": list(prices), "uvp": list(prices.values()), **extra})
+
+def assert_same_rows(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(actual, expected.reset_index(drop=True), check_dtype=False)
+
+def test_first_snapshot_is_only_a_checkpoint(tmp_path):
+    store = SnapshotStore(tmp_path)
+    entry = store.record(frame({"A": 100.0, "B": 200.0}), taken_at="2024-01-01T00:00:00+00:00")
+    assert entry["checkpoint"] and entry["delta"] is None
+    assert not (tmp_path / "deltas").exists()
+    assert store.history("A")["uvp"].tolist() == [100.0]
+
+def test_as_of_keeps_changed_rows_in_place(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = frame({"A": 100.0, "B": 200.0, "C": 300.0})
+    second = frame({"A": 100.0, "B": 250.0, "C": 300.0, "D": 400.0})
+    third = frame({"B": 250.0, "C": 333.0, "D": 400.0})
+    for day, df in enumerate((first, second, third), 1):
+        store.record(df, taken_at=f"2024-01-0{day}T12:00:00+00:00")
+
+    assert_same_rows(store.as_of("2024-01-01"), first)
+    assert_same_rows(store.as_of("2024-01-02"), second)
+    assert_same_rows(store.as_of("2024-01-03"), third)
+    assert store.as_of("2023-12-31").empty
+    history = store.history("A")
+    assert history["uvp"].iloc[0] == 100.0 and np.isnan(history["uvp"].iloc[-1])
+    assert store.history("C")["uvp"].tolist() == [300.0, 333.0]
+
+def test_history_survives_schema_upgrades_and_new_columns(tmp_path, monkeypatch):
+    store = SnapshotStore(tmp_path)
+    monkeypatch.setattr(snapshots, "SCHEMA_VERSION", 0) # written before an upgrade
+    store.record(frame({"A": 100.0}), taken_at="2024-01-01T00:00:00+00:00")
+    store.record(frame({"A": 110.0}), taken_at="2024-01-02T00:00:00+00:00")
+    monkeypatch.undo()
+
+    store.record(frame({"A": 120.0}, zuladung_bis_kg=[120.0]), taken_at="2024-01-03T00:00:00+00:00")
+    assert store.history("A")["uvp"].tolist() == [100.0, 110.0, 120.0]
+    assert store.history("A", "zuladung_bis_kg")["zuladung_bis_kg"].tolist() == [120.0]
+    assert store.as_of("2024-01-02")["uvp"].tolist() == [110.0]
+    assert store.as_of("2024-01-03")["zuladung_bis_kg"].tolist() == [120.0]
+    # The state written before the upgrade was still compared against
+    assert store.entries()[-1]["changed"] == 1 and store.entries()[-1]["added"] == 0
+
+def test_history_reads_only_the_deltas_with_the_model(tmp_path, monkeypatch):
+    store = SnapshotStore(tmp_path)
+    prices = {"A": 100.0, "B": 200.0, "C": 300.0}
+    store.record(frame(prices), taken_at="2024-01-01T00:00:00+00:00")
+    for day, (model, price) in enumerate([("B", 210.0), ("C", 310.0), ("A", 90.0), ("B", 220.0)], 2):
+        prices[model] = price
+        store.record(frame(prices), taken_at=f"2024-01-0{day}T00:00:00+00:00")
+    assert [entry["keys"] for entry in store.entries()] == [["A", "B", "C"], ["B"], ["C"], ["A"], ["B"]]
+
+    read = []
+    original_read = store._read
+    monkeypatch.setattr(store, "_read", lambda folder, name, columns=None: read.append(name) or original_read(folder, name, columns))
+    assert store.history("A")["uvp"].tolist() == [100.0, 90.0]
+    entries = store.entries()
+    assert read == [entries[0]["checkpoint"], entries[3]["delta"]]
+
+    # Manifests written before the keys were recorded are read in full
+    for entry in entries:
+        del entry["keys"]
+    store._write_manifest(entries)
+    read.clear()
+    assert store.history("A")["uvp"].tolist() == [100.0, 90.0]
+    assert len(read) == 5
@@ -0,0 +1,78 @@
+# tests/test_sources.py
+
+import pytest
+
+import sources
+from cache import DatasetCache
+from fixtures import synthetic_page
+from scraper import FetchResult, parse_tables
+from sources import HostRateLimiter, Source, scrape_sources
+
+HTML = synthetic_page(n_rows=30)
+parse_calls = []
+
+def counting_parser(html, table_ids):
+    parse_calls.append(list(table_ids))
+    return parse_tables(html, table_ids)
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Serves HTML per URL instead of the network and records the URLs fetched."""
+    served, fetched = {}, []
+
+    def fetch_page(url, etag=None, last_modified=None, **kwargs):
+        fetched.append(url)
+        return FetchResult(url, 200, served[url]) if url in served else FetchResult(url)
+
+    monkeypatch.setattr(sources, "fetch_page", fetch_page)
+    parse_calls.clear()
+    return served, fetched
+
+def test_sources_on_one_page_share_the_request_and_the_parse(pages):
+    served, fetched = pages
+    served["http://a/"] = HTML
+    current = Source("current", "http://a/", ("tablepress-2",), parser=counting_parser)
+    deprecated = Source("deprecated", "http://a/", ("tablepress-6",), parser=counting_parser)
+    results = scrape_sources([current, deprecated], limiter=HostRateLimiter(0))
+    assert fetched == ["http://a/"]
+    assert parse_calls == [["tablepress-2", "tablepress-6"]]
+    assert [len(result.df) for result in results] == [30, 10]
+
+def test_several_pages_are_parsed_in_spawned_workers(pages):
+    served, fetched = pages
+    served["http://a/"] = HTML
+    served["http://b/"] = synthetic_page(n_rows=12, seed=3)
+    results = scrape_sources([Source("a", "http://a/"), Source("b", "http://b/")], processes=2, limiter=HostRateLimiter(0))
+    assert sorted(fetched) == ["http://a/", "http://b/"]
+    assert [len(result.df) for result in results] == [30, 12]
+
+def flaky_parser(html, table_ids):
+    """Finds no tables on its first call, like a parse that failed once."""
+    parse_calls.append(list(table_ids))
+    return {} if len(parse_calls) == 1 else parse_tables(html, table_ids)
+
+def test_page_is_reparsed_while_a_sibling_source_fails(pages, tmp_path):
+    served, fetched = pages
+    served["http://a/"] = HTML
+    cache = DatasetCache("http://a/", cache_dir=tmp_path, sources=[
+        Source("current", "http://a/", ("tablepress-2",)), Source("deprecated", "http://a/", ("tablepress-6",), parser=flaky_parser)])
+    assert cache.refresh()["source"].value_counts().to_dict() == {"current": 30}
+
+    # Same page again: it must not count as unchanged while "deprecated" is missing
+    df = cache.refresh()
+    assert cache.last_status == "refreshed"
+    assert df["source"].value_counts().to_dict() == {"current": 30, "deprecated": 10}
+    assert len(fetched) == 2
+
+def raising_parser(html, table_ids):
+    raise ValueError("broken markup")
+
+def test_parse_errors_are_reported_per_page(pages):
+    served, _ = pages
+    served["http://a/"] = HTML
+    served["http://b/"] = HTML
+    for processes in (0, 2):
+        results = scrape_sources([Source("a", "http://a/", parser=raising_parser), Source("b", "http://b/")],
+                                 processes=processes, limiter=HostRateLimiter(0))
+        assert results[0].df is None and "broken markup" in results[0].error
+        assert len(results[1].df) == 30
@@ -0,0 +1,111 @@
+# tests/test_stats.py
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache import DatasetCache, build_metadata, write_dataset
+from stats import N_BINS, QUANTILES, compute_stats, read_stats, write_stats
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(3)
+    n = 200
+    uvp = rng.normal(1200, 400, n).round(2)
+    uvp[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "model": [f"Model {i}" for i in range(n)],
+        "uvp": uvp,
+        "akku_wh": pd.array(rng.integers(200, 1200, n), dtype="Int16"),
+        "reichweite_km_offiziell": rng.integers(20, 120, n).astype("float32"),
+        "motor_w": pd.array([pd.NA] * n, dtype="Int16"), # a column without any value
+        "federung": pd.Categorical(rng.choice(["keine", "vorne", None], n), categories=["keine", "vorne", "hinten"]),
+        "blinker": rng.random(n) < 0.5,
+    })
+
+def test_summaries_match_numpy(df):
+    stats = compute_stats(df, "v1")
+    values = df["uvp"].dropna().to_numpy()
+    summary = stats.columns["uvp"]
+    assert summary["count"] == len(values)
+    assert summary["mean"] == pytest.approx(values.mean())
+    assert summary["std"] == pytest.approx(values.std(ddof=1))
+    assert (summary["min"], summary["max"]) == (values.min(), values.max())
+    np.testing.assert_allclose(summary["quantiles"], np.quantile(values, QUANTILES))
+    edges, counts = stats.histogram("uvp")
+    assert len(edges) == N_BINS + 1
+    np.testing.assert_array_equal(counts, np.histogram(values, bins=edges)[0])
+    assert set(stats.columns) == {"uvp", "akku_wh", "reichweite_km_offiziell"}
+
+def test_subset_histograms_and_quantiles(df):
+    stats = compute_stats(df, "v1")
+    positions = np.flatnonzero(df["akku_wh"].to_numpy() > 600)
+    values = df["uvp"].to_numpy()[positions]
+    values = values[~np.isnan(values)]
+    edges, counts = stats.histogram("uvp", positions)
+    np.testing.assert_array_equal(counts, np.histogram(values, bins=edges)[0])
+    # Read off the histogram, so exact to within one bin
+    bin_width = edges[1] - edges[0]
+    np.testing.assert_allclose(list(stats.quantiles("uvp", positions).values()), np.quantile(values, QUANTILES), atol=bin_width)
+
+def test_column_without_values(df):
+    stats = compute_stats(df, "v1")
+    assert "motor_w" not in stats.columns
+    means = stats.group_means(df, "federung")
+    assert means["motor_w"].isna().all()
+
+    # Rows whose values are all missing give an empty histogram and NaN quantiles
+    positions = np.flatnonzero(df["uvp"].isna().to_numpy())
+    edges, counts = stats.histogram("uvp", positions)
+    assert counts.sum() == 0 and len(counts) == len(edges) - 1
+    assert np.isnan(list(stats.quantiles("uvp", positions).values())).all()
+
+    empty = compute_stats(df[["model", "motor_w"]], "v1")
+    assert empty.columns == {} and empty.n_rows == len(df)
+
+def test_group_means_match_pandas(df):
+    stats = compute_stats(df, "v1")
+    for positions in (None, np.arange(0, len(df), 3)):
+        means = stats.group_means(df, "federung", positions)
+        subset = df if positions is None else df.iloc[positions]
+        expected = subset.groupby("federung", observed=False)[["uvp", "akku_wh"]].mean()
+        np.testing.assert_allclose(means[["uvp", "akku_wh"]].to_numpy(dtype=float), expected.to_numpy(dtype=float))
+        np.testing.assert_array_equal(means["count"], subset["federung"].value_counts(sort=False).reindex(expected.index))
+    assert stats.groups["blinker"]["values"] == [False, True]
+
+def test_regression_matches_polyfit(df):
+    stats = compute_stats(df, "v1")
+    fit = stats.regression(df, "akku_wh", "reichweite_km_offiziell")
+    slope, intercept = np.polyfit(df["akku_wh"].to_numpy(dtype=float), df["reichweite_km_offiziell"].to_numpy(dtype=float), 1)
+    assert (fit["slope"], fit["intercept"], fit["n"]) == (pytest.approx(slope), pytest.approx(intercept), len(df))
+
+def assert_same_stats(a, b):
+    # Compared as JSON, where NaN equals NaN
+    summary = lambda stats: json.dumps([stats.version, stats.n_rows, stats.columns, stats.groups, stats.regressions])
+    assert summary(a) == summary(b)
+    assert a.bins.keys() == b.bins.keys()
+    for col in a.bins:
+        np.testing.assert_array_equal(a.bins[col], b.bins[col])
+
+def test_stats_roundtrip_through_the_cache(df, tmp_path):
+    cache = DatasetCache("http://scooters.test/", cache_dir=tmp_path)
+    metadata = build_metadata(cache.url, "<html></html>")
+    write_dataset(df, cache.path, metadata)
+    cache.record_stats(cache.load(), metadata)
+    computed = cache._stats
+
+    # A new instance reads them from disk instead of recomputing
+    stored = DatasetCache("http://scooters.test/", cache_dir=tmp_path).stats()
+    assert_same_stats(stored, computed)
+    assert stored.version == cache.load().attrs["dataset_version"]
+    assert_same_stats(read_stats(cache.stats_path), computed)
+
+def test_stats_of_another_version_are_recomputed(df, tmp_path):
+    cache = DatasetCache("http://scooters.test/", cache_dir=tmp_path)
+    write_dataset(df, cache.path, build_metadata(cache.url, "<html></html>"))
+    write_stats(compute_stats(df.head(10), "old"), cache.stats_path)
+    stats = cache.stats()
+    assert stats.n_rows == len(df) and stats.version != "old"
+    assert read_stats(cache.stats_path).version == stats.version
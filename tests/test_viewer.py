@@ -0,0 +1,58 @@
+# tests/test_viewer.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from viewer import PagedTable
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "model": [f"Model {i}" for i in range(23)],
+        "uvp": np.arange(23) * 100.0,
+        "akku_wh": pd.array([500, None] * 11 + [600], dtype="Int16"),
+    })
+
+def test_page_count():
+    frame = pd.DataFrame({"model": [f"Model {i}" for i in range(20)]})
+    assert PagedTable(frame, page_size=10).n_pages == 2
+    assert PagedTable(frame, page_size=7).n_pages == 3
+    assert PagedTable(frame, page_size=50).n_pages == 1
+    assert PagedTable(frame, page_size=0).page_size == 1
+    # An empty frame still has one (empty) page
+    empty = PagedTable(frame.iloc[:0], page_size=10)
+    assert empty.n_pages == 1 and empty.rows() == []
+
+def test_first_and_last_page(df):
+    table = PagedTable(df, page_size=10)
+    assert table.n_pages == 3
+    rows = table.rows()
+    assert len(rows) == 10
+    assert rows[0] == ["Model 0", "0.0", "500"]
+    assert rows[1] == ["Model 1", "100.0", ""] # missing values are blank
+    assert table.render().caption == "Rows 1-10 of 23 | Page 1 of 3"
+
+    assert table.jump(2) == 2
+    assert [row[0] for row in table.rows()] == ["Model 20", "Model 21", "Model 22"]
+    assert table.render().caption == "Rows 21-23 of 23 | Page 3 of 3"
+
+def test_out_of_range_pages_are_clamped(df):
+    table = PagedTable(df, page_size=10)
+    assert table.prev() == 0
+    assert table.jump(-5) == 0
+    assert table.jump(99) == 2
+    assert table.next() == 2
+    assert table.rows()[-1][0] == "Model 22"
+    assert table.prev() == 1
+
+def test_column_projection(df):
+    table = PagedTable(df, page_size=5, columns=["uvp", "nope", "model"])
+    assert table.columns == ["uvp", "model"]
+    assert table.rows()[0] == ["0.0", "Model 0"]
+    rendered = table.render()
+    assert [column.header for column in rendered.columns] == ["uvp", "model"]
+    assert rendered.row_count == 5
+    # Unknown or no columns show everything
+    assert table.project(["nope"]) == list(df.columns)
+    assert table.project([]) == list(df.columns)